@@ -23,6 +23,8 @@ from typing import Dict, List, Optional, Tuple
 import logging
 from tqdm import tqdm
 import configparser
+from vr_ui_event_bus import UIEventBus
+from vr_log_store import LogStore, VirtualLogView, default_spill_path
 
 # ログ設定
 logging.basicConfig(
@@ -55,8 +57,17 @@ class VRAdvancedOptimizerGUI:
         self.monitoring = False
         self.monitor_thread = None
         
+        # ワーカースレッド → メインループのイベントバス
+        self.ui_events = UIEventBus(self.root)
+        
         self.setup_gui()
         
+        self.ui_events.subscribe('log', self.log_view.append_lines)
+        self.ui_events.subscribe('status', self.status_var.set)
+        self.ui_events.subscribe('result', self.show_optimization_results)
+        self.ui_events.subscribe('system_info', self.update_system_info)
+        self.ui_events.start()
+        
     def load_config(self):
         """設定ファイルの読み込み"""
         self.config = configparser.ConfigParser()
@@ -242,9 +253,10 @@ class VRAdvancedOptimizerGUI:
         export_button = ttk.Button(log_control_frame, text="📤 ログエクスポート", command=self.export_log)
         export_button.pack(side=tk.LEFT, padx=5)
         
-        # ログ表示
-        self.log_display = scrolledtext.ScrolledText(log_frame, height=20, width=80)
-        self.log_display.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        # ログ表示（固定容量、古い行はディスクへ書き出し）
+        self.log_store = LogStore(spill_path=default_spill_path('vr_advanced_gui'))
+        self.log_view = VirtualLogView(log_frame, self.log_store, height=20, width=80)
+        self.log_view.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
     def detect_vr_environment(self):
         """VR環境検出"""
@@ -275,21 +287,20 @@ class VRAdvancedOptimizerGUI:
                 results = self.optimizer.run_optimization()
                 
                 # 結果をログに表示
-                self.root.after(0, lambda: self.show_optimization_results(results))
+                self.ui_events.result(results)
                 
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("エラー", f"最適化中にエラーが発生しました: {e}"))
+                self.ui_events.call(messagebox.showerror, "エラー", f"最適化中にエラーが発生しました: {e}")
             finally:
-                self.root.after(0, lambda: self.optimize_button.config(state='normal'))
-                self.root.after(0, lambda: self.status_var.set("最適化完了"))
+                self.ui_events.call(self.optimize_button.config, state='normal')
+                self.ui_events.status("最適化完了")
         
         threading.Thread(target=optimize_thread, daemon=True).start()
         
     def show_optimization_results(self, results):
         """最適化結果の表示"""
         report = self.optimizer.generate_report()
-        self.log_display.insert(tk.END, f"\n{report}\n")
-        self.log_display.see(tk.END)
+        self.log_view.append_lines(["", *report.splitlines()])
         
         success_count = sum(results.values())
         total_count = len(results)
@@ -319,7 +330,7 @@ class VRAdvancedOptimizerGUI:
                 try:
                     # システム情報取得
                     info = self.get_system_info()
-                    self.root.after(0, lambda: self.update_system_info(info))
+                    self.ui_events.post('system_info', info)
                     
                     # 自動最適化チェック
                     if self.auto_optimize_var.get():
@@ -428,21 +439,19 @@ class VRAdvancedOptimizerGUI:
     
     def clear_log(self):
         """ログクリア"""
-        self.log_display.delete(1.0, tk.END)
+        self.log_view.clear()
     
     def export_log(self):
         """ログエクスポート"""
-        log_content = self.log_display.get(1.0, tk.END)
         filename = f"vr_optimizer_gui_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(log_content)
+        self.log_store.export(filename)
         
         messagebox.showinfo("エクスポート完了", f"ログを保存しました: {filename}")
     
     def run(self):
         """GUI実行"""
         self.root.mainloop()
+        self.log_store.flush_spill()
 
 class VRAdvancedOptimizer:
     """VR高度最適化エンジン"""
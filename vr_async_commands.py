@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部コマンドの非同期実行モジュール
+wmic / powercfg / sc / rundll32 / netsh などの外部ツールを、共有のasyncioイベントループ
+（バックグラウンドスレッド）で実行します。
+
+- 同時実行数の上限（全呼び出し元で共有）
+- コマンドごとのタイムアウト（超えたらプロセスを終了して status='timeout'）
+- 標準出力・標準エラーの取得と、構造化された結果
+  {'args', 'returncode', 'stdout', 'stderr', 'duration', 'status', 'error'}
+  status は ok / failed（終了コード≠0）/ timeout / error（起動できない等）
+
+同期コード（最適化ステップのスレッドやGUI）からは run_command / run_commands を呼びます。
+run_commands に渡した独立したコマンドは上限の範囲で同時に実行されます。
+"""
+
+import os
+import sys
+import time
+import locale
+import argparse
+import threading
+import subprocess
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 30.0
+
+
+class AsyncCommandRunner:
+    """共有イベントループ上で外部コマンドを実行"""
+
+    def __init__(self, max_concurrency: int = DEFAULT_CONCURRENCY, default_timeout: float = DEFAULT_TIMEOUT,
+                 encoding: str = None):
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.loop = None
+        self.semaphore = None
+        self.lock = threading.Lock()
+        self.running = 0
+        self.stats = {'started': 0, 'timeouts': 0, 'peak_running': 0}
+
+    def ensure_loop(self):
+        """初回呼び出し時にイベントループのスレッドを起動"""
+        with self.lock:
+            if self.loop is not None:
+                return self.loop
+            # asyncio は初回実行時に読み込む（起動時最適化などコマンドを実行しない場合の読み込み時間を短縮）
+            import asyncio
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True, name='async-commands').start()
+
+            async def create_semaphore():
+                return asyncio.Semaphore(self.max_concurrency)
+
+            self.semaphore = asyncio.run_coroutine_threadsafe(create_semaphore(), loop).result()
+            self.loop = loop
+            return loop
+
+    async def run_async(self, args, timeout: float = None, shell: bool = False) -> dict:
+        """コマンド1件を実行（イベントループ上のコルーチン）"""
+        import asyncio
+        timeout = timeout or self.default_timeout
+        async with self.semaphore:
+            self.running += 1
+            self.stats['started'] += 1
+            self.stats['peak_running'] = max(self.stats['peak_running'], self.running)
+            started = time.monotonic()
+            try:
+                options = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.PIPE, 'stderr': subprocess.PIPE}
+                if os.name == 'nt':
+                    options['creationflags'] = subprocess.CREATE_NO_WINDOW
+                if shell:
+                    process = await asyncio.create_subprocess_shell(args, **options)
+                else:
+                    process = await asyncio.create_subprocess_exec(*args, **options)
+            except OSError as e:
+                self.running -= 1
+                return self.result(args, None, b'', b'', time.monotonic() - started, 'error', str(e))
+
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                self.stats['timeouts'] += 1
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+                return self.result(args, None, b'', b'', time.monotonic() - started, 'timeout',
+                                   f"{timeout:.0f}秒以内に終了しませんでした")
+            finally:
+                self.running -= 1
+
+            status = 'ok' if process.returncode == 0 else 'failed'
+            return self.result(args, process.returncode, stdout, stderr, time.monotonic() - started, status)
+
+    def result(self, args, returncode, stdout: bytes, stderr: bytes, duration: float, status: str, error: str = None) -> dict:
+        return {'args': args, 'returncode': returncode,
+                'stdout': stdout.decode(self.encoding, errors='replace'),
+                'stderr': stderr.decode(self.encoding, errors='replace'),
+                'duration': duration, 'status': status, 'error': error}
+
+    def run(self, args, timeout: float = None, shell: bool = False) -> dict:
+        """コマンド1件を実行して結果を待つ（任意のスレッドから呼べる）"""
+        import asyncio
+        loop = self.ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self.run_async(args, timeout, shell), loop).result()
+
+    def run_many(self, commands: list, timeout: float = None, shell: bool = False) -> list:
+        """独立したコマンドを同時実行し、渡した順に結果を返す"""
+        import asyncio
+        loop = self.ensure_loop()
+
+        async def gather():
+            return await asyncio.gather(*(self.run_async(args, timeout, shell) for args in commands))
+
+        return list(asyncio.run_coroutine_threadsafe(gather(), loop).result())
+
+    def close(self):
+        """イベントループを停止"""
+        with self.lock:
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self.loop = None
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> AsyncCommandRunner:
+    """プロセス全体で共有するランナー"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = AsyncCommandRunner()
+        return _runner
+
+
+def run_command(args, timeout: float = None, shell: bool = False) -> dict:
+    """共有ランナーでコマンド1件を実行"""
+    return get_runner().run(args, timeout, shell)
+
+
+def run_commands(commands: list, timeout: float = None, shell: bool = False) -> list:
+    """共有ランナーで独立したコマンドを同時実行"""
+    return get_runner().run_many(commands, timeout, shell)
+
+
+def benchmark(count: int = 7, seconds: float = 0.3, timeout: float = 2.0):
+    """サービス停止7件を模したコマンドで逐次実行と比較（2回目は1件がハングする場合）"""
+    worker = [sys.executable, '-c', f'import time; time.sleep({seconds})']
+    hung = [sys.executable, '-c', 'import time; time.sleep(30)']
+    runner = AsyncCommandRunner()
+
+    print(f"{count}コマンド（各{seconds}秒）/ タイムアウト {timeout}秒 / 同時実行上限 {runner.max_concurrency}")
+    for label, commands in (("全件正常", [worker] * count), ("1件ハング", [worker] * (count - 1) + [hung])):
+        t0 = time.perf_counter()
+        for args in commands:
+            try:
+                subprocess.run(args, capture_output=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                pass
+        sequential = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        statuses = [r['status'] for r in runner.run_many(commands, timeout=timeout)]
+        concurrent = time.perf_counter() - t0
+        print(f"  {label}: 逐次 {sequential:.2f}秒 → 非同期 {concurrent:.2f}秒"
+              f"（ok {statuses.count('ok')}件 / timeout {statuses.count('timeout')}件）")
+
+    print(f"  最大同時実行 {runner.stats['peak_running']}件")
+    runner.close()
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='外部コマンドの非同期実行')
+    parser.add_argument('--benchmark', action='store_true', help='逐次実行との比較')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
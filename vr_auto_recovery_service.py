@@ -6,6 +6,7 @@ import sys
 import logging
 from datetime import datetime
 from tqdm import tqdm
+from vr_event_timeline import EventTimeline
 
 # ログ設定
 logging.basicConfig(
@@ -21,6 +22,7 @@ class VRAutoRecoveryService:
     def __init__(self):
         self.check_interval = 30  # 30秒間隔でチェック
         self.recovery_attempts = {}
+        self.timeline = EventTimeline()  # 復旧回数はメトリクスエクスポーターが集計
         self.max_recovery_attempts = 3
         self.recovery_cooldown = 300  # 5分間のクールダウン
         
@@ -182,9 +184,10 @@ class VRAutoRecoveryService:
         
         return True
 
-    def record_recovery_attempt(self, process_name):
+    def record_recovery_attempt(self, process_name, success):
         """復旧試行を記録"""
         current_time = time.time()
+        self.timeline.record_recovery(process_name, success)
         
         if process_name not in self.recovery_attempts:
             self.recovery_attempts[process_name] = {
@@ -205,13 +208,14 @@ class VRAutoRecoveryService:
             if self.should_attempt_recovery('VirtualDesktop.Streamer'):
                 logging.warning("Virtual Desktop Streamerが停止しています。復旧を試行中...")
                 
-                if self.restart_virtual_desktop():
+                success = self.restart_virtual_desktop()
+                if success:
                     logging.info("✅ Virtual Desktop Streamerの復旧に成功しました")
                     recovery_performed = True
                 else:
                     logging.error("❌ Virtual Desktop Streamerの復旧に失敗しました")
                 
-                self.record_recovery_attempt('VirtualDesktop.Streamer')
+                self.record_recovery_attempt('VirtualDesktop.Streamer', success)
             else:
                 logging.info("Virtual Desktop Streamer停止中（復旧クールダウン期間）")
         
@@ -220,13 +224,14 @@ class VRAutoRecoveryService:
             if self.should_attempt_recovery('SteamVR'):
                 logging.warning("SteamVRが停止しています。復旧を試行中...")
                 
-                if self.restart_steamvr():
+                success = self.restart_steamvr()
+                if success:
                     logging.info("✅ SteamVRの復旧に成功しました")
                     recovery_performed = True
                 else:
                     logging.error("❌ SteamVRの復旧に失敗しました")
                 
-                self.record_recovery_attempt('SteamVR')
+                self.record_recovery_attempt('SteamVR', success)
             else:
                 logging.info("SteamVR停止中（復旧クールダウン期間）")
         
@@ -235,13 +240,14 @@ class VRAutoRecoveryService:
             if self.should_attempt_recovery('Steam'):
                 logging.warning("Steamが停止しています。復旧を試行中...")
                 
-                if self.restart_application('Steam'):
+                success = self.restart_application('Steam')
+                if success:
                     logging.info("✅ Steamの復旧に成功しました")
                     recovery_performed = True
                 else:
                     logging.error("❌ Steamの復旧に失敗しました")
                 
-                self.record_recovery_attempt('Steam')
+                self.record_recovery_attempt('Steam', success)
             else:
                 logging.info("Steam停止中（復旧クールダウン期間）")
         
@@ -251,13 +257,14 @@ class VRAutoRecoveryService:
                 if self.should_attempt_recovery('VRChat'):
                     logging.warning("VRChatが停止しています。復旧を試行中...")
                     
-                    if self.restart_application('VRChat'):
+                    success = self.restart_application('VRChat')
+                    if success:
                         logging.info("✅ VRChatの復旧に成功しました")
                         recovery_performed = True
                     else:
                         logging.error("❌ VRChatの復旧に失敗しました")
                     
-                    self.record_recovery_attempt('VRChat')
+                    self.record_recovery_attempt('VRChat', success)
                 else:
                     logging.info("VRChat停止中（復旧クールダウン期間）")
         
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRChatアバター読み込み影響プロファイラ
+保存済みセッションのアバターダウンロード/読み込みイベントと、ディスクI/O・CPU・
+フレームタイムのサンプルを時間窓で結合し、読み込みごとのスタール時間と読み込みバイト数を
+計測します。アバターサイズ帯別の分布から Avatar Max Download Size の推奨値を算出します。
+
+窓結合は searchsorted + 累積和 + reduceat によるベクトル化処理です。
+"""
+
+import os
+import json
+import argparse
+import logging
+
+import numpy as np
+
+from vr_session_store import list_sessions, load_session
+
+logger = logging.getLogger(__name__)
+
+AVATAR_PROFILE_FILE = 'vr_avatar_profile.json'
+
+# アバターサイズ帯の境界（MB）
+SIZE_BUCKET_EDGES_MB = [10, 25, 50, 100, 200]
+
+# スタール判定
+FRAME_BUDGET_MS = 11.1  # 90Hz
+STALL_BUDGET_MS = 250.0  # 1回の読み込みで許容するスタール時間（95%点）
+MIN_LOADS_PER_BUCKET = 5
+
+
+def bucket_label(bucket: int) -> str:
+    """サイズ帯の表示名"""
+    lower = 0 if bucket == 0 else SIZE_BUCKET_EDGES_MB[bucket - 1]
+    if bucket >= len(SIZE_BUCKET_EDGES_MB):
+        return f"{lower}MB以上"
+    return f"{lower}-{SIZE_BUCKET_EDGES_MB[bucket]}MB"
+
+
+def stall_series(ts: np.ndarray, frametime: np.ndarray, budget_ms: float = FRAME_BUDGET_MS) -> np.ndarray:
+    """各サンプル区間で予算超過したフレーム時間の合計（ms）
+
+    区間dt秒のフレーム数 ≒ dt*1000/frametime、1フレームあたりの超過 = frametime-budget
+    → 区間のスタール時間 = dt*1000*(1 - budget/frametime)
+    """
+    dt = np.diff(ts, prepend=ts[0] if len(ts) else 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(frametime > budget_ms, 1 - budget_ms / frametime, 0.0)
+    return np.nan_to_num(dt * 1000 * ratio)
+
+
+def profile_session(session: dict, pre_window: float = 5.0, post_window: float = 10.0,
+                    pair_window: float = 120.0) -> dict:
+    """1セッション分のアバター読み込みを計測し、読み込みごとの配列を返す"""
+    samples = session['samples']
+    empty = {key: np.empty(0) for key in ('ts', 'size_bytes', 'stall_ms', 'read_bytes', 'cpu_peak', 'frametime_peak')}
+    if 'ts' not in samples or 'frametime' not in samples or len(samples['ts']) < 2:
+        return empty
+
+    loads = [e for e in session['events'] if e['kind'] == 'avatar_load']
+    if not loads:
+        return empty
+
+    ts = samples['ts']
+    frametime = np.nan_to_num(samples['frametime'])
+    cpu = np.nan_to_num(samples.get('cpu', np.zeros(len(ts))))
+    disk = samples.get('disk_read_bytes')
+
+    load_ts = np.array([e['ts'] for e in loads], dtype=np.float64)
+    load_size = np.array([np.nan if e.get('value') is None else e['value'] for e in loads], dtype=np.float64)
+
+    # サイズ不明の読み込みは、直前pair_window秒以内のダウンロードイベントのサイズを使う
+    downloads = [e for e in session['events'] if e['kind'] == 'avatar_download' and e.get('value')]
+    if downloads:
+        dl_ts = np.array([e['ts'] for e in downloads], dtype=np.float64)
+        dl_size = np.array([e['value'] for e in downloads], dtype=np.float64)
+        prev = np.searchsorted(dl_ts, load_ts, 'right') - 1
+        paired = (prev >= 0) & (load_ts - dl_ts[np.maximum(prev, 0)] <= pair_window)
+        fill = np.isnan(load_size) & paired
+        load_size[fill] = dl_size[prev[fill]]
+
+    # スタール時間：窓内スタール − 直前窓のスタール率 × 窓長
+    stall = stall_series(ts, frametime)
+    stall_cum = np.concatenate([[0.0], np.cumsum(stall)])
+    pre_lo = np.searchsorted(ts, load_ts - pre_window, 'left')
+    start = np.searchsorted(ts, load_ts, 'left')
+    end = np.searchsorted(ts, load_ts + post_window, 'right')
+
+    window_stall = stall_cum[end] - stall_cum[start]
+    pre_duration = np.maximum(ts[np.maximum(start - 1, 0)] - ts[pre_lo], 1e-9)
+    pre_rate = np.where(start > pre_lo, (stall_cum[start] - stall_cum[pre_lo]) / pre_duration, 0.0)
+    stall_ms = np.maximum(window_stall - pre_rate * post_window, 0.0)
+
+    # 読み込みバイト数：累積ディスク読み込みカウンタの差（読み込み直前のサンプル〜窓の最後のサンプル）
+    if disk is not None and np.isfinite(disk).sum() >= 2:
+        valid = np.isfinite(disk)
+        disk = np.interp(ts, ts[valid], disk[valid])
+        read_bytes = np.maximum(disk[np.maximum(end - 1, 0)] - disk[np.maximum(start - 1, 0)], 0.0)
+    else:
+        read_bytes = np.full(len(load_ts), np.nan)
+
+    # 窓内ピーク値
+    bounds = np.empty(len(load_ts) * 2, dtype=np.int64)
+    bounds[0::2] = start
+    bounds[1::2] = end
+    cpu_peak = np.maximum.reduceat(np.concatenate([cpu, [0.0]]), bounds)[0::2]
+    frametime_peak = np.maximum.reduceat(np.concatenate([frametime, [0.0]]), bounds)[0::2]
+    empty_window = end <= start
+    cpu_peak[empty_window] = np.nan
+    frametime_peak[empty_window] = np.nan
+
+    keep = ~empty_window
+    return {
+        'ts': load_ts[keep],
+        'size_bytes': load_size[keep],
+        'stall_ms': stall_ms[keep],
+        'read_bytes': read_bytes[keep],
+        'cpu_peak': cpu_peak[keep],
+        'frametime_peak': frametime_peak[keep],
+    }
+
+
+def profile_sessions(paths: list, **options) -> dict:
+    """複数セッションをまとめて計測"""
+    parts = [profile_session(load_session(path), **options) for path in paths]
+    keys = ('ts', 'size_bytes', 'stall_ms', 'read_bytes', 'cpu_peak', 'frametime_peak')
+    if not parts:
+        return {key: np.empty(0) for key in keys}
+    return {key: np.concatenate([part[key] for part in parts]) for key in keys}
+
+
+def summarize(loads: dict, stall_budget_ms: float = STALL_BUDGET_MS) -> dict:
+    """サイズ帯別の分布と推奨最大ダウンロードサイズ"""
+    size_mb = loads['size_bytes'] / 1024 ** 2
+    known = np.isfinite(size_mb)
+    buckets = np.digitize(size_mb[known], SIZE_BUCKET_EDGES_MB)
+    stall = loads['stall_ms'][known]
+    read_mb = loads['read_bytes'][known] / 1024 ** 2
+
+    distribution = []
+    recommended_mb = None
+    for bucket in range(len(SIZE_BUCKET_EDGES_MB) + 1):
+        mask = buckets == bucket
+        count = int(mask.sum())
+        entry = {'bucket': bucket_label(bucket), 'count': count}
+        if count:
+            bucket_read = read_mb[mask]
+            entry.update({
+                'stall_median_ms': float(np.median(stall[mask])),
+                'stall_p95_ms': float(np.percentile(stall[mask], 95)),
+                'read_mb_mean': float(np.nanmean(bucket_read)) if np.isfinite(bucket_read).any() else None,
+            })
+        distribution.append(entry)
+
+    # 小さいサイズ帯から順に、予算内に収まる最大の上限を推奨値とする
+    for bucket, entry in enumerate(distribution[:len(SIZE_BUCKET_EDGES_MB)]):
+        if entry['count'] < MIN_LOADS_PER_BUCKET:
+            continue
+        if entry['stall_p95_ms'] > stall_budget_ms:
+            break
+        recommended_mb = SIZE_BUCKET_EDGES_MB[bucket]
+
+    return {
+        'total_loads': int(len(loads['ts'])),
+        'sized_loads': int(known.sum()),
+        'stall_budget_ms': stall_budget_ms,
+        'distribution': distribution,
+        'recommended_max_download_mb': recommended_mb,
+    }
+
+
+def load_profile(path: str = AVATAR_PROFILE_FILE):
+    """保存済みプロファイル結果（なければNone）"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"アバタープロファイル読み込みエラー: {e}")
+        return None
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='VRChatアバター読み込み影響プロファイラ')
+    parser.add_argument('sessions', nargs='*', help='セッションファイル（省略時は保存済み全セッション）')
+    parser.add_argument('--stall-budget', type=float, default=STALL_BUDGET_MS, help='許容スタール時間（ms）')
+    args = parser.parse_args()
+
+    paths = args.sessions or list_sessions()
+    if not paths:
+        print("セッションファイルがありません。FPS解析ツールで監視を実行してください。")
+        return
+
+    summary = summarize(profile_sessions(paths), args.stall_budget)
+    with open(AVATAR_PROFILE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"🎭 アバター読み込み {summary['total_loads']}件（サイズ判明 {summary['sized_loads']}件）")
+    for entry in summary['distribution']:
+        if entry['count']:
+            print(f"  {entry['bucket']:>10}: {entry['count']:4d}件 スタール 中央値 {entry['stall_median_ms']:.0f}ms"
+                  f" / 95%点 {entry['stall_p95_ms']:.0f}ms")
+    if summary['recommended_max_download_mb']:
+        print(f"💡 推奨 Avatar Max Download Size: {summary['recommended_max_download_mb']}MB")
+    else:
+        print("💡 推奨値を算出するにはデータが不足しています")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+宣言的な最適化プロファイル（望ましい状態）の計画・適用モジュール
+vr_optimization_profiles.json にプロファイル（extreme / performance / balanced）と
+GPUベンダー別の追加設定を記述し、現在の状態を一括で読み取って差分だけを変更します。
+
+  計画（plan）: レジストリはキーごとに1回だけ読み取り専用で開き、電源プランもレジストリから読む。
+               サービスの状態はサービスマネージャーに問い合わせる（外部コマンドは起動しない）
+  適用（apply）: 差分のみ。レジストリは vr_registry_batch でキー単位にまとめて書き込み、
+               電源プランは powercfg、サービスは sc stop で変更する
+
+最適化済みのPCでの再実行は読み取りのみで終わります。
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+import logging
+
+import psutil
+
+from vr_registry_batch import RegistryBatch, MemoryBackend, default_backend, infer_type, HKCU, HKLM
+from vr_settings_engine import HIVES, convert_data
+from vr_async_commands import run_command
+
+logger = logging.getLogger(__name__)
+
+PROFILES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vr_optimization_profiles.json')
+PROFILE_NAMES = ('extreme', 'performance', 'balanced')
+
+# アクティブな電源プランはレジストリから読む（powercfg /getactivescheme を起動しない）
+POWER_SCHEMES_KEY = "SYSTEM\\CurrentControlSet\\Control\\Power\\User\\PowerSchemes"
+ACTIVE_POWER_SCHEME = "ActivePowerScheme"
+
+
+def recommend_profile(score: int) -> str:
+    """パフォーマンススコアからプロファイルを決定"""
+    if score >= 70:
+        return 'balanced'  # バランス重視
+    elif score >= 50:
+        return 'performance'  # パフォーマンス重視
+    else:
+        return 'extreme'  # 極端パフォーマンス重視
+
+
+def load_profiles(path: str = PROFILES_FILE) -> dict:
+    """プロファイル定義ファイルを読み込む"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def normalize_registry_entry(entry: dict) -> dict:
+    """プロファイルのレジストリ項目を (hive, path, name, value, value_type, create) に正規化"""
+    hive = HIVES[entry.get('hive', HKCU).upper()]
+    if 'type' in entry:
+        value, value_type = convert_data(entry['type'], entry['value'])
+    else:
+        value, value_type = infer_type(entry['value'])
+    return {'hive': hive, 'path': entry['path'], 'name': entry['name'], 'value': value,
+            'value_type': value_type, 'create': entry.get('create', True)}
+
+
+def resolve_profile(profiles: dict, name: str, vendor: str = None) -> dict:
+    """継承（inherits）とGPUベンダー別設定を展開した望ましい状態を返す"""
+    chain = []
+    current = name
+    while current:
+        if current not in profiles['profiles']:
+            raise ValueError(f"未定義のプロファイル: {current}")
+        if current in chain:
+            raise ValueError(f"プロファイルの継承が循環しています: {' → '.join(chain + [current])}")
+        chain.append(current)
+        current = profiles['profiles'][current].get('inherits')
+
+    layers = [profiles['profiles'][n] for n in reversed(chain)]
+    if vendor and vendor in profiles.get('vendors', {}):
+        layers.append(profiles['vendors'][vendor])
+
+    registry = {}  # (hive, path小文字, 値名小文字) -> 項目（後の層が優先）
+    power_plan = None
+    services = []
+    for layer in layers:
+        for entry in layer.get('registry', []):
+            item = normalize_registry_entry(entry)
+            registry[(item['hive'], item['path'].lower(), item['name'].lower())] = item
+        power_plan = layer.get('power_plan', power_plan)
+        for service in layer.get('services_stopped', []):
+            if service not in services:
+                services.append(service)
+
+    return {'profile': name, 'vendor': vendor, 'registry': list(registry.values()),
+            'power_plan': power_plan, 'services_stopped': services}
+
+
+def active_power_scheme(registry):
+    """アクティブな電源プランのGUID（読めなければNone）"""
+    values = registry.read_key(HKLM, POWER_SCHEMES_KEY) or {}
+    for name, (data, _) in values.items():
+        if name.lower() == ACTIVE_POWER_SCHEME.lower():
+            return data
+    return None
+
+
+class WindowsState:
+    """実機の状態の読み取りと変更"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or default_backend()
+
+    def active_power_scheme(self):
+        return active_power_scheme(self.registry)
+
+    def service_status(self, name: str):
+        """サービスの状態（'running' / 'stopped' など。存在しなければNone）"""
+        try:
+            return psutil.win_service_get(name).status()
+        except Exception:
+            return None
+
+    def set_power_scheme(self, guid: str) -> bool:
+        return run_command(['powercfg', '/setactive', guid], timeout=10)['status'] == 'ok'
+
+    def stop_service(self, name: str) -> bool:
+        return run_command(['sc', 'stop', name], timeout=30)['status'] == 'ok'
+
+    def start_service(self, name: str) -> bool:
+        return run_command(['sc', 'start', name], timeout=30)['status'] == 'ok'
+
+    def read_dns(self, interface: str):
+        """インターフェースのDNS設定 {'source': 'dhcp' / 'static', 'servers': [...]}（読めなければNone）"""
+        result = run_command(['netsh', 'interface', 'ip', 'show', 'dnsservers', f'name={interface}'], timeout=10)
+        if result['status'] != 'ok':
+            return None
+        servers = re.findall(r'\b\d{1,3}(?:\.\d{1,3}){3}\b', result['stdout'])
+        return {'source': 'dhcp' if 'DHCP' in result['stdout'] else 'static', 'servers': servers}
+
+    def set_dns(self, interface: str, config: dict) -> bool:
+        """read_dns と同じ形式の設定を適用"""
+        if config['source'] == 'dhcp' or not config['servers']:
+            commands = [['netsh', 'interface', 'ip', 'set', 'dns', f'name={interface}', 'source=dhcp']]
+        else:
+            commands = [['netsh', 'interface', 'ip', 'set', 'dns', f'name={interface}', 'static', config['servers'][0]]]
+            commands += [['netsh', 'interface', 'ip', 'add', 'dns', f'name={interface}', server, f'index={i}']
+                         for i, server in enumerate(config['servers'][1:], start=2)]
+        # 順序が意味を持つため1件ずつ実行
+        return all([run_command(command, timeout=10)['status'] == 'ok' for command in commands])
+
+
+class MemoryState:
+    """メモリ上の状態（同じインターフェース。Linuxでの動作確認・ベンチマーク用）"""
+
+    def __init__(self, latency: float = 0.0, services: dict = None):
+        self.registry = MemoryBackend(latency)
+        self.services = dict(services or {})
+        self.dns = {}
+        self.commands = 0
+
+    def active_power_scheme(self):
+        return active_power_scheme(self.registry)
+
+    def service_status(self, name: str):
+        return self.services.get(name)
+
+    def set_power_scheme(self, guid: str) -> bool:
+        self.commands += 1
+        key = self.registry.open_key(HKLM, POWER_SCHEMES_KEY, True)
+        self.registry.set_value(key, ACTIVE_POWER_SCHEME, infer_type(guid)[1], guid)
+        self.registry.close_key(key)
+        return True
+
+    def stop_service(self, name: str) -> bool:
+        self.commands += 1
+        if name not in self.services:
+            return False
+        self.services[name] = 'stopped'
+        return True
+
+    def start_service(self, name: str) -> bool:
+        self.commands += 1
+        if name not in self.services:
+            return False
+        self.services[name] = 'running'
+        return True
+
+    def read_dns(self, interface: str):
+        return self.dns.get(interface)
+
+    def set_dns(self, interface: str, config: dict) -> bool:
+        self.commands += 1
+        self.dns[interface] = config
+        return True
+
+
+class DesiredStatePlanner:
+    """望ましい状態と現在の状態の差分（最小の変更セット）を計画・適用"""
+
+    def __init__(self, state=None):
+        self.state = state or WindowsState()
+
+    def read_registry(self, keys) -> dict:
+        """キーごとに1回だけ読み取り専用で開く → {(hive, path小文字): {値名小文字: (値, 型)} または None}"""
+        current = {}
+        for hive, path in keys:
+            lookup = (hive, path.lower())
+            if lookup in current:
+                continue
+            try:
+                values = self.state.registry.read_key(hive, path)
+            except Exception as e:
+                logger.debug(f"レジストリ読み取りエラー: {hive}\\{path} - {e}")
+                values = None
+            current[lookup] = None if values is None else {n.lower(): data for n, data in values.items()}
+        return current
+
+    def plan(self, desired: dict) -> dict:
+        """現在の状態を一括で読み取り、変更が必要な項目だけを返す"""
+        t0 = time.perf_counter()
+        keys = [(item['hive'], item['path']) for item in desired['registry']]
+        if desired['power_plan']:
+            keys.append((HKLM, POWER_SCHEMES_KEY))
+        current = self.read_registry(keys)
+
+        changes = []
+        skipped = []
+        for item in desired['registry']:
+            target = f"{item['hive']}\\{item['path']}\\{item['name']}"
+            values = current[(item['hive'], item['path'].lower())]
+            if values is None and not item['create']:
+                skipped.append(target)  # キーがない（ドライバ未導入など）
+                continue
+            existing = (values or {}).get(item['name'].lower())
+            if existing != (item['value'], item['value_type']):
+                changes.append({'kind': 'registry', 'target': target,
+                                'current': existing[0] if existing else None,
+                                'desired': item['value'], 'item': item})
+
+        if desired['power_plan']:
+            values = current[(HKLM, POWER_SCHEMES_KEY.lower())] or {}
+            existing = values.get(ACTIVE_POWER_SCHEME.lower())
+            active = existing[0] if existing else None
+            if not active or active.lower() != desired['power_plan'].lower():
+                changes.append({'kind': 'power_plan', 'target': ACTIVE_POWER_SCHEME,
+                                'current': active, 'desired': desired['power_plan']})
+
+        for service in desired['services_stopped']:
+            status = self.state.service_status(service)
+            if status is None:
+                skipped.append(f"service:{service}")
+            elif status != 'stopped':
+                changes.append({'kind': 'service', 'target': service, 'current': status, 'desired': 'stopped'})
+
+        checked = len(desired['registry']) + bool(desired['power_plan']) + len(desired['services_stopped'])
+        return {'profile': desired['profile'], 'vendor': desired['vendor'], 'changes': changes,
+                'skipped': skipped, 'checked': checked, 'read_seconds': time.perf_counter() - t0}
+
+    def apply(self, plan: dict, journal=None) -> dict:
+        """計画の変更だけを適用（各変更に status を付けて返す）
+
+        journal（vr_settings_journal のトランザクション）を渡すと、変更前の値を記録してから変更します。
+        """
+        t0 = time.perf_counter()
+        registry_changes = [c for c in plan['changes'] if c['kind'] == 'registry']
+        if registry_changes:
+            batch = RegistryBatch(self.state.registry, journal=journal)
+            for change in registry_changes:
+                item = change['item']
+                batch.set(item['path'], item['name'], item['value'], item['value_type'],
+                          hive=item['hive'], create=item['create'])
+            report = batch.apply()
+            results = {(e['hive'], e['path'].lower(), e['name'].lower()): e for e in report['values']}
+            for change in registry_changes:
+                item = change['item']
+                entry = results[(item['hive'], item['path'].lower(), item['name'].lower())]
+                change['status'] = 'error' if entry['status'] == 'error' else 'applied'
+                change['error'] = entry['error']
+
+        for change in plan['changes']:
+            if change['kind'] == 'registry':
+                continue
+            try:
+                if change['kind'] == 'power_plan':
+                    if journal is not None:
+                        journal.record('power', ACTIVE_POWER_SCHEME, change['current'], change['desired'])
+                    ok = self.state.set_power_scheme(change['desired'])
+                else:
+                    if journal is not None:
+                        journal.record('service', change['target'], change['current'], 'stopped')
+                    ok = self.state.stop_service(change['target'])
+                change['status'], change['error'] = ('applied', None) if ok else ('error', 'コマンド失敗')
+            except Exception as e:
+                change['status'], change['error'] = 'error', str(e)
+
+        applied = sum(1 for c in plan['changes'] if c['status'] == 'applied')
+        return {'applied': applied, 'errors': len(plan['changes']) - applied,
+                'changes': plan['changes'], 'apply_seconds': time.perf_counter() - t0}
+
+
+def format_plan(plan: dict) -> str:
+    """計画の表示用テキスト"""
+    lines = [f"📋 プロファイル: {plan['profile']}（GPU: {plan['vendor'] or '指定なし'}）"
+             f" - {plan['checked']}項目を確認 / 変更 {len(plan['changes'])}件"
+             f" / 対象外 {len(plan['skipped'])}件（読み取り {plan['read_seconds'] * 1000:.1f}ms）"]
+    for change in plan['changes']:
+        lines.append(f"  ~ [{change['kind']}] {change['target']}: {change['current']!r} → {change['desired']!r}")
+    if not plan['changes']:
+        lines.append("  ✅ 変更は不要です（すでに望ましい状態）")
+    return "\n".join(lines)
+
+
+def plan_profile(profile: str, vendor: str = None, state=None, profiles_path: str = PROFILES_FILE):
+    """プロファイルを読み込んで計画まで行う → (planner, plan)"""
+    desired = resolve_profile(load_profiles(profiles_path), profile, vendor)
+    planner = DesiredStatePlanner(state)
+    return planner, planner.plan(desired)
+
+
+def benchmark(latency: float = 0.0002, profile: str = 'extreme', vendor: str = 'NVIDIA'):
+    """メモリ上の状態で初回適用と最適化済みPCでの再実行を比較"""
+    services = dict.fromkeys(resolve_profile(load_profiles(), profile)['services_stopped'], 'running')
+    state = MemoryState(latency, services)
+
+    planner, plan = plan_profile(profile, vendor, state)
+    result = planner.apply(plan)
+    print(f"初回: 変更 {len(plan['changes'])}件 / 適用 {result['applied']}件 / 失敗 {result['errors']}件"
+          f"（計画 {plan['read_seconds'] * 1000:.1f}ms + 適用 {result['apply_seconds'] * 1000:.1f}ms）")
+
+    state.registry.calls = dict.fromkeys(state.registry.calls, 0)
+    state.commands = 0
+    t0 = time.perf_counter()
+    planner, plan = plan_profile(profile, vendor, state)
+    elapsed = time.perf_counter() - t0
+    calls = state.registry.calls
+    print(f"再実行: {elapsed * 1000:.1f}ms（API呼び出しあたり {latency * 1e6:.0f}µs）/ 変更 {len(plan['changes'])}件"
+          f" / 書き込み {calls['write']}回 / コマンド起動 {state.commands}回 / 読み取り {calls['read']}回（{plan['checked']}項目）")
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='宣言的な最適化プロファイルの計画・適用')
+    parser.add_argument('--profile', choices=PROFILE_NAMES, default='balanced', help='適用するプロファイル')
+    parser.add_argument('--vendor', choices=['AMD', 'NVIDIA'], help='GPUベンダー別の追加設定')
+    parser.add_argument('--profiles-file', default=PROFILES_FILE, help='プロファイル定義ファイル')
+    parser.add_argument('--apply', action='store_true', help='計画を表示した後に変更を適用（省略時は表示のみ）')
+    parser.add_argument('--benchmark', action='store_true', help='メモリ上の状態で再実行の所要時間を計測')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(profile=args.profile, vendor=args.vendor or 'NVIDIA')
+        return
+
+    planner, plan = plan_profile(args.profile, args.vendor, profiles_path=args.profiles_file)
+    print(format_plan(plan))
+    if args.apply and plan['changes']:
+        result = planner.apply(plan)
+        for change in result['changes']:
+            if change['status'] == 'error':
+                print(f"  ❌ {change['target']}: {change['error']}")
+        print(f"✅ 適用 {result['applied']}件 / 失敗 {result['errors']}件")
+
+
+if __name__ == "__main__":
+    main()
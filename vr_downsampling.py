@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+時系列ダウンサンプリングモジュール
+LTTB（Largest-Triangle-Three-Buckets）で表示幅（ピクセル数）まで点数を減らし、
+同じバケットの最小/最大エンベロープでスパイクを失わないようにします。
+結果は (系列名, 範囲, 幅, バージョン) ごとにキャッシュされます。
+"""
+
+import time
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+
+# バケット数 × バケット幅² がこれ以下なら選択表を一括計算（float64で約16MB）
+TABLE_MAX_CELLS = 2_000_000
+
+
+def bucket_bounds(n: int, n_buckets: int) -> np.ndarray:
+    """内側の点 [1, n-1) を n_buckets 個に分割したときの境界インデックス"""
+    return np.floor(np.linspace(1, n - 1, n_buckets + 1)).astype(np.int64)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int):
+    """LTTBで n_out 点まで間引いた (x, y) を返す
+
+    バケット平均・三角形面積はNumPyで一括計算し、前のバケットで選ばれた点に
+    依存する選択だけをバケット単位で行います。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    n_buckets = n_out - 2
+    bounds = bucket_bounds(n, n_buckets)
+    starts = bounds[:-1]
+    ends = np.maximum(bounds[1:], starts + 1)
+    lengths = ends - starts
+
+    # 各バケットの平均（次のバケットの代表点として使う）。最後は終端点
+    x_sum = np.add.reduceat(x[:n - 1], starts)
+    y_sum = np.add.reduceat(y[:n - 1], starts)
+    avg_x = np.append(x_sum[1:] / lengths[1:], x[-1])
+    avg_y = np.append(y_sum[1:] / lengths[1:], y[-1])
+
+    # バケットをパディングした2次元配列に並べる（範囲外はargmaxで選ばれないよう-inf面積）
+    width = int(lengths.max())
+    index = starts[:, None] + np.arange(width)[None, :]
+    pad = index >= ends[:, None]
+    index = np.minimum(index, n - 1)
+    bx = x[index]
+    by = y[index]
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    if n_buckets * width * width <= TABLE_MAX_CELLS:
+        # バケットが小さい場合（表示幅に対して点数が数倍程度のライブグラフ）:
+        # 「前のバケットで k 番目が選ばれたら、このバケットでは何番目を選ぶか」を全組み合わせについて
+        # 一括計算し、選択の連鎖は表を引くだけにする（バケットごとのNumPy呼び出しをなくす）
+        prev_x = np.vstack([np.full((1, width), x[0]), bx[:-1]])[:, :, None]
+        prev_y = np.vstack([np.full((1, width), y[0]), by[:-1]])[:, :, None]
+        area = np.abs((prev_x - avg_x[:, None, None]) * (by[:, None, :] - prev_y)
+                      - (prev_x - bx[:, None, :]) * (avg_y[:, None, None] - prev_y))
+        area[np.broadcast_to(pad[:, None, :], area.shape)] = -np.inf
+        choice = np.argmax(area, axis=2).tolist()
+        rows = index.tolist()
+        k = 0
+        for i in range(n_buckets):
+            k = choice[i][k]
+            selected[i + 1] = rows[i][k]
+        return x[selected], y[selected]
+
+    ax, ay = x[0], y[0]
+    for i in range(n_buckets):
+        area = np.abs((ax - avg_x[i]) * (by[i] - ay) - (ax - bx[i]) * (avg_y[i] - ay))
+        area[pad[i]] = -np.inf
+        j = index[i, int(np.argmax(area))]
+        selected[i + 1] = j
+        ax, ay = x[j], y[j]
+
+    return x[selected], y[selected]
+
+
+def minmax_envelope(x: np.ndarray, y: np.ndarray, n_buckets: int):
+    """バケットごとの (中心x, 最小y, 最大y)"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_buckets >= n:
+        return x, y, y
+    starts = np.floor(np.linspace(0, n, n_buckets + 1)[:-1]).astype(np.int64)
+    ends = np.append(starts[1:], n)
+    centers = (x[starts] + x[ends - 1]) / 2
+    return centers, np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)
+
+
+def downsample(x, y, width: int, envelope: bool = True) -> dict:
+    """表示幅 width に合わせて間引いた系列（NaNは除外）
+
+    戻り値: {'x', 'y'} と、envelope=True の場合 {'env_x', 'env_min', 'env_max'}
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if not valid.all():
+        x, y = x[valid], y[valid]
+
+    width = max(int(width), 3)
+    result = {}
+    result['x'], result['y'] = lttb(x, y, width)
+    if envelope:
+        result['env_x'], result['env_min'], result['env_max'] = minmax_envelope(x, y, width // 2)
+    return result
+
+
+class DownsampleCache:
+    """ダウンサンプリング結果のLRUキャッシュ"""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, series: str, x, y, width: int, version, envelope: bool = True) -> dict:
+        """(系列名, 範囲, 点数, 幅, バージョン) が一致すれば前回の結果を返す
+
+        y はキーに含めないため、データが変わるたびに version（累計サンプル数や
+        最終シーケンス番号など単調増加する値）を変えて渡してください。
+        """
+        n = len(x)
+        data_range = (float(x[0]), float(x[-1])) if n else (None, None)
+        key = (series, data_range, n, int(width), version, envelope)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        self.misses += 1
+        result = downsample(x, y, width, envelope)
+        self.entries[key] = result
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return result
+
+
+# モジュール共通キャッシュ
+default_cache = DownsampleCache()
+
+
+def downsample_cached(series: str, x, y, width: int, version, envelope: bool = True) -> dict:
+    """共通キャッシュ経由のダウンサンプリング"""
+    return default_cache.get(series, x, y, width, version, envelope)
+
+
+def benchmark(n: int = 1_000_000, width: int = 1000):
+    """処理時間とスパイク保持の確認"""
+    rng = np.random.default_rng(0)
+    x = np.arange(n, dtype=np.float64)
+    y = 11 + rng.normal(0, 0.5, n)
+    spikes = rng.choice(n, 20, replace=False)
+    y[spikes] += 50
+
+    t0 = time.perf_counter()
+    result = downsample(x, y, width)
+    elapsed = time.perf_counter() - t0
+
+    kept = np.isin(spikes, result['x'].astype(np.int64)).sum()
+    print(f"{n:,}点 → {len(result['x'])}点: {elapsed * 1000:.1f}ms"
+          f" / スパイク保持 {kept}/{len(spikes)}（エンベロープ最大値 {result['env_max'].max():.1f}）")
+
+    cache = DownsampleCache()
+    cache.get('bench', x, y, width, version=0)
+    t0 = time.perf_counter()
+    cache.get('bench', x, y, width, version=0)
+    print(f"キャッシュ命中: {(time.perf_counter() - t0) * 1e6:.0f}µs")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='時系列ダウンサンプリング（LTTB + 最小/最大エンベロープ）')
+    parser.add_argument('--benchmark', action='store_true', help='ベンチマーク実行')
+    parser.add_argument('--points', type=int, default=1_000_000, help='ベンチマークの点数')
+    parser.add_argument('--width', type=int, default=1000, help='出力点数（表示幅）')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.points, args.width)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
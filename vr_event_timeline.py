@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRイベント相関分析エンジン
+VRChatログイベント・プロセス起動/終了・最適化実行・警告を時系列インデックスに保存し、
+FPS低下（ディップ）の直前に発生したイベントを特定します。
+
+- イベント: SQLite（ts / kind+ts インデックス付き）
+- FPSサンプル: (timestamp, fps) の float64 追記専用バイナリ
+  → numpy配列として読み込み、searchsortedで範囲検索
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import argparse
+import logging
+from datetime import datetime
+
+import numpy as np
+import psutil
+
+from vrchat_log_parser import find_latest_log, read_log_events
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_DB = 'vr_event_timeline.db'
+FPS_SAMPLES_FILE = 'vr_fps_samples.bin'
+
+
+class EventTimeline:
+    """イベントとFPSサンプルの時系列インデックス"""
+
+    def __init__(self, db_path: str = TIMELINE_DB, samples_path: str = FPS_SAMPLES_FILE):
+        self.db_path = db_path
+        self.samples_path = samples_path
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                ts REAL NOT NULL,
+                kind TEXT NOT NULL,
+                label TEXT,
+                value REAL,
+                detail TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+            CREATE INDEX IF NOT EXISTS idx_events_kind_ts ON events(kind, ts);
+            CREATE TABLE IF NOT EXISTS log_offsets (
+                path TEXT PRIMARY KEY,
+                offset INTEGER NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+        self.pending_samples = []
+        self.samples_cache = (0, np.empty(0), np.empty(0))  # (読み込み済みバイト数, ts, fps)
+        self.process_names = None  # pid -> name（前回スナップショット）
+
+    # ---- 記録 ----
+
+    def add_event(self, kind: str, label: str = '', value: float = None, detail: str = '', ts: float = None):
+        """イベント1件を記録"""
+        self.add_events([{'ts': ts or time.time(), 'kind': kind, 'label': label,
+                          'value': value, 'detail': detail}])
+
+    def add_events(self, events: list):
+        """イベントの一括記録"""
+        if not events:
+            return
+        rows = [(e['ts'], e['kind'], e.get('label', ''), e.get('value'), e.get('detail', ''))
+                for e in events]
+        with self.lock:
+            self.conn.executemany('INSERT INTO events VALUES (?, ?, ?, ?, ?)', rows)
+            self.conn.commit()
+
+    def add_fps_sample(self, fps: float, ts: float = None, flush_every: int = 30):
+        """FPSサンプルを追加（flush_every件ごとにファイルへ追記）"""
+        self.pending_samples.append((ts or time.time(), fps))
+        if len(self.pending_samples) >= flush_every:
+            self.flush_samples()
+
+    def flush_samples(self):
+        """未書き込みのFPSサンプルを追記"""
+        if not self.pending_samples:
+            return
+        data = np.asarray(self.pending_samples, dtype=np.float64)
+        self.pending_samples = []
+        with self.lock:
+            with open(self.samples_path, 'ab') as f:
+                data.tofile(f)
+
+    def record_optimization(self, name: str, success: bool, duration: float = None):
+        """最適化ステップ実行の記録"""
+        self.add_event('optimization', name, duration, 'success' if success else 'failed')
+
+    def record_recovery(self, app: str, success: bool):
+        """自動復旧（アプリケーション再起動）の記録"""
+        self.add_event('recovery', app, None, 'success' if success else 'failed')
+
+    def record_alert(self, message: str):
+        """警告の記録"""
+        self.add_event('alert', message[:200])
+
+    def record_process_changes(self):
+        """前回呼び出し以降のプロセス起動/終了を記録"""
+        current_pids = set(psutil.pids())
+        if self.process_names is None:
+            self.process_names = {}
+            for pid in current_pids:
+                try:
+                    self.process_names[pid] = psutil.Process(pid).name()
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+            return
+
+        now = time.time()
+        events = []
+        for pid in current_pids - self.process_names.keys():
+            try:
+                name = psutil.Process(pid).name()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            self.process_names[pid] = name
+            events.append({'ts': now, 'kind': 'process_start', 'label': name, 'value': pid})
+
+        for pid in self.process_names.keys() - current_pids:
+            events.append({'ts': now, 'kind': 'process_exit', 'label': self.process_names.pop(pid), 'value': pid})
+
+        self.add_events(events)
+
+    def import_vrchat_log(self, path: str = None) -> list:
+        """VRChatログの未取り込み部分をイベントとして記録し、取り込んだイベントを返す"""
+        path = path or find_latest_log()
+        if not path or not os.path.exists(path):
+            return []
+
+        with self.lock:
+            row = self.conn.execute('SELECT offset FROM log_offsets WHERE path = ?', (path,)).fetchone()
+        offset = row[0] if row else 0
+
+        events, new_offset = read_log_events(path, offset)
+        if new_offset == offset:
+            return events  # 追記なし（監視ループから毎秒呼ばれるため書き込みを省く）
+        self.add_events(events)
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO log_offsets VALUES (?, ?)', (path, new_offset))
+            self.conn.commit()
+        return events
+
+    # ---- 読み込み ----
+
+    def load_samples(self, start: float = None, end: float = None):
+        """FPSサンプルを(ts, fps)配列で返す（追記分のみ差分読み込み）"""
+        self.flush_samples()
+        loaded_bytes, ts, fps = self.samples_cache
+
+        if os.path.exists(self.samples_path):
+            size = os.path.getsize(self.samples_path)
+            size -= size % 16
+            if size > loaded_bytes:
+                with open(self.samples_path, 'rb') as f:
+                    f.seek(loaded_bytes)
+                    new = np.fromfile(f, dtype=np.float64, count=(size - loaded_bytes) // 8).reshape(-1, 2)
+                ts = np.concatenate([ts, new[:, 0]])
+                fps = np.concatenate([fps, new[:, 1]])
+                if len(ts) > 1 and np.any(np.diff(ts) < 0):
+                    order = np.argsort(ts, kind='stable')
+                    ts, fps = ts[order], fps[order]
+                self.samples_cache = (size, ts, fps)
+
+        lo = 0 if start is None else np.searchsorted(ts, start, 'left')
+        hi = len(ts) if end is None else np.searchsorted(ts, end, 'right')
+        return ts[lo:hi], fps[lo:hi]
+
+    def load_events(self, start: float, end: float, kinds: list = None) -> dict:
+        """期間内のイベントを列ごとの配列（ts昇順）で返す"""
+        query = 'SELECT ts, kind, label, value FROM events WHERE ts BETWEEN ? AND ?'
+        params = [start, end]
+        if kinds:
+            query += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        query += ' ORDER BY ts'
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        return {
+            'ts': np.array([r[0] for r in rows], dtype=np.float64),
+            'kind': [r[1] for r in rows],
+            'label': [r[2] for r in rows],
+            'value': np.array([np.nan if r[3] is None else r[3] for r in rows], dtype=np.float64),
+        }
+
+    # ---- 分析 ----
+
+    @staticmethod
+    def detect_dips(ts: np.ndarray, fps: np.ndarray, drop_ratio: float = 0.2,
+                    baseline_samples: int = 60, min_baseline: float = 30.0) -> dict:
+        """FPSディップ検出（直前baseline_samples件の平均からdrop_ratio以上の低下）
+
+        fps=0（VRChat未起動）のサンプルは欠損として扱います。
+        """
+        empty = {'start': np.empty(0), 'end': np.empty(0), 'min_fps': np.empty(0),
+                 'baseline_fps': np.empty(0), 'drop': np.empty(0)}
+        if len(fps) <= baseline_samples:
+            return empty
+
+        valid = fps > 0
+        csum = np.concatenate([[0.0], np.cumsum(np.where(valid, fps, 0.0))])
+        ccount = np.concatenate([[0], np.cumsum(valid)])
+        idx = np.arange(len(fps))
+        lo = np.maximum(idx - baseline_samples, 0)
+        count = ccount[idx] - ccount[lo]
+        baseline = np.divide(csum[idx] - csum[lo], count, out=np.zeros(len(fps)), where=count > 0)
+
+        mask = valid & (baseline >= min_baseline) & (fps < baseline * (1 - drop_ratio))
+        if not mask.any():
+            return empty
+
+        padded = np.concatenate([[False], mask, [False]])
+        edges = np.diff(padded.astype(np.int8))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1) - 1
+
+        dip_fps = np.where(mask, fps, np.inf)
+        min_fps = np.minimum.reduceat(dip_fps, starts)
+
+        return {
+            'start': ts[starts],
+            'end': ts[ends],
+            'min_fps': min_fps,
+            'baseline_fps': baseline[starts],
+            'drop': baseline[starts] - min_fps,
+        }
+
+    def correlate(self, start: float = None, end: float = None, window: float = 30.0,
+                  kinds: list = None, **dip_options) -> list:
+        """各FPSディップについて、直前window秒以内のイベントを返す"""
+        ts, fps = self.load_samples(start, end)
+        dips = self.detect_dips(ts, fps, **dip_options)
+        if len(dips['start']) == 0:
+            return []
+
+        events = self.load_events(dips['start'][0] - window, dips['start'][-1], kinds)
+        lo = np.searchsorted(events['ts'], dips['start'] - window, 'left')
+        hi = np.searchsorted(events['ts'], dips['start'], 'right')
+
+        results = []
+        for i in range(len(dips['start'])):
+            results.append({
+                'start': float(dips['start'][i]),
+                'end': float(dips['end'][i]),
+                'min_fps': float(dips['min_fps'][i]),
+                'baseline_fps': float(dips['baseline_fps'][i]),
+                'drop': float(dips['drop'][i]),
+                'events': [
+                    {'ts': float(events['ts'][j]), 'kind': events['kind'][j],
+                     'label': events['label'][j], 'value': float(events['value'][j])}
+                    for j in range(lo[i], hi[i])
+                ],
+            })
+        return results
+
+    def drop_after_events(self, kind: str, min_value: float = None, horizon: float = 30.0,
+                          start: float = None, end: float = None) -> dict:
+        """指定イベント後のFPS低下量の統計
+
+        低下量 = イベント前horizon秒の平均FPS − イベント後horizon秒の最低FPS
+        例: drop_after_events('avatar_load', min_value=50 * 1024**2)
+        """
+        ts, fps = self.load_samples(start, end)
+        result = {'count': 0, 'median_drop': None, 'mean_drop': None, 'p90_drop': None}
+        if len(ts) == 0:
+            return result
+
+        events = self.load_events(ts[0], ts[-1], [kind])
+        event_ts = events['ts']
+        if min_value is not None:
+            event_ts = event_ts[events['value'] >= min_value]
+        if len(event_ts) == 0:
+            return result
+
+        valid = fps > 0
+        csum = np.concatenate([[0.0], np.cumsum(np.where(valid, fps, 0.0))])
+        ccount = np.concatenate([[0], np.cumsum(valid)])
+
+        pre_lo = np.searchsorted(ts, event_ts - horizon, 'left')
+        at = np.searchsorted(ts, event_ts, 'left')
+        post_hi = np.searchsorted(ts, event_ts + horizon, 'right')
+
+        pre_count = ccount[at] - ccount[pre_lo]
+        pre_mean = np.divide(csum[at] - csum[pre_lo], pre_count,
+                             out=np.full(len(at), np.nan), where=pre_count > 0)
+
+        # 各イベントの [at, post_hi) 区間の最小値をreduceatで一括計算
+        post_fps = np.concatenate([np.where(valid, fps, np.inf), [np.inf]])
+        bounds = np.empty(len(at) * 2, dtype=np.int64)
+        bounds[0::2] = at
+        bounds[1::2] = post_hi
+        post_min = np.minimum.reduceat(post_fps, bounds)[0::2]
+        post_min[post_hi <= at] = np.inf
+
+        drops = pre_mean - post_min
+        drops = drops[np.isfinite(drops)]
+        if len(drops) == 0:
+            return result
+
+        result.update({
+            'count': int(len(drops)),
+            'median_drop': float(np.median(drops)),
+            'mean_drop': float(np.mean(drops)),
+            'p90_drop': float(np.percentile(drops, 90)),
+        })
+        return result
+
+    def close(self):
+        """書き込み待ちサンプルを保存して閉じる"""
+        self.flush_samples()
+        with self.lock:
+            self.conn.close()
+
+
+def benchmark(days: int = 30, events_per_day: int = 2000):
+    """1か月分の合成データで相関クエリ時間を計測"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        timeline = EventTimeline(os.path.join(tmp, 'bench.db'), os.path.join(tmp, 'bench.bin'))
+        rng = np.random.default_rng(0)
+
+        n = days * 86400
+        ts = time.time() - n + np.arange(n, dtype=np.float64)
+        fps = rng.normal(85, 3, n)
+        event_ts = np.sort(rng.uniform(ts[0], ts[-1], days * events_per_day))
+        sizes = rng.uniform(1, 120, len(event_ts)) * 1024 ** 2
+        for t, size in zip(event_ts, sizes):
+            if size > 50 * 1024 ** 2:
+                i = int(t - ts[0])
+                fps[i + 2:i + 6] -= 35
+
+        np.column_stack([ts, fps]).tofile(timeline.samples_path)
+        timeline.add_events([{'ts': float(t), 'kind': 'avatar_load', 'label': 'bench', 'value': float(s)}
+                             for t, s in zip(event_ts, sizes)])
+
+        start = time.perf_counter()
+        dips = timeline.correlate(window=30, kinds=['avatar_load'])
+        correlate_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stats = timeline.drop_after_events('avatar_load', min_value=50 * 1024 ** 2)
+        aggregate_time = time.perf_counter() - start
+        timeline.close()
+
+    print(f"📊 合成データ: {days}日 / サンプル {n:,}件 / イベント {len(event_ts):,}件")
+    print(f"  ディップ相関: {len(dips)}件 - {correlate_time * 1000:.0f}ms")
+    print(f"  50MB超アバター後のFPS低下中央値: {stats['median_drop']:.1f} - {aggregate_time * 1000:.0f}ms")
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='VRイベント相関分析エンジン')
+    parser.add_argument('--import-log', action='store_true', help='最新のVRChatログを取り込み')
+    parser.add_argument('--correlate', action='store_true', help='FPSディップと直前イベントを表示')
+    parser.add_argument('--hours', type=float, default=24, help='分析対象期間（時間）')
+    parser.add_argument('--window', type=float, default=30, help='ディップ前の検索範囲（秒）')
+    parser.add_argument('--avatar-mb', type=float, help='指定MB超のアバター読み込み後のFPS低下統計')
+    parser.add_argument('--benchmark', action='store_true', help='1か月分の合成データでベンチマーク')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+
+    timeline = EventTimeline()
+    start = time.time() - args.hours * 3600
+
+    if args.import_log:
+        print(f"📥 VRChatログから {len(timeline.import_vrchat_log())} 件のイベントを取り込みました")
+
+    if args.correlate:
+        for dip in timeline.correlate(start=start, window=args.window):
+            when = datetime.fromtimestamp(dip['start']).strftime('%m-%d %H:%M:%S')
+            print(f"⚠️ {when} FPS {dip['baseline_fps']:.0f} → {dip['min_fps']:.0f}")
+            for event in dip['events']:
+                offset = dip['start'] - event['ts']
+                print(f"    -{offset:4.0f}s {event['kind']}: {event['label']}")
+
+    if args.avatar_mb is not None:
+        stats = timeline.drop_after_events('avatar_load', min_value=args.avatar_mb * 1024 ** 2, start=start)
+        if stats['count']:
+            print(f"🎭 {args.avatar_mb:.0f}MB超アバター読み込み後のFPS低下: "
+                  f"中央値 {stats['median_drop']:.1f} / 90%点 {stats['p90_drop']:.1f} ({stats['count']}件)")
+        else:
+            print("該当するアバター読み込みイベントがありません")
+
+    timeline.close()
+
+
+if __name__ == "__main__":
+    main()
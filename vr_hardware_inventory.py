@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ハードウェア情報キャッシュモジュール
+GPU・CPU・メモリの情報を一度だけ取得してファイルに保存し、各ツールで共有します。
+
+再検証は安価な指紋（フィンガープリント）だけで行います:
+  ディスプレイドライバー  レジストリのディスプレイアダプタークラス（DriverDesc / DriverVersion）
+                          → 変わっていたらGPU情報を wmic で取り直す
+  起動時刻                psutil.boot_time()
+                          → 変わっていたらCPU・メモリ情報を psutil で取り直す（CPU・メモリの交換は再起動を伴う）
+どちらも変わっていなければ wmic は起動せず、キャッシュをそのまま返します。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+
+import psutil
+
+from vr_async_commands import run_command
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vr_hardware_inventory.json')
+INVENTORY_VERSION = 1
+
+# ディスプレイアダプターのデバイスクラス
+DISPLAY_CLASS_KEY = "SYSTEM\\CurrentControlSet\\Control\\Class\\{4d36e968-e325-11ce-bfc1-08002be10318}"
+
+
+def classify_gpu(gpu_name: str) -> dict:
+    """GPU名からベンダーと性能ティアを判定"""
+    gpu_info = {'vendor': 'Unknown', 'name': gpu_name or 'Unknown', 'performance_tier': 'low'}
+    name = gpu_name.upper()
+
+    if any(x in name for x in ['AMD', 'RADEON']):
+        gpu_info['vendor'] = 'AMD'
+        if any(x in name for x in ['RX 6700', 'RX 6800', 'RX 6900', 'RX 7000']):
+            gpu_info['performance_tier'] = 'high'
+        elif any(x in name for x in ['RX 6600', 'RX 6500', 'RX 5700', 'RX 5600']):
+            gpu_info['performance_tier'] = 'medium'
+
+    elif any(x in name for x in ['NVIDIA', 'GEFORCE', 'RTX', 'GTX']):
+        gpu_info['vendor'] = 'NVIDIA'
+        if any(x in name for x in ['RTX 3070', 'RTX 3080', 'RTX 3090', 'RTX 40']):
+            gpu_info['performance_tier'] = 'high'
+        elif any(x in name for x in ['RTX 3060', 'GTX 1070', 'GTX 1080', 'RTX 2060', 'RTX 2070']):
+            gpu_info['performance_tier'] = 'medium'
+
+    elif 'INTEL' in name:
+        gpu_info['vendor'] = 'Intel'
+
+    return gpu_info
+
+
+GPU_TIER_SCORES = {'high': 30, 'medium': 20, 'low': 10}
+
+
+def performance_score(inventory: dict) -> int:
+    """パフォーマンススコア（低スペック基準、100点満点）"""
+    cpu_score = min(inventory['cpu_cores'] * 10, 40)  # 最大40点
+    memory_score = min(inventory['memory_gb'] * 2, 30)  # 最大30点
+    gpu_score = GPU_TIER_SCORES.get(inventory['gpu']['performance_tier'], 5)  # 最大30点
+    return cpu_score + memory_score + gpu_score
+
+
+class WindowsProbe:
+    """実機からの情報取得"""
+
+    def boot_time(self) -> float:
+        return psutil.boot_time()
+
+    def driver_fingerprint(self) -> list:
+        """ディスプレイドライバーの [説明, バージョン] 一覧（レジストリ読み取りのみ）"""
+        try:
+            import winreg
+        except ImportError:
+            return []
+        drivers = []
+        try:
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, DISPLAY_CLASS_KEY, 0, winreg.KEY_READ) as root:
+                index = 0
+                while True:
+                    try:
+                        subkey = winreg.EnumKey(root, index)
+                    except OSError:
+                        break
+                    index += 1
+                    if not subkey.isdigit():
+                        continue
+                    try:
+                        with winreg.OpenKey(root, subkey, 0, winreg.KEY_READ) as key:
+                            desc = winreg.QueryValueEx(key, "DriverDesc")[0]
+                            version = winreg.QueryValueEx(key, "DriverVersion")[0]
+                            drivers.append([desc, version])
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.debug(f"ドライバー情報の読み取りエラー: {e}")
+        return sorted(drivers)
+
+    def gpu_names(self) -> list:
+        result = run_command(['wmic', 'path', 'win32_VideoController', 'get', 'name'], timeout=10)
+        lines = [line.strip() for line in result['stdout'].splitlines() if line.strip()]
+        return [line for line in lines if line.lower() != 'name']
+
+    def cpu_memory(self) -> dict:
+        freq = psutil.cpu_freq()
+        return {
+            'cpu_cores': psutil.cpu_count(),
+            'cpu_freq': freq.max if freq else 0,
+            'memory_gb': round(psutil.virtual_memory().total / (1024**3)),
+        }
+
+
+class HardwareInventory:
+    """ハードウェア情報のキャッシュ"""
+
+    def __init__(self, path: str = INVENTORY_FILE, probe=None):
+        self.path = path
+        self.probe = probe or WindowsProbe()
+
+    def read_cache(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if data.get('version') == INVENTORY_VERSION else None
+        except (OSError, ValueError):
+            return None
+
+    def write_cache(self, data: dict):
+        """一時ファイルに書いてから置き換える（他のツールが読み込み中でも壊れない）"""
+        try:
+            directory = os.path.dirname(self.path) or '.'
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.vr_inventory_', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"ハードウェア情報キャッシュの保存エラー: {e}")
+
+    def gather_gpu(self) -> dict:
+        names = self.probe.gpu_names()
+        return classify_gpu(" / ".join(names))
+
+    def load(self, refresh: bool = False) -> dict:
+        """キャッシュを検証して返す（変わった部分だけ取り直す）
+
+        'source' に cache（すべてキャッシュ）/ partial（一部を再取得）/ full（すべて再取得）が入ります。
+        """
+        boot_time = self.probe.boot_time()
+        drivers = self.probe.driver_fingerprint()
+        cached = None if refresh else self.read_cache()
+
+        if cached is None:
+            data = {'version': INVENTORY_VERSION, 'boot_time': boot_time, 'drivers': drivers,
+                    'gpu': self.gather_gpu(), **self.probe.cpu_memory()}
+            source = 'full'
+        else:
+            data = cached
+            refreshed = []
+            # ドライバー一覧が取れない環境ではGPU情報をキャッシュのまま使う
+            if drivers and drivers != cached.get('drivers'):
+                data['gpu'] = self.gather_gpu()
+                data['drivers'] = drivers
+                refreshed.append('gpu')
+            if abs(boot_time - cached.get('boot_time', 0)) > 1:
+                data.update(self.probe.cpu_memory())
+                data['boot_time'] = boot_time
+                refreshed.append('cpu_memory')
+                # 前回GPUを検出できなかった場合（wmicのタイムアウト等）は再起動後に取り直す
+                if 'gpu' not in refreshed and data['gpu']['vendor'] == 'Unknown':
+                    data['gpu'] = self.gather_gpu()
+                    refreshed.append('gpu')
+            source = 'partial' if refreshed else 'cache'
+
+        if source != 'cache':
+            data['updated'] = time.time()
+            self.write_cache(data)
+            logger.info(f"ハードウェア情報を取得: {data['gpu']['vendor']} - {data['gpu']['performance_tier']}ティア"
+                        f" / CPU {data['cpu_cores']}コア / メモリ {data['memory_gb']}GB")
+
+        return dict(data, source=source)
+
+
+_inventory = None
+
+
+def get_inventory(refresh: bool = False) -> dict:
+    """プロセス内で共有するハードウェア情報（初回のみファイルを検証）"""
+    global _inventory
+    if _inventory is None or refresh:
+        _inventory = HardwareInventory().load(refresh)
+    return _inventory
+
+
+def get_gpu_info() -> dict:
+    """GPU情報 {'vendor', 'name', 'performance_tier'}（呼び出し側で変更してもよいコピー）"""
+    return dict(get_inventory()['gpu'])
+
+
+class SimulatedProbe(WindowsProbe):
+    """wmic の起動時間を模した取得（ベンチマーク用）"""
+
+    def __init__(self, wmic_seconds: float):
+        self.wmic_seconds = wmic_seconds
+        self.wmic_calls = 0
+
+    def driver_fingerprint(self) -> list:
+        return [["NVIDIA GeForce GTX 1070", "31.0.15.3623"]]
+
+    def gpu_names(self) -> list:
+        self.wmic_calls += 1
+        time.sleep(self.wmic_seconds)
+        return ["NVIDIA GeForce GTX 1070"]
+
+
+def benchmark(wmic_seconds: float = 1.5, rounds: int = 20):
+    """キャッシュなし（初回）とキャッシュあり（2回目以降）の取得時間を比較"""
+    probe = WindowsProbe() if os.name == 'nt' else SimulatedProbe(wmic_seconds)
+    with tempfile.TemporaryDirectory() as tmp:
+        inventory = HardwareInventory(os.path.join(tmp, 'inventory.json'), probe)
+
+        t0 = time.perf_counter()
+        cold = inventory.load()
+        cold_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            warm = inventory.load()
+        warm_seconds = (time.perf_counter() - t0) / rounds
+
+    label = "実機" if os.name == 'nt' else f"wmic {wmic_seconds}秒を模擬"
+    print(f"ハードウェア情報の取得（{label}）: {cold['gpu']['name']}")
+    print(f"  初回（キャッシュなし）: {cold_seconds * 1000:8.1f}ms  source={cold['source']}")
+    print(f"  2回目以降（検証のみ）: {warm_seconds * 1000:8.2f}ms  source={warm['source']}")
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='ハードウェア情報キャッシュ')
+    parser.add_argument('--refresh', action='store_true', help='キャッシュを使わずに取り直す')
+    parser.add_argument('--benchmark', action='store_true', help='初回と2回目以降の取得時間を比較')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+
+    inventory = get_inventory(args.refresh)
+    json.dump(inventory, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
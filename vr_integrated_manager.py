@@ -8,7 +8,9 @@ import psutil
 import threading
 from datetime import datetime
 from pathlib import Path
+from collections import deque
 from tqdm import tqdm
+from vr_event_timeline import EventTimeline
 
 # ログ設定
 logging.basicConfig(
@@ -27,6 +29,10 @@ class VRIntegratedManager:
         self.retry_delay = 10
         self.check_interval = 30  # 30秒間隔でチェック
         self.recovery_attempts = {}
+        self.timeline = EventTimeline()  # 復旧回数はメトリクスエクスポーターが集計
+        self.recovery_history = deque(maxlen=50)  # (時刻, プロセス名, 成功) ターミナルUI用
+        self.last_process_status = {}
+        self.next_check_at = None
         self.max_recovery_attempts = 3
         self.recovery_cooldown = 300  # 5分間のクールダウン
         self.monitoring_active = False
@@ -351,9 +357,11 @@ cd /d "{os.path.dirname(script_path)}"
         
         return True
     
-    def record_recovery_attempt(self, process_name):
+    def record_recovery_attempt(self, process_name, success):
         """復旧試行を記録"""
         current_time = time.time()
+        self.timeline.record_recovery(process_name, success)
+        self.recovery_history.append((current_time, process_name, success))
         
         if process_name not in self.recovery_attempts:
             self.recovery_attempts[process_name] = {
@@ -374,13 +382,14 @@ cd /d "{os.path.dirname(script_path)}"
             if self.should_attempt_recovery('VirtualDesktop.Streamer'):
                 logging.warning("Virtual Desktop Streamerが停止しています。復旧を試行中...")
                 
-                if self.restart_application('VirtualDesktop'):
+                success = self.restart_application('VirtualDesktop')
+                if success:
                     logging.info("✅ Virtual Desktop Streamerの復旧に成功しました")
                     recovery_performed = True
                 else:
                     logging.error("❌ Virtual Desktop Streamerの復旧に失敗しました")
                 
-                self.record_recovery_attempt('VirtualDesktop.Streamer')
+                self.record_recovery_attempt('VirtualDesktop.Streamer', success)
         
         # SteamVR監視
         if not processes['SteamVR'] and 'SteamVR' in self.found_paths:
@@ -391,26 +400,28 @@ cd /d "{os.path.dirname(script_path)}"
                     if self.restart_application('Steam'):
                         time.sleep(10)
                 
-                if self.restart_application('SteamVR'):
+                success = self.restart_application('SteamVR')
+                if success:
                     logging.info("✅ SteamVRの復旧に成功しました")
                     recovery_performed = True
                 else:
                     logging.error("❌ SteamVRの復旧に失敗しました")
                 
-                self.record_recovery_attempt('SteamVR')
+                self.record_recovery_attempt('SteamVR', success)
         
         # Steam監視
         if not processes['Steam'] and 'Steam' in self.found_paths and 'SteamVR' in self.found_paths:
             if self.should_attempt_recovery('Steam'):
                 logging.warning("Steamが停止しています。復旧を試行中...")
                 
-                if self.restart_application('Steam'):
+                success = self.restart_application('Steam')
+                if success:
                     logging.info("✅ Steamの復旧に成功しました")
                     recovery_performed = True
                 else:
                     logging.error("❌ Steamの復旧に失敗しました")
                 
-                self.record_recovery_attempt('Steam')
+                self.record_recovery_attempt('Steam', success)
         
         # VRChat監視（SteamVRが起動している場合のみ）
         if 'VRChat' in self.found_paths and processes['SteamVR']:
@@ -418,18 +429,19 @@ cd /d "{os.path.dirname(script_path)}"
                 if self.should_attempt_recovery('VRChat'):
                     logging.warning("VRChatが停止しています。復旧を試行中...")
                     
-                    if self.restart_application('VRChat'):
+                    success = self.restart_application('VRChat')
+                    if success:
                         logging.info("✅ VRChatの復旧に成功しました")
                         recovery_performed = True
                     else:
                         logging.error("❌ VRChatの復旧に失敗しました")
                     
-                    self.record_recovery_attempt('VRChat')
+                    self.record_recovery_attempt('VRChat', success)
         
         return recovery_performed
     
-    def monitor_and_recover(self):
-        """監視と自動復旧のメインループ"""
+    def monitor_and_recover(self, show_progress=True):
+        """監視と自動復旧のメインループ（show_progress=False でカウントダウン表示なし。ターミナルUI用）"""
         logging.info("VR自動復旧サービスを開始しました")
         logging.info(f"監視対象アプリケーション: {list(self.found_paths.keys())}")
         
@@ -438,6 +450,7 @@ cd /d "{os.path.dirname(script_path)}"
         try:
             while self.monitoring_active:
                 processes = self.get_vr_processes_status()
+                self.last_process_status = processes
                 
                 recovery_performed = self.check_and_recover_vr_environment()
                 
@@ -449,10 +462,15 @@ cd /d "{os.path.dirname(script_path)}"
                 
                 if recovery_performed:
                     logging.info("復旧処理が実行されました。10秒後に再チェックします...")
+                    self.next_check_at = time.time() + 10
                     time.sleep(10)
                     continue
                 
-                for i in tqdm(range(self.check_interval), desc="次回チェックまで", leave=False):
+                self.next_check_at = time.time() + self.check_interval
+                countdown = range(self.check_interval)
+                if show_progress:
+                    countdown = tqdm(countdown, desc="次回チェックまで", leave=False)
+                for i in countdown:
                     if not self.monitoring_active:
                         break
                     time.sleep(1)
@@ -478,6 +496,7 @@ def main():
     parser.add_argument('--status', action='store_true', help='自動実行設定状態を確認')
     parser.add_argument('--test', action='store_true', help='起動シーケンステスト')
     parser.add_argument('--monitor', action='store_true', help='自動復旧監視開始')
+    parser.add_argument('--tui', action='store_true', help='--monitor をターミナルダッシュボードで表示')
     
     args = parser.parse_args()
     
@@ -533,7 +552,11 @@ def main():
             print("❌ 監視対象のVRアプリケーションが見つかりません")
             return
         
-        manager.monitor_and_recover()
+        if args.tui:
+            from vr_terminal_ui import run_monitor_tui
+            run_monitor_tui(manager)
+        else:
+            manager.monitor_and_recover()
     
     else:
         print("🥽 VR環境統合管理ツール")
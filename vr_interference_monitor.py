@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRバックグラウンド干渉分析ツール
+フレームタイム/CPUスパイク発生時にCPU時間が増加した非VRプロセスを特定し、
+プロセスごとの干渉スコアとして蓄積します。
+
+蓄積したスコアは VROptimizerNoAdmin.optimize_process_priorities の
+優先度引き下げ対象リストとして使用されます。
+"""
+
+import os
+import json
+import time
+import psutil
+import threading
+import argparse
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# VR関連プロセス（干渉元として扱わない）
+VR_PROCESS_KEYWORDS = [
+    'vrchat', 'vrserver', 'vrcompositor', 'vrmonitor', 'vrdashboard', 'vrstartup',
+    'steamvr', 'virtualdesktop', 'oculus', 'ovrserver'
+]
+
+# 優先度を変更してはいけないシステムプロセス
+PROTECTED_PROCESSES = {
+    'system', 'system idle process', 'idle', 'registry', 'memory compression',
+    'smss.exe', 'csrss.exe', 'wininit.exe', 'winlogon.exe', 'services.exe',
+    'lsass.exe', 'svchost.exe', 'dwm.exe', 'explorer.exe', 'audiodg.exe',
+    'fontdrvhost.exe', 'python.exe', 'pythonw.exe', 'py.exe'
+}
+
+# 干渉スコアが蓄積されていない場合の優先度引き下げ対象
+FALLBACK_LOW_PRIORITY_PROCESSES = [
+    'chrome.exe', 'firefox.exe', 'discord.exe', 'spotify.exe'
+]
+
+SCORES_FILE = 'vr_interference_scores.json'
+
+
+def is_vr_process(name: str) -> bool:
+    """VR関連プロセス判定"""
+    name = name.lower()
+    return any(keyword in name for keyword in VR_PROCESS_KEYWORDS)
+
+
+class InterferenceAttributor:
+    """フレームタイムスパイクとバックグラウンドプロセスの関連付け"""
+
+    def __init__(self, scores_file: str = SCORES_FILE, window_size: int = 5,
+                 frametime_spike_ms: float = 11.1, cpu_spike_percent: float = 90.0,
+                 min_rise: float = 0.05, baseline_alpha: float = 0.1, score_decay: float = 0.99):
+        self.scores_file = scores_file
+        self.window_size = window_size
+        self.frametime_spike_ms = frametime_spike_ms
+        self.cpu_spike_percent = cpu_spike_percent
+        self.min_rise = min_rise  # スパイク時のCPU増加量の下限（コア数換算）
+        self.baseline_alpha = baseline_alpha
+        self.score_decay = score_decay
+
+        self.prev_cpu_times = {}  # pid -> (name, 累積CPU秒)
+        self.prev_sample_time = None
+        self.recent_rates = []  # 直近ウィンドウの {name: CPU使用率(コア換算)}
+        self.baseline = {}  # name -> 平常時CPU使用率のEWMA
+        self.scores = {}  # name -> {'score', 'spikes', 'last_spike'}
+        self.total_spikes = 0
+        self.lock = threading.Lock()
+
+        self.sampler_running = False
+        self.sampler_thread = None
+
+        self.load_scores()
+
+    def collect_cpu_rates(self) -> dict:
+        """全プロセスのCPU時間差分をプロセス名ごとに集計"""
+        now = time.monotonic()
+        current = {}
+        rates = {}
+        elapsed = now - self.prev_sample_time if self.prev_sample_time else 0
+
+        # process_iterはProcessオブジェクトをキャッシュするため、400プロセス規模でも1回の走査で済む
+        for proc in psutil.process_iter(['name', 'cpu_times']):
+            info = proc.info
+            cpu_times = info['cpu_times']
+            name = info['name']
+            if cpu_times is None or not name:
+                continue
+
+            name = name.lower()
+            total = cpu_times.user + cpu_times.system
+            current[proc.pid] = (name, total)
+
+            previous = self.prev_cpu_times.get(proc.pid)
+            if elapsed > 0 and previous is not None and previous[0] == name:
+                delta = total - previous[1]
+                if delta > 0:
+                    rates[name] = rates.get(name, 0.0) + delta / elapsed
+
+        # 終了したプロセスは現在のスナップショットに含まれないため自動的に破棄される
+        self.prev_cpu_times = current
+        self.prev_sample_time = now
+        return rates
+
+    def is_spike(self, frametime_ms: float = None, cpu_percent: float = None) -> bool:
+        """スパイク判定"""
+        if frametime_ms is not None and frametime_ms > self.frametime_spike_ms:
+            return True
+        if cpu_percent is not None and cpu_percent >= self.cpu_spike_percent:
+            return True
+        return False
+
+    def sample(self, frametime_ms: float = None, cpu_percent: float = None) -> list:
+        """1回分のサンプリングと干渉判定
+
+        スパイクが発生した場合、CPU使用率が平常時より増加した非VRプロセスを
+        増加量の大きい順に [(プロセス名, 増加量), ...] で返します。
+        """
+        rates = self.collect_cpu_rates()
+        if not rates:
+            return []
+
+        if cpu_percent is None:
+            cpu_percent = psutil.cpu_percent(interval=None)
+
+        with self.lock:
+            self.recent_rates.append(rates)
+            if len(self.recent_rates) > self.window_size:
+                self.recent_rates.pop(0)
+
+            if not self.is_spike(frametime_ms, cpu_percent):
+                # 平常時のみベースラインを更新（スパイク時の値で基準が汚れないように）
+                alpha = self.baseline_alpha
+                for name in self.baseline.keys() - rates.keys():
+                    self.baseline[name] *= (1 - alpha)
+                for name, rate in rates.items():
+                    base = self.baseline.get(name)
+                    self.baseline[name] = rate if base is None else base + alpha * (rate - base)
+                return []
+
+            return self.attribute_spike()
+
+    def attribute_spike(self) -> list:
+        """スパイクウィンドウ内でCPU使用率が上昇したプロセスをランク付け"""
+        window_peak = {}
+        for rates in self.recent_rates:
+            for name, rate in rates.items():
+                if rate > window_peak.get(name, 0.0):
+                    window_peak[name] = rate
+
+        ranking = []
+        for name, peak in window_peak.items():
+            if name in PROTECTED_PROCESSES or is_vr_process(name):
+                continue
+            rise = peak - self.baseline.get(name, 0.0)
+            if rise >= self.min_rise:
+                ranking.append((name, rise))
+        ranking.sort(key=lambda item: item[1], reverse=True)
+
+        self.total_spikes += 1
+        timestamp = datetime.now().isoformat(timespec='seconds')
+
+        for entry in self.scores.values():
+            entry['score'] *= self.score_decay
+
+        for name, rise in ranking:
+            entry = self.scores.setdefault(name, {'score': 0.0, 'spikes': 0, 'last_spike': None})
+            entry['score'] += rise
+            entry['spikes'] += 1
+            entry['last_spike'] = timestamp
+
+        if ranking:
+            top = ", ".join(f"{name}(+{rise:.2f})" for name, rise in ranking[:3])
+            logger.info(f"⚠️ スパイク検出 - 干渉候補: {top}")
+
+        return ranking
+
+    def get_low_priority_candidates(self, limit: int = 8, min_score: float = 0.5) -> list:
+        """干渉スコア上位のプロセス名を返す（データ不足時は空リスト）"""
+        with self.lock:
+            ranked = sorted(self.scores.items(), key=lambda item: item[1]['score'], reverse=True)
+        return [name for name, entry in ranked
+                if entry['score'] >= min_score and name not in PROTECTED_PROCESSES][:limit]
+
+    def load_scores(self):
+        """干渉スコアの読み込み"""
+        if not os.path.exists(self.scores_file):
+            return
+        try:
+            with open(self.scores_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.scores = data.get('scores', {})
+            self.total_spikes = data.get('total_spikes', 0)
+        except Exception as e:
+            logger.warning(f"干渉スコア読み込みエラー: {e}")
+
+    def save_scores(self):
+        """干渉スコアの保存"""
+        try:
+            with self.lock:
+                data = {
+                    'updated': datetime.now().isoformat(timespec='seconds'),
+                    'total_spikes': self.total_spikes,
+                    'scores': self.scores
+                }
+            with open(self.scores_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning(f"干渉スコア保存エラー: {e}")
+
+    def start_background_sampler(self, interval: float = 2.0):
+        """バックグラウンドサンプリング開始（CPUスパイクのみで判定）"""
+        if self.sampler_running:
+            return
+        self.sampler_running = True
+
+        def sampler_thread():
+            while self.sampler_running:
+                try:
+                    self.sample()
+                except Exception as e:
+                    logger.error(f"干渉サンプリングエラー: {e}")
+                time.sleep(interval)
+            self.save_scores()
+
+        self.sampler_thread = threading.Thread(target=sampler_thread, daemon=True)
+        self.sampler_thread.start()
+
+    def stop_background_sampler(self):
+        """バックグラウンドサンプリング停止"""
+        self.sampler_running = False
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='VRバックグラウンド干渉分析ツール')
+    parser.add_argument('--duration', type=int, default=600, help='収集時間（秒）')
+    parser.add_argument('--interval', type=float, default=2.0, help='サンプリング間隔（秒）')
+    parser.add_argument('--show', action='store_true', help='蓄積済みの干渉スコアを表示')
+    args = parser.parse_args()
+
+    attributor = InterferenceAttributor()
+
+    if not args.show:
+        print(f"📊 干渉データ収集中（{args.duration}秒）... 停止するには Ctrl+C を押してください")
+        end_time = time.monotonic() + args.duration
+        try:
+            while time.monotonic() < end_time:
+                attributor.sample()
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+        attributor.save_scores()
+
+    print(f"🔍 干渉スコア（スパイク {attributor.total_spikes} 回）:")
+    ranked = sorted(attributor.scores.items(), key=lambda item: item[1]['score'], reverse=True)
+    for name, entry in ranked[:15]:
+        print(f"  {name}: スコア {entry['score']:.2f} / スパイク {entry['spikes']}回")
+    if not ranked:
+        print("  データがありません")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRChat長時間セッション リソース増加予測モジュール
+VRChatのRSS/プライベートバイト・ハンドル数・スレッド数にTheil–Sen推定で頑健な傾向線を当てはめ、
+物理メモリ＋ページファイル空き容量に対する枯渇までの時間を予測します。
+枯渇が近い場合は「約N分以内の再起動を推奨」イベントを発行します。
+
+傾き行列はサンプルごとに新しい点の行/列だけを更新します（O(n)）。
+"""
+
+import time
+import argparse
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# 既定の監視窓（5秒間隔で約30分）
+DEFAULT_WINDOW = 360
+
+# 予測を出すために必要な最小サンプル数・最小観測時間（秒）
+MIN_SAMPLES = 24
+MIN_SPAN_SECONDS = 300
+
+# ハンドル数・スレッド数の実用上限（経験値。これを超えるとスタッター/クラッシュが増える）
+RESOURCE_SOFT_LIMITS = {
+    'handles': 100000,
+    'threads': 1500,
+}
+
+RESTART_WARNING_MINUTES = 60
+EVENT_COOLDOWN_SECONDS = 600
+
+
+class TheilSenTrend:
+    """固定長窓のTheil–Sen傾向推定（サンプル追加ごとに増分更新）"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self.ts = np.full(window, np.nan)
+        self.values = np.full(window, np.nan)
+        # slopes[i, j] = 点iと点jの傾き（片方が空ならnan）
+        self.slopes = np.full((window, window), np.nan)
+        self.upper = np.triu(np.ones((window, window), dtype=bool), k=1)
+        self.next_slot = 0
+        self.count = 0
+
+    def reset(self):
+        self.ts.fill(np.nan)
+        self.values.fill(np.nan)
+        self.slopes.fill(np.nan)
+        self.next_slot = 0
+        self.count = 0
+
+    def add(self, ts: float, value: float):
+        """サンプル追加：置き換えるスロットの行/列だけ傾きを再計算"""
+        slot = self.next_slot
+        self.ts[slot] = ts
+        self.values[slot] = value
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            row = (self.values - value) / (self.ts - ts)
+        row[~np.isfinite(row)] = np.nan
+        row[slot] = np.nan
+        self.slopes[slot, :] = row
+        self.slopes[:, slot] = row
+
+        self.next_slot = (slot + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+
+    def span(self) -> float:
+        """窓内の観測時間（秒）"""
+        if self.count < 2:
+            return 0.0
+        return float(np.nanmax(self.ts) - np.nanmin(self.ts))
+
+    def fit(self):
+        """(傾き/秒, 最新時刻での推定値) を返す（サンプル不足はNone）"""
+        if self.count < 2:
+            return None
+        pairs = self.slopes[self.upper]
+        pairs = pairs[~np.isnan(pairs)]
+        if len(pairs) == 0:
+            return None
+        slope = float(np.median(pairs))
+
+        valid = ~np.isnan(self.ts)
+        latest = float(np.nanmax(self.ts))
+        intercept = float(np.median(self.values[valid] - slope * (self.ts[valid] - latest)))
+        return slope, intercept
+
+
+class LeakPredictor:
+    """VRChatのリソース増加を追跡し、枯渇までの時間を予測"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW,
+                 warning_minutes: float = RESTART_WARNING_MINUTES,
+                 on_restart_recommended: Optional[Callable[[dict], None]] = None):
+        self.trends = {
+            'private_bytes': TheilSenTrend(window),
+            'handles': TheilSenTrend(window),
+            'threads': TheilSenTrend(window),
+        }
+        self.warning_minutes = warning_minutes
+        self.on_restart_recommended = on_restart_recommended
+        self.pid = None
+        self.last_event_time = 0.0
+        self.last_prediction = None
+
+    def reset(self):
+        for trend in self.trends.values():
+            trend.reset()
+        self.last_prediction = None
+
+    def sample_process(self, proc: psutil.Process, ts: float = None) -> Optional[dict]:
+        """VRChatプロセスを1回計測して予測を更新"""
+        ts = ts if ts is not None else time.time()
+        if proc.pid != self.pid:
+            # 再起動されたプロセスは別系列として扱う
+            self.reset()
+            self.pid = proc.pid
+
+        try:
+            with proc.oneshot():
+                mem = proc.memory_info()
+                private_bytes = getattr(mem, 'private', 0) or mem.rss
+                handles = proc.num_handles() if hasattr(proc, 'num_handles') else proc.num_fds()
+                threads = proc.num_threads()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+        vm = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        return self.add_sample(ts, private_bytes, handles, threads,
+                               memory_headroom=vm.available + swap.free)
+
+    def add_sample(self, ts: float, private_bytes: float, handles: float, threads: float,
+                   memory_headroom: float) -> Optional[dict]:
+        """サンプル追加と予測（十分なデータがない場合はNone）"""
+        self.trends['private_bytes'].add(ts, private_bytes)
+        self.trends['handles'].add(ts, handles)
+        self.trends['threads'].add(ts, threads)
+
+        trend = self.trends['private_bytes']
+        if trend.count < MIN_SAMPLES or trend.span() < MIN_SPAN_SECONDS:
+            return None
+
+        headroom = {
+            'private_bytes': memory_headroom,
+            'handles': RESOURCE_SOFT_LIMITS['handles'] - handles,
+            'threads': RESOURCE_SOFT_LIMITS['threads'] - threads,
+        }
+
+        resources = {}
+        for name, series in self.trends.items():
+            fitted = series.fit()
+            if fitted is None:
+                continue
+            slope, current = fitted
+            eta_minutes = None
+            if slope > 0 and headroom[name] > 0:
+                eta_minutes = headroom[name] / slope / 60
+            elif slope > 0:
+                eta_minutes = 0.0
+            resources[name] = {
+                'slope_per_hour': slope * 3600,
+                'current': current,
+                'headroom': headroom[name],
+                'eta_minutes': eta_minutes,
+            }
+
+        etas = [(r['eta_minutes'], name) for name, r in resources.items() if r['eta_minutes'] is not None]
+        prediction = {
+            'ts': ts,
+            'pid': self.pid,
+            'resources': resources,
+            'eta_minutes': min(etas)[0] if etas else None,
+            'limiting_resource': min(etas)[1] if etas else None,
+        }
+        self.last_prediction = prediction
+
+        if prediction['eta_minutes'] is not None and prediction['eta_minutes'] <= self.warning_minutes:
+            self.raise_restart_event(prediction)
+
+        return prediction
+
+    def raise_restart_event(self, prediction: dict):
+        """再起動推奨イベント（クールダウン付き）"""
+        if prediction['ts'] - self.last_event_time < EVENT_COOLDOWN_SECONDS:
+            return
+        self.last_event_time = prediction['ts']
+
+        event = dict(prediction)
+        event['message'] = (f"🔄 VRChatの再起動を推奨: 約{prediction['eta_minutes']:.0f}分以内に"
+                            f"{prediction['limiting_resource']}が枯渇する見込みです")
+        logger.warning(event['message'])
+        if self.on_restart_recommended:
+            try:
+                self.on_restart_recommended(event)
+            except Exception as e:
+                logger.error(f"再起動推奨イベント処理エラー: {e}")
+
+
+def find_vrchat_process() -> Optional[psutil.Process]:
+    """VRChatプロセスを取得"""
+    for proc in psutil.process_iter(['name']):
+        if proc.info['name'] and 'vrchat' in proc.info['name'].lower():
+            return proc
+    return None
+
+
+def benchmark(window: int = DEFAULT_WINDOW, samples: int = 5000):
+    """サンプルあたりの更新コスト計測"""
+    predictor = LeakPredictor(window=window)
+    rng = np.random.default_rng(0)
+    start_ts = time.time()
+    t0 = time.perf_counter()
+    for i in range(samples):
+        private_bytes = 3e9 + i * 2e5 + rng.normal(0, 5e7)
+        predictor.add_sample(start_ts + i * 5, private_bytes, 20000 + i, 300, memory_headroom=8e9 - i * 2e5)
+    elapsed = time.perf_counter() - t0
+    print(f"window={window}: {elapsed / samples * 1000:.3f} ms/サンプル")
+    prediction = predictor.last_prediction
+    if prediction:
+        slope = prediction['resources']['private_bytes']['slope_per_hour'] / 1024 ** 2
+        print(f"  推定増加率 {slope:.0f}MB/時（真値 {2e5 * 720 / 1024 ** 2:.0f}MB/時）"
+              f" / 枯渇予測 {prediction['eta_minutes']:.0f}分 ({prediction['limiting_resource']})")
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='VRChatリソース増加予測')
+    parser.add_argument('--interval', type=float, default=5.0, help='サンプリング間隔（秒）')
+    parser.add_argument('--warning-minutes', type=float, default=RESTART_WARNING_MINUTES,
+                        help='再起動推奨を出す残り時間（分）')
+    parser.add_argument('--benchmark', action='store_true', help='更新コストのベンチマーク')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        for window in (120, DEFAULT_WINDOW, 720):
+            benchmark(window)
+        return
+
+    predictor = LeakPredictor(warning_minutes=args.warning_minutes)
+    try:
+        while True:
+            proc = find_vrchat_process()
+            if proc:
+                prediction = predictor.sample_process(proc)
+                if prediction and prediction['eta_minutes'] is not None:
+                    print(f"⏳ 枯渇予測: {prediction['eta_minutes']:.0f}分 ({prediction['limiting_resource']})")
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
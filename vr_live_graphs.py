@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ブリッティングによるリアルタイムグラフ描画モジュール
+軸・グリッド・閾値線は一度だけ描画して背景として保存し、毎フレームは
+Line2D/エンベロープのデータ差し替えと変化したアーティストだけの再描画（blit）を行います。
+軸範囲が足りなくなった場合のみ全体を再描画します。
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from vr_downsampling import downsample_cached, default_cache
+
+# x軸（経過秒、最新=0）の初期幅と上限
+INITIAL_WINDOW_SECONDS = 60
+MAX_WINDOW_SECONDS = 3600
+
+
+class BlitGraphPanel:
+    """複数の軸に時系列を描くブリッティング対応パネル
+
+    specs: [{'ax': Axes, 'title': str, 'color': str, 'threshold': float or None}, ...]
+    """
+
+    def __init__(self, fig, specs: list, max_window: float = MAX_WINDOW_SECONDS):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.specs = specs
+        self.max_window = max_window
+        self.window = INITIAL_WINDOW_SECONDS
+        self.background = None
+        self.animated = []
+
+        for spec in specs:
+            ax = spec['ax']
+            ax.clear()
+            ax.set_title(spec['title'], color='white', fontsize=12)
+            ax.set_facecolor('#3b3b3b')
+            ax.grid(True, alpha=0.3)
+            ax.tick_params(colors='white')
+            ax.set_xlim(-self.window, 0)
+            ax.set_ylim(0, (spec.get('threshold') or 1) * 1.2)
+            if spec.get('threshold') is not None:
+                ax.axhline(y=spec['threshold'], color='red', linestyle='--', alpha=0.7, linewidth=1)
+
+            envelope = ax.fill_between([0, 0], [0, 0], [0, 0], color=spec['color'], alpha=0.2,
+                                       linewidth=0, animated=True)
+            line, = ax.plot([], [], color=spec['color'], linewidth=2, animated=True)
+            spec['line'] = line
+            spec['envelope'] = envelope
+            self.animated.extend([envelope, line])
+
+        fig.tight_layout()
+        self.draw_cid = self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event):
+        """全体描画（初回・リサイズ・軸範囲変更）の後に背景を保存し直す"""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        for artist in self.animated:
+            self.fig.draw_artist(artist)
+
+    def rescale_if_needed(self, ax, threshold, x_min: float, y_max: float) -> bool:
+        """データが軸範囲外に出た/大きく余った場合のみ範囲を変更（変更したらTrue）"""
+        changed = False
+
+        while -x_min > self.window and self.window < self.max_window:
+            self.window = min(self.window * 2, self.max_window)
+            changed = True
+        if changed:
+            for spec in self.specs:
+                spec['ax'].set_xlim(-self.window, 0)
+
+        top = ax.get_ylim()[1]
+        wanted = max(y_max, threshold or 0) * 1.2
+        if wanted > top or wanted < top * 0.5:
+            ax.set_ylim(0, max(wanted, 1))
+            changed = True
+        return changed
+
+    def update(self, series: list, version):
+        """各軸の (経過秒の配列[最新=0], 値の配列) を受け取り描画
+
+        version はデータが変わるたびに増える値（累計サンプル数など）。間引き結果のキャッシュキーに使います。
+        """
+        full_redraw = self.background is None
+        for spec, (x, y) in zip(self.specs, series):
+            if len(x) < 2:
+                continue
+            ax = spec['ax']
+            width = max(int(ax.get_window_extent().width), 50)
+            # 表示幅より点数が少なければ間引かないので、エンベロープは線と同じになる（計算・描画しない）
+            envelope = len(x) > width
+            reduced = downsample_cached(spec['title'], x, y, width, version, envelope)
+
+            spec['line'].set_data(reduced['x'], reduced['y'])
+            if envelope:
+                env_x = reduced['env_x']
+                verts = np.concatenate([np.column_stack([env_x, reduced['env_min']]),
+                                        np.column_stack([env_x[::-1], reduced['env_max'][::-1]])])
+                spec['envelope'].set_verts([verts])
+                y_max = float(np.max(reduced['env_max']))
+            else:
+                spec['envelope'].set_verts([])
+                y_max = float(np.max(reduced['y']))
+
+            if self.rescale_if_needed(ax, spec.get('threshold'), float(np.min(x)), y_max):
+                full_redraw = True
+
+        if full_redraw:
+            # draw_eventで背景保存とアニメーション部分の描画が行われる
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_animated()
+            self.canvas.blit(self.fig.bbox)
+
+    def disconnect(self):
+        self.canvas.mpl_disconnect(self.draw_cid)
+
+
+def legacy_update(fig, specs: list, series: list):
+    """従来の描画方式（軸クリア→全点再描画→tight_layout→全体描画）。ベンチマーク比較用"""
+    for spec, (x, y) in zip(specs, series):
+        ax = spec['ax']
+        ax.clear()
+        ax.set_facecolor('#3b3b3b')
+        ax.grid(True, alpha=0.3)
+        ax.tick_params(colors='white')
+        ax.set_title(spec['title'], color='white')
+        ax.plot(x, y, color=spec['color'], linewidth=2)
+        ax.axhline(y=spec['threshold'], color='red', linestyle='--', alpha=0.7, linewidth=1)
+    fig.tight_layout()
+    fig.canvas.draw()
+
+
+def benchmark(frames: int = 60, points: int = 1800):
+    """Aggキャンバスで従来方式とブリッティング方式の1フレームあたりの描画時間を比較"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    thresholds = [90, 80, 85, 11.1]
+    base = [np.full(points, 85.0), np.full(points, 40.0), np.full(points, 60.0), np.full(points, 11.5)]
+    noise = [rng.normal(0, 3, points) for _ in base]
+    x = np.arange(-points + 1, 1, dtype=np.float64) * 2
+
+    def make_specs():
+        fig, axes = plt.subplots(2, 2, figsize=(12, 6))
+        specs = [{'ax': ax, 'title': title, 'color': color, 'threshold': threshold}
+                 for ax, title, color, threshold in zip(axes.flat, ["FPS", "CPU (%)", "Memory (%)", "Frametime (ms)"],
+                                                        ["green", "orange", "blue", "red"], thresholds)]
+        return fig, specs
+
+    def frame_series(i):
+        return [(x, b + np.roll(n, i)) for b, n in zip(base, noise)]
+
+    fig, specs = make_specs()
+    t0 = time.perf_counter()
+    for i in range(frames):
+        legacy_update(fig, specs, frame_series(i))
+    legacy = (time.perf_counter() - t0) / frames
+    plt.close(fig)
+
+    fig, specs = make_specs()
+    panel = BlitGraphPanel(fig, specs)
+    fig.canvas.draw()
+    panel.update(frame_series(0), 0)
+    # フレームごとにバージョンを変えて渡すので、間引きは毎回キャッシュを使わずに計算される
+    misses_before = default_cache.misses
+    t0 = time.perf_counter()
+    for i in range(1, frames + 1):
+        panel.update(frame_series(i), i)
+    blit = (time.perf_counter() - t0) / frames
+    plt.close(fig)
+    misses = default_cache.misses - misses_before
+
+    print(f"{points}点 × 4グラフ / {frames}フレーム")
+    print(f"  従来方式:       {legacy * 1000:7.1f} ms/フレーム")
+    print(f"  ブリッティング: {blit * 1000:7.1f} ms/フレーム（{legacy / blit:.1f}倍高速、"
+          f"間引き {misses}/{frames * len(specs)}回を毎フレーム計算）")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='ブリッティングによるリアルタイムグラフ描画')
+    parser.add_argument('--benchmark', action='store_true', help='従来方式との描画時間比較')
+    parser.add_argument('--frames', type=int, default=60, help='ベンチマークのフレーム数')
+    parser.add_argument('--points', type=int, default=1800, help='1グラフあたりの点数')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.frames, args.points)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
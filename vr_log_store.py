@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GUIログ用 固定容量ログストアと仮想化ビュー
+最新N件をリングバッファに保持し、溢れた古いレコードはディスク上のログへ書き出します。
+レベル別インデックスと文字バイグラム索引により、レベル・文字列での絞り込みを全件走査なしで行います。
+ビューは表示中の行だけをTextウィジェットへ描画します。
+"""
+
+import os
+import bisect
+import tkinter as tk
+from tkinter import ttk
+from collections import deque
+from datetime import datetime
+
+LEVELS = ['INFO', 'WARNING', 'ERROR']
+DEFAULT_CAPACITY = 5000
+SPILL_BATCH = 200
+
+# メッセージ中の絵文字からレベルを推定
+LEVEL_MARKERS = [
+    ('ERROR', ('❌', 'エラー')),
+    ('WARNING', ('⚠️', '警告')),
+]
+
+
+def infer_level(text: str) -> str:
+    """ログ行からレベルを推定"""
+    for level, markers in LEVEL_MARKERS:
+        if any(marker in text for marker in markers):
+            return level
+    return 'INFO'
+
+
+def bigrams(text: str) -> set:
+    """索引用の文字バイグラム（小文字化）"""
+    text = text.lower()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class LogStore:
+    """固定容量のログレコードストア（古いレコードはspill_pathへ追記）"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, spill_path: str = None):
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.records = deque()  # (seq, level, text)
+        self.first_seq = 0
+        self.next_seq = 0
+        self.level_index = {level: deque() for level in LEVELS}
+        self.bigram_index = {}
+        self.spill_buffer = []
+        self.spilled_count = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def append(self, text: str, level: str = None) -> int:
+        """レコード追加（通し番号を返す）"""
+        level = level or infer_level(text)
+        seq = self.next_seq
+        self.next_seq += 1
+        self.records.append((seq, level, text))
+        self.level_index.setdefault(level, deque()).append(seq)
+        for gram in bigrams(text):
+            self.bigram_index.setdefault(gram, set()).add(seq)
+
+        if len(self.records) > self.capacity:
+            self.evict_oldest()
+        return seq
+
+    def evict_oldest(self):
+        seq, level, text = self.records.popleft()
+        self.first_seq = seq + 1
+        self.level_index[level].popleft()
+        for gram in bigrams(text):
+            postings = self.bigram_index.get(gram)
+            if postings is not None:
+                postings.discard(seq)
+                if not postings:
+                    del self.bigram_index[gram]
+
+        if self.spill_path:
+            self.spill_buffer.append(text)
+            if len(self.spill_buffer) >= SPILL_BATCH:
+                self.flush_spill()
+
+    def flush_spill(self):
+        """書き出し待ちの古いレコードをディスクへ追記"""
+        if not self.spill_buffer or not self.spill_path:
+            return
+        with open(self.spill_path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(self.spill_buffer) + '\n')
+        self.spilled_count += len(self.spill_buffer)
+        self.spill_buffer = []
+
+    def get(self, seq: int):
+        """通し番号でレコード取得（メモリ上にない場合はNone）"""
+        index = seq - self.first_seq
+        if 0 <= index < len(self.records):
+            return self.records[index]
+        return None
+
+    def matches(self, record, level: str = None, text: str = None) -> bool:
+        """1レコードが条件に一致するか（新規追加分の判定用）"""
+        _, record_level, record_text = record
+        if level and record_level != level:
+            return False
+        return not text or text.lower() in record_text.lower()
+
+    def query(self, level: str = None, text: str = None) -> list:
+        """条件に一致する通し番号リスト（昇順）"""
+        if not level and not text:
+            return list(range(self.first_seq, self.next_seq))
+
+        candidates = None
+        if level:
+            candidates = set(self.level_index.get(level, ()))
+
+        needle = (text or '').lower()
+        if len(needle) >= 2:
+            # 最も件数の少ないバイグラムから積集合を取る
+            postings = sorted((self.bigram_index.get(gram, set()) for gram in bigrams(needle)), key=len)
+            gram_hits = set(postings[0])
+            for posting in postings[1:]:
+                gram_hits &= posting
+                if not gram_hits:
+                    break
+            candidates = gram_hits if candidates is None else candidates & gram_hits
+        elif candidates is None:
+            candidates = range(self.first_seq, self.next_seq)
+
+        # バイグラムの積集合は候補なので、実際の部分文字列で確認
+        return sorted(seq for seq in candidates if self.matches(self.get(seq), level, needle))
+
+    def clear(self):
+        """全レコードをディスクへ書き出してからクリア"""
+        while self.records:
+            self.evict_oldest()
+        self.flush_spill()
+
+    def export(self, path: str):
+        """ディスクへ書き出し済みの分とメモリ上の分を順に書き出す（ウィジェット経由なし）"""
+        self.flush_spill()
+        with open(path, 'w', encoding='utf-8') as out:
+            if self.spill_path and os.path.exists(self.spill_path):
+                with open(self.spill_path, 'r', encoding='utf-8') as spilled:
+                    for chunk in iter(lambda: spilled.read(1 << 16), ''):
+                        out.write(chunk)
+            for _, _, text in self.records:
+                out.write(text + '\n')
+
+
+class VirtualLogView(ttk.Frame):
+    """表示中の行だけを描画するログビュー（レベル/文字列フィルタ付き）"""
+
+    def __init__(self, parent, store: LogStore, height: int = 15, **text_options):
+        super().__init__(parent)
+        self.store = store
+        self.level_filter = None
+        self.text_filter = ''
+        self.filtered = None  # フィルタなしのときはNone（全件）
+        self.top = 0  # 表示先頭位置（フィルタ結果内のインデックス）
+        self.follow = True
+
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill=tk.X)
+        ttk.Label(toolbar, text="レベル:").pack(side=tk.LEFT, padx=(0, 2))
+        self.level_var = tk.StringVar(value='ALL')
+        level_box = ttk.Combobox(toolbar, textvariable=self.level_var, values=['ALL'] + LEVELS,
+                                 width=9, state='readonly')
+        level_box.pack(side=tk.LEFT, padx=(0, 8))
+        level_box.bind('<<ComboboxSelected>>', lambda e: self.apply_filter())
+        ttk.Label(toolbar, text="検索:").pack(side=tk.LEFT, padx=(0, 2))
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(toolbar, textvariable=self.search_var, width=30)
+        search_entry.pack(side=tk.LEFT)
+        search_entry.bind('<Return>', lambda e: self.apply_filter())
+        self.count_label = ttk.Label(toolbar, text="")
+        self.count_label.pack(side=tk.RIGHT)
+
+        body = ttk.Frame(self)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.text = tk.Text(body, height=height, wrap=tk.NONE, **text_options)
+        self.scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.text.tag_configure('WARNING', foreground='#ffcc00')
+        self.text.tag_configure('ERROR', foreground='#ff5555')
+        self.text.config(state=tk.DISABLED)
+
+        self.text.bind('<MouseWheel>', self.on_mousewheel)
+        self.text.bind('<Button-4>', lambda e: self.scroll_lines(-3))
+        self.text.bind('<Button-5>', lambda e: self.scroll_lines(3))
+        self.text.bind('<Configure>', lambda e: self.render())
+
+    def visible_rows(self) -> int:
+        line_height = max(self.text.tk.call('font', 'metrics', self.text.cget('font'), '-linespace'), 1)
+        return max(self.text.winfo_height() // line_height, 1)
+
+    def total(self) -> int:
+        self.prune_filtered()
+        return len(self.store) if self.filtered is None else len(self.filtered)
+
+    def seq_at(self, index: int) -> int:
+        if self.filtered is None:
+            return self.store.first_seq + index
+        return self.filtered[index]
+
+    def prune_filtered(self):
+        """リングから押し出されたレコードをフィルタ結果から除く"""
+        if self.filtered and self.filtered[0] < self.store.first_seq:
+            del self.filtered[:bisect.bisect_left(self.filtered, self.store.first_seq)]
+
+    def append_lines(self, lines: list):
+        """ログ行の一括追加（メインループで実行）"""
+        for line in lines:
+            seq = self.store.append(line)
+            if self.filtered is not None and self.store.matches(self.store.get(seq), self.level_filter, self.text_filter):
+                self.filtered.append(seq)
+        self.render()
+
+    def apply_filter(self):
+        level = self.level_var.get()
+        self.level_filter = None if level == 'ALL' else level
+        self.text_filter = self.search_var.get().strip()
+        if self.level_filter or self.text_filter:
+            self.filtered = self.store.query(self.level_filter, self.text_filter)
+        else:
+            self.filtered = None
+        self.follow = True
+        self.render()
+
+    def clear(self):
+        self.store.clear()
+        if self.filtered is not None:
+            self.filtered = []
+        self.top = 0
+        self.render()
+
+    def render(self):
+        """表示範囲の行だけを描画"""
+        total = self.total()
+        rows = self.visible_rows()
+        if self.follow:
+            self.top = max(total - rows, 0)
+        self.top = min(max(self.top, 0), max(total - rows, 0))
+
+        self.text.config(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        for index in range(self.top, min(self.top + rows, total)):
+            _, level, line = self.store.get(self.seq_at(index))
+            self.text.insert(tk.END, line + '\n', level)
+        self.text.config(state=tk.DISABLED)
+
+        if total:
+            self.scrollbar.set(self.top / total, min((self.top + rows) / total, 1.0))
+        else:
+            self.scrollbar.set(0, 1)
+        spilled = f" / 書き出し済み {self.store.spilled_count}件" if self.store.spilled_count else ""
+        self.count_label.config(text=f"{total}件{spilled}")
+
+    def scroll_lines(self, delta: int):
+        total = self.total()
+        rows = self.visible_rows()
+        self.top = min(max(self.top + delta, 0), max(total - rows, 0))
+        self.follow = self.top >= total - rows
+        self.render()
+
+    def on_mousewheel(self, event):
+        self.scroll_lines(-3 if event.delta > 0 else 3)
+
+    def on_scrollbar(self, *args):
+        total = self.total()
+        rows = self.visible_rows()
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = rows if args[2] == 'pages' else 1
+            self.top += int(args[1]) * step
+        self.top = min(max(self.top, 0), max(total - rows, 0))
+        self.follow = self.top >= total - rows
+        self.render()
+
+
+def default_spill_path(prefix: str) -> str:
+    """GUIセッションごとのディスク書き出し先"""
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
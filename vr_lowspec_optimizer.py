@@ -13,16 +13,28 @@ import json
 import time
 import psutil
 import winreg
-import subprocess
 import threading
+from concurrent.futures import Future
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox
 from pathlib import Path
 from datetime import datetime
 import logging
 from tqdm import tqdm
 import tempfile
 import argparse
+from vr_event_timeline import EventTimeline
+from vr_avatar_profiler import load_profile
+from vr_leak_predictor import LeakPredictor
+from vr_ui_event_bus import UIEventBus
+from vr_log_store import LogStore, VirtualLogView, default_spill_path
+from vr_registry_batch import RegistryBatch, HKLM, apply_settings as apply_registry_settings, summarize as summarize_registry
+from vr_step_executor import StepExecutor, step, format_report, REGISTRY, COMMAND
+from vr_desired_state import WindowsState, plan_profile, format_plan, recommend_profile
+from vr_settings_journal import SettingsJournal, SERVICE, POWER
+from vr_async_commands import run_command, run_commands
+from vr_hardware_inventory import get_inventory, get_gpu_info, performance_score, GPU_TIER_SCORES
+from vr_startup_fast import run_startup
 
 # ログ設定
 logging.basicConfig(
@@ -35,89 +47,101 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Windowsログオン時に実行するスクリプト
+STARTUP_SCRIPT = 'vr_startup_fast.py'
+
 class LowSpecVROptimizer:
     """低スペック特化VR最適化クラス"""
     
-    def __init__(self):
-        self.system_info = self.analyze_system()
-        self.optimization_profile = self.determine_optimization_profile()
+    def __init__(self, refresh_hardware: bool = False, analyze: bool = True):
+        # システム分析はバックグラウンドで開始し、結果が必要になった時点で待つ
+        # （analyze=False の場合は初めて参照された時点で開始）
+        self.analysis_future = None
+        self.analysis_lock = threading.Lock()
+        self.profile_override = None
+        if analyze:
+            self.start_analysis(refresh_hardware)
         self.startup_registry_key = "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Run"
         self.startup_name = "VRLowSpecOptimizer"
         self.vrchat_monitor_running = False
         self.optimization_applied = False
+        self.journal_transaction = None  # 実行中は変更前の値をジャーナルに記録
+        
+        # 長時間セッションのリソース増加予測（再起動推奨イベントはコールバックで通知）
+        self.leak_predictor = LeakPredictor()
         
-    def analyze_system(self) -> dict:
-        """システム分析"""
+    def start_analysis(self, refresh: bool = False) -> Future:
+        """システム分析をバックグラウンドで開始（実行中・完了済みの分析があればそれを返す）
+
+        結果は (system_info, optimization_profile) のタプルです。
+        """
+        with self.analysis_lock:
+            if self.analysis_future is not None and not refresh:
+                return self.analysis_future
+            future = Future()
+            self.analysis_future = future
+
+        def analysis_thread():
+            try:
+                system_info = self.analyze_system(refresh)
+                future.set_result((system_info, self.determine_optimization_profile(system_info)))
+            except Exception as e:
+                logger.error(f"システム分析エラー: {e}")
+                future.set_exception(e)
+
+        threading.Thread(target=analysis_thread, daemon=True, name='system-analysis').start()
+        return future
+    
+    @property
+    def system_info(self) -> dict:
+        """システム分析結果（分析が終わるまで待つ）"""
+        return self.start_analysis().result()[0]
+    
+    @property
+    def optimization_profile(self) -> str:
+        """最適化プロファイル（指定がなければ分析結果から決定）"""
+        if self.profile_override:
+            return self.profile_override
+        return self.start_analysis().result()[1]
+    
+    @optimization_profile.setter
+    def optimization_profile(self, profile: str):
+        self.profile_override = profile
+    
+    def analyze_system(self, refresh: bool = False) -> dict:
+        """システム分析（ハードウェア情報はキャッシュを検証して使用）"""
+        inventory = get_inventory(refresh)
         info = {
-            'cpu_cores': psutil.cpu_count(),
-            'cpu_freq': psutil.cpu_freq().max if psutil.cpu_freq() else 0,
-            'memory_gb': round(psutil.virtual_memory().total / (1024**3)),
-            'gpu_info': self.detect_gpu(),
+            'cpu_cores': inventory['cpu_cores'],
+            'cpu_freq': inventory['cpu_freq'],
+            'memory_gb': inventory['memory_gb'],
+            'gpu_info': dict(inventory['gpu']),
             'performance_score': 0
         }
+        logger.info(f"GPU検出: {info['gpu_info']['vendor']} - {info['gpu_info']['performance_tier']}ティア"
+                    f"（{inventory['source']}）")
         
         # パフォーマンススコア計算（低スペック基準）
-        cpu_score = min(info['cpu_cores'] * 10, 40)  # 最大40点
-        memory_score = min(info['memory_gb'] * 2, 30)  # 最大30点
-        gpu_score = self.calculate_gpu_score(info['gpu_info'])  # 最大30点
-        
-        info['performance_score'] = cpu_score + memory_score + gpu_score
+        info['performance_score'] = performance_score(inventory)
         logger.info(f"システムパフォーマンススコア: {info['performance_score']}/100")
         
         return info
     
     def detect_gpu(self) -> dict:
         """GPU検出と性能評価"""
-        gpu_info = {'vendor': 'Unknown', 'name': 'Unknown', 'performance_tier': 'low'}
-        
         try:
-            result = subprocess.run(['wmic', 'path', 'win32_VideoController', 'get', 'name'], 
-                                  capture_output=True, text=True, timeout=10)
-            gpu_name = result.stdout.strip()
-            
-            if any(x in gpu_name.upper() for x in ['AMD', 'RADEON']):
-                gpu_info['vendor'] = 'AMD'
-                # AMD GPU性能ティア判定
-                if any(x in gpu_name.upper() for x in ['RX 6700', 'RX 6800', 'RX 6900', 'RX 7000']):
-                    gpu_info['performance_tier'] = 'high'
-                elif any(x in gpu_name.upper() for x in ['RX 6600', 'RX 6500', 'RX 5700', 'RX 5600']):
-                    gpu_info['performance_tier'] = 'medium'
-                else:
-                    gpu_info['performance_tier'] = 'low'
-                    
-            elif any(x in gpu_name.upper() for x in ['NVIDIA', 'GEFORCE', 'RTX', 'GTX']):
-                gpu_info['vendor'] = 'NVIDIA'
-                # NVIDIA GPU性能ティア判定
-                if any(x in gpu_name.upper() for x in ['RTX 3070', 'RTX 3080', 'RTX 3090', 'RTX 40']):
-                    gpu_info['performance_tier'] = 'high'
-                elif any(x in gpu_name.upper() for x in ['RTX 3060', 'GTX 1070', 'GTX 1080', 'RTX 2060', 'RTX 2070']):
-                    gpu_info['performance_tier'] = 'medium'
-                else:
-                    gpu_info['performance_tier'] = 'low'
-                    
-            gpu_info['name'] = gpu_name
-            logger.info(f"GPU検出: {gpu_info['vendor']} - {gpu_info['performance_tier']}ティア")
-            
+            return get_gpu_info()
         except Exception as e:
             logger.warning(f"GPU検出エラー: {e}")
-        
-        return gpu_info
+            return {'vendor': 'Unknown', 'name': 'Unknown', 'performance_tier': 'low'}
     
     def calculate_gpu_score(self, gpu_info: dict) -> int:
         """GPU性能スコア計算"""
-        tier_scores = {'high': 30, 'medium': 20, 'low': 10}
-        return tier_scores.get(gpu_info['performance_tier'], 5)
+        return GPU_TIER_SCORES.get(gpu_info['performance_tier'], 5)
     
-    def determine_optimization_profile(self) -> str:
+    def determine_optimization_profile(self, system_info: dict) -> str:
         """最適化プロファイル決定"""
-        score = self.system_info['performance_score']
-        
-        if score >= 70:
-            return 'balanced'  # バランス重視
-        elif score >= 50:
-            return 'performance'  # パフォーマンス重視
-        else:
-            return 'extreme'  # 極端パフォーマンス重視
+        return recommend_profile(system_info['performance_score'])
     
     def optimize_cpu_extreme(self) -> bool:
         """CPU極端最適化（管理者権限不要版）"""
@@ -127,8 +151,12 @@ class LowSpecVROptimizer:
             # ユーザーレベルでのCPU最適化（管理者権限不要）
             try:
                 # 電源プランをHigh Performanceに設定（管理者権限不要）
-                subprocess.run(['powercfg', '/setactive', '8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c'], 
-                              capture_output=True, timeout=10)
+                high_performance = '8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c'
+                if self.journal_transaction is not None:
+                    previous = WindowsState().active_power_scheme()
+                    if previous != high_performance:
+                        self.journal_transaction.record(POWER, "ActivePowerScheme", previous, high_performance)
+                run_command(['powercfg', '/setactive', high_performance], timeout=10)
                 logger.info("電源プランを高パフォーマンスに設定")
             except Exception:
                 pass
@@ -145,16 +173,6 @@ class LowSpecVROptimizer:
             except Exception:
                 pass
             
-            # スケジューラー最適化
-            try:
-                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, 
-                                  "SYSTEM\\CurrentControlSet\\Control\\PriorityControl", 0, 
-                                  winreg.KEY_SET_VALUE) as key:
-                    winreg.SetValueEx(key, "Win32PrioritySeparation", 0, winreg.REG_DWORD, 38)  # フォアグラウンド優先
-                    logger.info("CPU スケジューラーを最適化しました")
-            except Exception:
-                pass
-            
             # VRプロセスの高優先度設定
             vr_processes = ['vrchat', 'steamvr', 'vrserver', 'vrmonitor', 'virtualdesktop']
             optimized_count = 0
@@ -177,6 +195,20 @@ class LowSpecVROptimizer:
             logger.error(f"CPU極端最適化でエラー: {e}")
             return False
     
+    def optimize_cpu_scheduler(self) -> bool:
+        """CPUスケジューラー最適化（レジストリ）"""
+        try:
+            report = RegistryBatch(hive=HKLM, journal=self.journal_transaction).set(
+                "SYSTEM\\CurrentControlSet\\Control\\PriorityControl", "Win32PrioritySeparation", 38,  # フォアグラウンド優先
+                create=False).apply()
+            if not report['errors']:
+                logger.info("CPU スケジューラーを最適化しました")
+            return True
+            
+        except Exception as e:
+            logger.error(f"CPUスケジューラー最適化でエラー: {e}")
+            return False
+    
     def optimize_gpu_lowspec(self) -> bool:
         """低スペックGPU特化最適化（管理者権限不要）"""
         try:
@@ -191,15 +223,8 @@ class LowSpecVROptimizer:
                 ("SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\Multimedia\\SystemProfile\\Tasks\\Games", "SFIO Priority", "High"),
             ]
             
-            for reg_path, value_name, value_data in gpu_settings:
-                try:
-                    with winreg.CreateKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-                        if isinstance(value_data, str):
-                            winreg.SetValueEx(key, value_name, 0, winreg.REG_SZ, value_data)
-                        else:
-                            winreg.SetValueEx(key, value_name, 0, winreg.REG_DWORD, value_data)
-                except Exception:
-                    pass
+            # 書き込みはキーごとにまとめ、現在値と異なるものだけ最後に適用
+            batch = RegistryBatch(journal=self.journal_transaction).extend(gpu_settings)
             
             if gpu_info['vendor'] == 'AMD':
                 # AMD特化設定（ユーザーレベル）
@@ -208,13 +233,7 @@ class LowSpecVROptimizer:
                     ("SOFTWARE\\AMD\\CN\\OverDrive", "PowerTuneEnable", 1),
                 ]
                 
-                for reg_path, value_name, value_data in amd_settings:
-                    try:
-                        with winreg.CreateKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-                            winreg.SetValueEx(key, value_name, 0, winreg.REG_DWORD, value_data)
-                    except Exception:
-                        pass
-                
+                batch.extend(amd_settings)
                 logger.info("AMD GPU低スペック設定を適用しました")
                 logger.info("💡 重要: VRChatに '--enable-hw-video-decoding' 追加を強く推奨")
                 
@@ -225,58 +244,52 @@ class LowSpecVROptimizer:
                     ("SOFTWARE\\NVIDIA Corporation\\Global\\NVTweak", "AAMode", 0),  # アンチエイリアシング無効
                 ]
                 
-                for reg_path, value_name, value_data in nvidia_settings:
-                    try:
-                        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path, 0, 
-                                          winreg.KEY_SET_VALUE) as key:
-                            winreg.SetValueEx(key, value_name, 0, winreg.REG_DWORD, value_data)
-                    except Exception:
-                        pass
-                
+                batch.extend(nvidia_settings, create=False)  # ドライバ未導入ならキーは作らない
                 logger.info("NVIDIA GPU低スペック設定を適用しました")
             
-            # 共通GPU最適化
-            try:
-                with winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                                  "SOFTWARE\\Microsoft\\DirectX\\UserGpuPreferences", 0, 
-                                  winreg.KEY_SET_VALUE) as key:
-                    # VRアプリを高性能GPU優先に
-                    vrchat_path = self.find_vrchat_path()
-                    if vrchat_path:
-                        winreg.SetValueEx(key, vrchat_path, 0, winreg.REG_SZ, "GpuPreference=2;")
-                        logger.info("VRChat GPU優先度を設定しました")
-            except Exception:
-                pass
+            # 共通GPU最適化（VRアプリを高性能GPU優先に）
+            vrchat_path = self.find_vrchat_path()
+            if vrchat_path:
+                batch.set("SOFTWARE\\Microsoft\\DirectX\\UserGpuPreferences", vrchat_path, "GpuPreference=2;",
+                          create=False)
             
+            logger.info(summarize_registry(batch.apply()))
             return True
             
         except Exception as e:
             logger.error(f"GPU最適化でエラー: {e}")
             return False
     
-    def optimize_memory_aggressive(self) -> bool:
-        """メモリ積極的最適化"""
+    def optimize_memory_registry(self) -> bool:
+        """メモリ管理設定最適化（レジストリ）"""
         try:
-            logger.info("メモリ積極的最適化を実行中...")
-            
             # 仮想メモリ最適化
             memory_gb = self.system_info['memory_gb']
             virtual_memory_size = max(memory_gb * 1024, 4096)  # 最低4GB
             
-            try:
-                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, 
-                                  "SYSTEM\\CurrentControlSet\\Control\\Session Manager\\Memory Management", 0, 
-                                  winreg.KEY_SET_VALUE) as key:
-                    # メモリ最適化設定
-                    winreg.SetValueEx(key, "ClearPageFileAtShutdown", 0, winreg.REG_DWORD, 1)
-                    winreg.SetValueEx(key, "DisablePagingExecutive", 0, winreg.REG_DWORD, 1)
-                    winreg.SetValueEx(key, "LargeSystemCache", 0, winreg.REG_DWORD, 0)
-                    winreg.SetValueEx(key, "SecondLevelDataCache", 0, winreg.REG_DWORD, 0)
-                    winreg.SetValueEx(key, "ThirdLevelDataCache", 0, winreg.REG_DWORD, 0)
-                    
-                    logger.info("メモリ管理設定を最適化しました")
-            except Exception:
-                pass
+            memory_key = "SYSTEM\\CurrentControlSet\\Control\\Session Manager\\Memory Management"
+            memory_settings = [
+                # メモリ最適化設定
+                (memory_key, "ClearPageFileAtShutdown", 1),
+                (memory_key, "DisablePagingExecutive", 1),
+                (memory_key, "LargeSystemCache", 0),
+                (memory_key, "SecondLevelDataCache", 0),
+                (memory_key, "ThirdLevelDataCache", 0),
+            ]
+            report = RegistryBatch(hive=HKLM, journal=self.journal_transaction).extend(
+                memory_settings, create=False).apply()
+            if not report['errors']:
+                logger.info("メモリ管理設定を最適化しました")
+            return True
+            
+        except Exception as e:
+            logger.error(f"メモリ管理設定でエラー: {e}")
+            return False
+    
+    def optimize_memory_aggressive(self) -> bool:
+        """メモリ積極的最適化（サービス停止・メモリクリーンアップ）"""
+        try:
+            logger.info("メモリ積極的最適化を実行中...")
             
             # 不要サービス停止（VR最適化）
             services_to_stop = [
@@ -284,25 +297,27 @@ class LowSpecVROptimizer:
                 'TabletInputService', 'Spooler'  # 印刷不要時
             ]
             
+            if self.journal_transaction is not None:
+                state = WindowsState()
+                for service_name in services_to_stop:
+                    previous = state.service_status(service_name)
+                    if previous not in (None, 'stopped'):
+                        self.journal_transaction.record(SERVICE, service_name, previous, 'stopped')
+            
+            # 各サービスの停止は独立しているため同時に実行（1件ずつタイムアウト）
             stopped_services = 0
-            for service_name in services_to_stop:
-                try:
-                    result = subprocess.run(['sc', 'stop', service_name], 
-                                          capture_output=True, text=True)
-                    if result.returncode == 0:
-                        stopped_services += 1
-                        logger.info(f"不要サービス停止: {service_name}")
-                except Exception:
-                    continue
+            results = run_commands([['sc', 'stop', name] for name in services_to_stop], timeout=30)
+            for service_name, result in zip(services_to_stop, results):
+                if result['status'] == 'ok':
+                    stopped_services += 1
+                    logger.info(f"不要サービス停止: {service_name}")
+                elif result['status'] == 'timeout':
+                    logger.warning(f"サービス停止タイムアウト: {service_name}")
             
             # メモリクリーンアップ
-            try:
-                # 作業セットクリア
-                subprocess.run(['rundll32.exe', 'advapi32.dll,ProcessIdleTasks'], 
-                             timeout=30)
+            # 作業セットクリア
+            if run_command(['rundll32.exe', 'advapi32.dll,ProcessIdleTasks'], timeout=30)['status'] in ('ok', 'failed'):
                 logger.info("システムメモリをクリーンアップしました")
-            except Exception:
-                pass
             
             logger.info(f"メモリ最適化完了 - {stopped_services}個のサービス停止")
             return True
@@ -364,22 +379,21 @@ class LowSpecVROptimizer:
                 ("SOFTWARE\\VRChat\\VRChat", "AvatarCullingDistance", 15),  # カリング距離
             ]
             
-            for reg_path, value_name, value_data in vrchat_settings:
-                try:
-                    with winreg.CreateKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-                        winreg.SetValueEx(key, value_name, 0, winreg.REG_DWORD, value_data)
-                except Exception:
-                    pass
+            logger.info(summarize_registry(apply_registry_settings(vrchat_settings, journal=self.journal_transaction)))
             
             # VRChat推奨設定出力
             performance_tier = self.system_info['gpu_info']['performance_tier']
             
+            # 実測したアバター読み込みスタールに基づく推奨値（プロファイル結果がある場合）
+            avatar_profile = load_profile()
+            measured_download_mb = avatar_profile.get('recommended_max_download_mb') if avatar_profile else None
+            
             if performance_tier == 'low':
                 # 超低スペック設定
                 logger.info("🔥 超低スペック推奨設定:")
                 logger.info("  • Avatar Culling Distance: 10-15m")
                 logger.info("  • Maximum Shown Avatars: 3-5")
-                logger.info("  • Avatar Max Download Size: 25MB以下")
+                logger.info(f"  • Avatar Max Download Size: {measured_download_mb or 25}MB以下")
                 logger.info("  • Antialiasing: 無効")
                 logger.info("  • Pixel Light Count: 無効")
                 logger.info("  • Shadows: 無効")
@@ -391,12 +405,15 @@ class LowSpecVROptimizer:
                 logger.info("⚡ 中スペック推奨設定:")
                 logger.info("  • Avatar Culling Distance: 15-20m")
                 logger.info("  • Maximum Shown Avatars: 5-8")
-                logger.info("  • Avatar Max Download Size: 35MB以下")
+                logger.info(f"  • Avatar Max Download Size: {measured_download_mb or 35}MB以下")
                 logger.info("  • Antialiasing: 無効またはx2")
                 logger.info("  • Pixel Light Count: Low")
                 logger.info("  • Shadows: Low")
                 logger.info("  • Particle Limiter: 有効")
                 
+            if measured_download_mb:
+                logger.info(f"🎭 アバター読み込み実測値（{avatar_profile['sized_loads']}件）に基づくサイズ上限: {measured_download_mb}MB")
+            
             # AMD GPU特別対応
             if self.system_info['gpu_info']['vendor'] == 'AMD':
                 logger.info("🔴 AMD GPU特別対応:")
@@ -476,12 +493,7 @@ class LowSpecVROptimizer:
                 ("SYSTEM\\CurrentControlSet\\Services\\Tcpip\\Parameters", "TCPNoDelay", 1),
             ]
             
-            for reg_path, value_name, value_data in network_settings:
-                try:
-                    with winreg.CreateKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-                        winreg.SetValueEx(key, value_name, 0, winreg.REG_DWORD, value_data)
-                except Exception:
-                    pass
+            logger.info(summarize_registry(apply_registry_settings(network_settings, journal=self.journal_transaction)))
             
             # DNS最適化
             try:
@@ -506,9 +518,9 @@ class LowSpecVROptimizer:
             if enable:
                 logger.info("Windows起動時自動実行を設定中...")
                 
-                # 現在のスクリプトパス取得
-                current_script = os.path.abspath(__file__)
-                startup_command = f'py -3 "{current_script}" --startup-optimize'
+                # 起動時は最小構成のエントリポイント（GUI・tkinterを読み込まない）を実行
+                current_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), STARTUP_SCRIPT)
+                startup_command = f'py -3 "{current_script}" --silent'
                 
                 # レジストリ設定（HKEY_CURRENT_USER、管理者権限不要）
                 try:
@@ -529,7 +541,7 @@ title VR低スペック最適化（自動実行）
 
 echo VR低スペック最適化ツール自動実行中...
 cd /d "{os.path.dirname(current_script)}"
-py -3 "{current_script}" --startup-optimize --silent
+py -3 "{current_script}" --silent
 
 if %errorlevel% neq 0 (
     echo 最適化でエラーが発生しました。手動実行をお試しください。
@@ -595,7 +607,7 @@ if %errorlevel% neq 0 (
             try:
                 with winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.startup_registry_key) as key:
                     value, _ = winreg.QueryValueEx(key, self.startup_name)
-                    if value and 'vr_lowspec_optimizer.py' in value:
+                    if value and any(name in value for name in (STARTUP_SCRIPT, 'vr_lowspec_optimizer.py')):
                         status['registry_enabled'] = True
             except FileNotFoundError:
                 pass
@@ -682,14 +694,11 @@ if %errorlevel% neq 0 (
             # 2. CPU電源プラン最適化（Steam Community推奨）
             try:
                 # 最大プロセッサ状態を100%に設定（boost clock利用）
-                subprocess.run(['powercfg', '/setacvalueindex', 'SCHEME_CURRENT', 
-                              'SUB_PROCESSOR', 'PROCTHROTTLEMAX', '100'], 
-                              capture_output=True, timeout=5)
-                subprocess.run(['powercfg', '/setdcvalueindex', 'SCHEME_CURRENT', 
-                              'SUB_PROCESSOR', 'PROCTHROTTLEMAX', '100'], 
-                              capture_output=True, timeout=5)
-                subprocess.run(['powercfg', '/setactive', 'SCHEME_CURRENT'], 
-                              capture_output=True, timeout=5)
+                run_commands([
+                    ['powercfg', '/setacvalueindex', 'SCHEME_CURRENT', 'SUB_PROCESSOR', 'PROCTHROTTLEMAX', '100'],
+                    ['powercfg', '/setdcvalueindex', 'SCHEME_CURRENT', 'SUB_PROCESSOR', 'PROCTHROTTLEMAX', '100'],
+                ], timeout=5)
+                run_command(['powercfg', '/setactive', 'SCHEME_CURRENT'], timeout=5)
                 success_count += 1
                 logger.info("✅ CPU電源プラン最適化完了（最大100%設定）")
             except Exception as e:
@@ -854,6 +863,10 @@ if %errorlevel% neq 0 (
                         logger.info("🔚 VRChat終了検出")
                         self.optimization_applied = False
                     
+                    # メモリ/ハンドル/スレッド増加の傾向更新
+                    if vrchat_info['running']:
+                        self.leak_predictor.sample_process(vrchat_info['process'])
+                    
                     time.sleep(5)  # 5秒間隔でチェック
                     
                 except Exception as e:
@@ -901,54 +914,24 @@ if %errorlevel% neq 0 (
                 ("SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer", "AlwaysUnloadDLL", 1),
             ]
             
-            for reg_path, value_name, value_data in windows_settings:
-                try:
-                    with winreg.CreateKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-                        winreg.SetValueEx(key, value_name, 0, winreg.REG_DWORD, value_data)
-                except Exception:
-                    pass
-            
             # VirtualDesktop最適化（管理者権限不要）
-            try:
-                vd_settings = [
-                    ("SOFTWARE\\Guy Godin\\Virtual Desktop Streamer", "BitrateLimit", 150),
-                    ("SOFTWARE\\Guy Godin\\Virtual Desktop Streamer", "RefreshRate", 72),
-                    ("SOFTWARE\\Guy Godin\\Virtual Desktop Streamer", "SlicedEncoding", 1),
-                ]
-                
-                for reg_path, value_name, value_data in vd_settings:
-                    try:
-                        with winreg.CreateKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-                            winreg.SetValueEx(key, value_name, 0, winreg.REG_DWORD, value_data)
-                    except Exception:
-                        continue
-                        
-                logger.info("VirtualDesktop設定を低スペック向けに最適化")
-            except Exception:
-                pass
+            vd_settings = [
+                ("SOFTWARE\\Guy Godin\\Virtual Desktop Streamer", "BitrateLimit", 150),
+                ("SOFTWARE\\Guy Godin\\Virtual Desktop Streamer", "RefreshRate", 72),
+                ("SOFTWARE\\Guy Godin\\Virtual Desktop Streamer", "SlicedEncoding", 1),
+            ]
             
             # SteamVR最適化（管理者権限不要）
-            try:
-                steamvr_settings = [
-                    ("SOFTWARE\\Valve\\Steam\\steamvr", "renderTargetMultiplier", 0.8),  # 解像度スケール80%
-                    ("SOFTWARE\\Valve\\Steam\\steamvr", "allowSupersampleFiltering", 0),
-                    ("SOFTWARE\\Valve\\Steam\\steamvr", "motionSmoothingOverride", 1),  # モーションスムージング有効
-                ]
-                
-                for reg_path, value_name, value_data in steamvr_settings:
-                    try:
-                        with winreg.CreateKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-                            if isinstance(value_data, float):
-                                winreg.SetValueEx(key, value_name, 0, winreg.REG_SZ, str(value_data))
-                            else:
-                                winreg.SetValueEx(key, value_name, 0, winreg.REG_DWORD, value_data)
-                    except Exception:
-                        continue
-                        
-                logger.info("SteamVR設定を低スペック向けに最適化")
-            except Exception:
-                pass
+            steamvr_settings = [
+                ("SOFTWARE\\Valve\\Steam\\steamvr", "renderTargetMultiplier", 0.8),  # 解像度スケール80%
+                ("SOFTWARE\\Valve\\Steam\\steamvr", "allowSupersampleFiltering", 0),
+                ("SOFTWARE\\Valve\\Steam\\steamvr", "motionSmoothingOverride", 1),  # モーションスムージング有効
+            ]
             
+            report = apply_registry_settings(windows_settings + vd_settings + steamvr_settings,
+                                             journal=self.journal_transaction)
+            logger.info(summarize_registry(report))
+            logger.info("VirtualDesktop・SteamVR設定を低スペック向けに最適化")
             return True
             
         except Exception as e:
@@ -977,33 +960,55 @@ if %errorlevel% neq 0 (
         logger.info(f"🔥 低スペック最適化開始 - プロファイル: {profile}")
         logger.info(f"システムスコア: {self.system_info['performance_score']}/100")
         
+        # 外部コマンド待ちのステップは並列に、レジストリ書き込みは宣言順に1つずつ実行
+        # （レジストリを書く処理は COMMAND ステップに含めず、REGISTRY ステップに分ける）
         optimizations = [
-            ("CPU極端最適化", self.optimize_cpu_extreme),
-            ("GPU低スペック最適化", self.optimize_gpu_lowspec),
-            ("メモリ積極的最適化", self.optimize_memory_aggressive),
-            ("ネットワーク最適化", self.optimize_network_lowspec),
-            ("VRChat低スペック設定", self.optimize_vrchat_lowspec),
-            ("Windows低スペック最適化", self.optimize_windows_lowspec),
+            step("CPU極端最適化", self.optimize_cpu_extreme, COMMAND),
+            step("CPUスケジューラー最適化", self.optimize_cpu_scheduler, REGISTRY),
+            step("GPU低スペック最適化", self.optimize_gpu_lowspec, REGISTRY),
+            step("メモリ積極的最適化", self.optimize_memory_aggressive, COMMAND, timeout=120),
+            step("メモリ管理設定最適化", self.optimize_memory_registry, REGISTRY),
+            step("ネットワーク最適化", self.optimize_network_lowspec, REGISTRY),
+            # VRChatの優先度設定はCPU最適化の後に行う（逐次実行時と同じ最終状態にする）
+            step("VRChat低スペック設定", self.optimize_vrchat_lowspec, REGISTRY, after=["CPU極端最適化"]),
+            step("Windows低スペック最適化", self.optimize_windows_lowspec, REGISTRY),
         ]
         
         # VRChat監視開始
         self.start_vrchat_monitor()
         
-        success_count = 0
         total_count = len(optimizations)
+        timeline = EventTimeline()
+        journal = SettingsJournal()
+        self.journal_transaction = journal.begin(f"低スペック最適化（{profile}）")
+        progress = tqdm(total=total_count, desc="最適化実行中")
         
-        for name, func in tqdm(optimizations, desc="最適化実行中"):
-            try:
-                result = func()
-                results[name] = result
-                if result:
-                    success_count += 1
-                    logger.info(f"✅ {name}: 成功")
-                else:
-                    logger.warning(f"⚠️ {name}: 失敗")
-            except Exception as e:
-                results[name] = False
-                logger.error(f"❌ {name}: エラー - {e}")
+        def on_step_done(name, record):
+            if record['status'] == 'ok':
+                logger.info(f"✅ {name}: 成功")
+            elif record['status'] == 'failed':
+                logger.warning(f"⚠️ {name}: 失敗")
+            elif record['status'] == 'timeout':
+                logger.error(f"❌ {name}: タイムアウト")
+            else:
+                logger.error(f"❌ {name}: エラー - {record['error']}")
+            timeline.record_optimization(name, record['result'], record['duration'])
+            progress.update(1)
+        
+        report = StepExecutor(on_step_done=on_step_done).run(optimizations)
+        progress.close()
+        timeline.close()
+        logger.info(format_report(report))
+        
+        transaction, self.journal_transaction = self.journal_transaction, None
+        journal.close()
+        if transaction.id is not None:
+            logger.info(f"📒 変更前の値を記録しました（#{transaction.id}、{transaction.count}件）"
+                        f" - 元に戻す: python vr_settings_journal.py --rollback {transaction.id}")
+            results['journal_transaction'] = transaction.id
+        
+        results.update(report['results'])
+        success_count = sum(1 for result in report['results'].values() if result)
         
         results['success_rate'] = (success_count / total_count) * 100
         results['optimization_profile'] = profile
@@ -1022,6 +1027,9 @@ class LowSpecVROptimizerGUI:
         self.root.geometry("900x700")
         self.root.configure(bg='#1a1a1a')
         
+        # ワーカースレッドからのログ・進捗はイベントバス経由でメインループが反映
+        self.ui_events = UIEventBus(self.root)
+        
         self.optimizer = LowSpecVROptimizer()
         self.setup_gui()
         
@@ -1045,16 +1053,10 @@ class LowSpecVROptimizerGUI:
         info_frame = ttk.LabelFrame(main_frame, text="💻 システム分析結果")
         info_frame.pack(fill=tk.X, pady=(0, 15))
         
-        system_info = self.optimizer.system_info
-        info_text = f"""CPU: {system_info['cpu_cores']}コア
-メモリ: {system_info['memory_gb']}GB
-GPU: {system_info['gpu_info']['vendor']} ({system_info['gpu_info']['performance_tier']}ティア)
-パフォーマンススコア: {system_info['performance_score']}/100
-最適化プロファイル: {self.optimizer.optimization_profile}"""
-        
-        info_label = tk.Label(info_frame, text=info_text, bg='#2a2a2a', fg='white', 
-                             font=('Consolas', 10), justify=tk.LEFT)
-        info_label.pack(fill=tk.X, padx=10, pady=10)
+        # 分析結果が届くまではプレースホルダーを表示
+        self.info_label = tk.Label(info_frame, text=self.analysis_placeholder(), bg='#2a2a2a', fg='white', 
+                                  font=('Consolas', 10), justify=tk.LEFT)
+        self.info_label.pack(fill=tk.X, padx=10, pady=10)
         
         # 最適化ボタン
         button_frame = ttk.Frame(main_frame)
@@ -1101,26 +1103,66 @@ GPU: {system_info['gpu_info']['vendor']} ({system_info['gpu_info']['performance_
         log_frame = ttk.LabelFrame(main_frame, text="📊 最適化ログ")
         log_frame.pack(fill=tk.BOTH, expand=True)
         
-        self.log_text = scrolledtext.ScrolledText(log_frame, height=15, bg='#2a2a2a', fg='#00ff00',
-                                                 font=('Consolas', 9))
-        self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # 最新5000件だけ保持し、古い行はディスクへ書き出す（数日間の監視でもメモリ一定）
+        self.log_store = LogStore(spill_path=default_spill_path('vr_lowspec_gui'))
+        self.log_view = VirtualLogView(log_frame, self.log_store, height=15, bg='#2a2a2a', fg='#00ff00',
+                                       font=('Consolas', 9))
+        self.log_view.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        self.ui_events.subscribe('log', self.log_view.append_lines)
+        self.ui_events.subscribe('progress', self.progress_var.set)
+        self.ui_events.start()
         
         # 初期メッセージ
         self.add_log("🔥 低スペック特化VR最適化ツール起動完了")
-        self.add_log(f"システムスコア: {system_info['performance_score']}/100")
-        self.add_log(f"最適化プロファイル: {self.optimizer.optimization_profile}")
+        self.add_log("🔍 システム分析中...")
         self.add_log("🎮 VRChat起動検出システム準備完了")
+        self.watch_analysis(self.optimizer.start_analysis())
+        
+        # 再起動推奨イベントをログ欄へ表示
+        self.optimizer.leak_predictor.on_restart_recommended = lambda event: self.add_log(event['message'])
         
         # VRChat監視自動開始
         self.optimizer.start_vrchat_monitor()
         self.monitor_button.config(text="⏹️ VRChat監視停止")
         
+    @staticmethod
+    def analysis_placeholder() -> str:
+        return """CPU: 分析中...
+メモリ: 分析中...
+GPU: 分析中...
+パフォーマンススコア: --/100
+最適化プロファイル: 分析中..."""
+    
+    def watch_analysis(self, future, notify: bool = False):
+        """分析完了時に結果をメインループで反映"""
+        future.add_done_callback(lambda f: self.ui_events.call(self.show_analysis, f, notify))
+    
+    def show_analysis(self, future, notify: bool = False):
+        """システム分析結果を表示"""
+        if future is not self.optimizer.analysis_future:
+            return  # 再分析で置き換えられた古い結果
+        if future.exception() is not None:
+            self.info_label.config(text=f"システム分析エラー: {future.exception()}")
+            self.add_log(f"❌ システム分析エラー: {future.exception()}")
+            return
+        
+        system_info, _ = future.result()
+        profile = self.optimizer.optimization_profile
+        self.info_label.config(text=f"""CPU: {system_info['cpu_cores']}コア
+メモリ: {system_info['memory_gb']}GB
+GPU: {system_info['gpu_info']['vendor']} ({system_info['gpu_info']['performance_tier']}ティア)
+パフォーマンススコア: {system_info['performance_score']}/100
+最適化プロファイル: {profile}""")
+        self.add_log(f"システムスコア: {system_info['performance_score']}/100")
+        self.add_log(f"最適化プロファイル: {profile}")
+        if notify:
+            self.add_log("✅ システム分析完了")
+            messagebox.showinfo("完了", "システムの再分析が完了しました。")
+    
     def add_log(self, message: str):
-        """ログ追加"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """ログ追加（どのスレッドからでも呼び出し可）"""
+        self.ui_events.log(message)
     
     def run_optimization(self):
         """最適化実行"""
@@ -1129,10 +1171,10 @@ GPU: {system_info['gpu_info']['vendor']} ({system_info['gpu_info']['performance_
         
         def optimize_thread():
             try:
-                self.progress_var.set(10)
+                self.ui_events.progress(10)
                 results = self.optimizer.run_full_optimization()
                 
-                self.progress_var.set(90)
+                self.ui_events.progress(90)
                 self.add_log(f"✅ 最適化完了 - 成功率: {results['success_rate']:.1f}%")
                 
                 # 結果表示
@@ -1141,27 +1183,26 @@ GPU: {system_info['gpu_info']['vendor']} ({system_info['gpu_info']['performance_
                         status = "✅" if result else "❌"
                         self.add_log(f"{status} {name}")
                 
-                self.progress_var.set(100)
+                self.ui_events.progress(100)
                 self.add_log("🎊 全ての最適化が完了しました！")
                 self.add_log("💡 VRアプリを再起動して効果を確認してください")
                 
-                messagebox.showinfo("完了", "低スペック最適化が完了しました！\nVRアプリを再起動してください。")
+                self.ui_events.call(messagebox.showinfo, "完了", "低スペック最適化が完了しました！\nVRアプリを再起動してください。")
                 
             except Exception as e:
                 self.add_log(f"❌ 最適化エラー: {e}")
-                messagebox.showerror("エラー", f"最適化中にエラーが発生しました: {e}")
+                self.ui_events.call(messagebox.showerror, "エラー", f"最適化中にエラーが発生しました: {e}")
             finally:
-                self.optimize_button.config(state='normal')
-                self.progress_var.set(0)
+                self.ui_events.call(self.optimize_button.config, state='normal')
+                self.ui_events.progress(0)
         
         threading.Thread(target=optimize_thread, daemon=True).start()
     
     def reanalyze_system(self):
         """システム再分析"""
         self.add_log("🔍 システム再分析中...")
-        self.optimizer = LowSpecVROptimizer()
-        self.add_log("✅ システム分析完了")
-        messagebox.showinfo("完了", "システムの再分析が完了しました。")
+        self.info_label.config(text=self.analysis_placeholder())
+        self.watch_analysis(self.optimizer.start_analysis(refresh=True), notify=True)
     
     def toggle_autorun(self, enable: bool):
         """自動実行設定切り替え"""
@@ -1215,36 +1256,18 @@ GPU: {system_info['gpu_info']['vendor']} ({system_info['gpu_info']['performance_
     def run(self):
         """GUI実行"""
         self.root.mainloop()
+        self.log_store.flush_spill()
 
 def run_startup_optimization(args):
-    """起動時最適化（軽量版）"""
+    """起動時最適化（軽量版）
+
+    vr_startup_fast と同じ処理です。プロファイルとの差分のうちレジストリと電源プランだけを適用し、
+    サービス停止とメモリクリーンアップはログオン後のバックグラウンドプロセスで実行します。
+    """
     try:
         if not args.silent:
             print("🚀 VR低スペック起動最適化実行中...")
-        
-        optimizer = LowSpecVROptimizer()
-        
-        # 軽量最適化（起動時に適したもののみ）
-        optimizations = [
-            ("CPU基本最適化", optimizer.optimize_cpu_extreme),
-            ("メモリ基本最適化", optimizer.optimize_memory_aggressive),
-            ("VRChat基本設定", optimizer.optimize_vrchat_lowspec),
-        ]
-        
-        success_count = 0
-        for name, func in optimizations:
-            try:
-                if func():
-                    success_count += 1
-                    if not args.silent:
-                        print(f"✅ {name}: 完了")
-            except Exception as e:
-                if not args.silent:
-                    print(f"⚠️ {name}: スキップ - {e}")
-        
-        if not args.silent:
-            print(f"✅ 起動最適化完了 ({success_count}/{len(optimizations)})")
-            
+        run_startup(args.profile, args.silent)
         return True
         
     except Exception as e:
@@ -1252,6 +1275,14 @@ def run_startup_optimization(args):
             print(f"❌ 起動最適化エラー: {e}")
         return False
 
+def run_plan_mode(args):
+    """プロファイルの変更計画を表示（変更は行わない）"""
+    optimizer = LowSpecVROptimizer()
+    profile = args.profile or optimizer.optimization_profile
+    
+    _, plan = plan_profile(profile, optimizer.system_info['gpu_info']['vendor'])
+    print(format_plan(plan))
+
 def run_cli_mode(args):
     """CLIモード実行"""
     optimizer = LowSpecVROptimizer()
@@ -1270,6 +1301,8 @@ def main():
                         help='最適化プロファイル指定')
     parser.add_argument('--startup-optimize', action='store_true', 
                         help='起動時最適化（自動実行用）')
+    parser.add_argument('--plan', action='store_true', 
+                        help='プロファイルとの差分（変更計画）を表示のみ')
     parser.add_argument('--silent', action='store_true', 
                         help='サイレントモード（出力最小化）')
     parser.add_argument('--enable-autorun', action='store_true', 
@@ -1280,8 +1313,9 @@ def main():
                         help='自動実行設定状態確認')
     args = parser.parse_args()
 
+    # 自動実行の設定・確認ではシステム分析（ハードウェア検出）を行わない
     if args.enable_autorun:
-        optimizer = LowSpecVROptimizer()
+        optimizer = LowSpecVROptimizer(analyze=False)
         result = optimizer.setup_startup_autorun(True)
         if result:
             print("✅ Windows起動時自動実行が有効化されました")
@@ -1291,7 +1325,7 @@ def main():
         return
 
     if args.disable_autorun:
-        optimizer = LowSpecVROptimizer()
+        optimizer = LowSpecVROptimizer(analyze=False)
         result = optimizer.setup_startup_autorun(False)
         if result:
             print("❌ Windows起動時自動実行が無効化されました")
@@ -1300,7 +1334,7 @@ def main():
         return
 
     if args.check_autorun:
-        optimizer = LowSpecVROptimizer()
+        optimizer = LowSpecVROptimizer(analyze=False)
         status = optimizer.check_startup_status()
         print(f"📋 自動実行設定状態:")
         print(f"   レジストリ設定: {'✅ 有効' if status['registry_enabled'] else '❌ 無効'}")
@@ -1308,7 +1342,9 @@ def main():
         print(f"   総合状態: {'✅ 有効' if status['overall_enabled'] else '❌ 無効'}")
         return
 
-    if args.startup_optimize:
+    if args.plan:
+        run_plan_mode(args)
+    elif args.startup_optimize:
         # 起動時最適化モード（軽量化版）
         run_startup_optimization(args)
     elif args.gui:
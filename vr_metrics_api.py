@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRメトリクス HTTP/WebSocket API
+収集プロセスに組み込むasyncioサーバーです。閲覧者数に関係なくサンプリングは1回だけで、
+各サンプルは一度だけエンコードして全WebSocket購読者へ配信します。
+
+エンドポイント:
+  GET /api/current               最新レコード
+  GET /api/range?seconds=N       直近N秒のレコード（start/end[エポック秒]でも指定可）
+  GET /api/processes             VR関連プロセスの状態
+  GET /metrics                   OpenMetrics形式（vr_metrics_exporter）
+  GET /ws                        WebSocket（サンプルごとにJSONを配信）
+
+購読者ごとに上限付きキューを持ち、遅いクライアントは古いサンプルから破棄します（他の購読者や
+サンプリングを待たせません）。
+"""
+
+import json
+import time
+import base64
+import hashlib
+import asyncio
+import argparse
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+CLIENT_QUEUE_SIZE = 32
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+MAX_REQUEST_BYTES = 16384
+# クライアントから届くのは制御フレーム程度なので、これを超えるフレームは読まずに切断する
+MAX_FRAME_BYTES = 65536
+CLOSE_MESSAGE_TOO_BIG = 1009
+
+
+def websocket_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """サーバー→クライアントのフレーム（マスクなし）"""
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 65536:
+        header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, 'big')
+    else:
+        header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, 'big')
+    return header + payload
+
+
+def websocket_accept_key(key: str) -> str:
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def time_param(query: dict, name: str, default: float) -> float:
+    """クエリパラメーターを秒数として取得（数値でない・有限でない場合は ValueError）"""
+    if name not in query:
+        return default
+    raw = query[name][0]
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be a number: {raw!r}") from None
+    if not np.isfinite(value):
+        raise ValueError(f"{name} must be finite: {raw!r}")
+    return value
+
+
+class WebSocketClient:
+    """購読者1件分の送信キュー"""
+
+    def __init__(self, writer: asyncio.StreamWriter, queue_size: int = CLIENT_QUEUE_SIZE):
+        self.writer = writer
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.sent = 0
+
+    def offer(self, frame: bytes):
+        """キューに追加（満杯なら最も古いフレームを破棄）"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+
+class MetricsAPIServer:
+    """収集プロセス内で動くHTTP/WebSocketサーバー
+
+    ring: vr_metrics_collector.MetricsRing（履歴・最新値の参照用）
+    process_source: VR関連プロセス状態のリストを返す関数（収集側のキャッシュを返すこと）
+    exporter: vr_metrics_exporter.OpenMetricsExporter（/metrics 用、省略可）
+    """
+
+    def __init__(self, ring, process_source=None, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 queue_size: int = CLIENT_QUEUE_SIZE, exporter=None):
+        self.ring = ring
+        self.process_source = process_source
+        self.exporter = exporter
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.clients = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.published = 0
+
+    # 収集スレッドから呼び出し
+    def publish(self, record: dict):
+        """サンプルを全購読者へ配信（エンコードは1回、送信はイベントループ側）"""
+        if self.loop is None or not self.clients:
+            return
+        frame = websocket_frame(json.dumps(record, separators=(',', ':')).encode('utf-8'))
+        self.loop.call_soon_threadsafe(self.fan_out, frame)
+
+    def fan_out(self, frame: bytes):
+        self.published += 1
+        for client in self.clients:
+            client.offer(frame)
+
+    # サーバー起動
+    def start_in_thread(self):
+        """専用スレッドでイベントループを起動"""
+        self.thread = threading.Thread(target=self.run_forever, daemon=True, name='metrics-api')
+        self.thread.start()
+        self.ready.wait(timeout=5)
+
+    def run_forever(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_connection, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+            logger.info(f"🌐 メトリクスAPI: http://{self.host}:{self.port}/api/current , ws://{self.host}:{self.port}/ws")
+        except OSError as e:
+            logger.error(f"メトリクスAPI起動エラー: {e}")
+            self.loop = None
+            return
+        finally:
+            self.ready.set()
+        self.loop.run_forever()
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    # リクエスト処理
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        if len(head) > MAX_REQUEST_BYTES:
+            writer.close()
+            return
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            writer.close()
+            return
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        try:
+            if url.path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                await self.handle_websocket(reader, writer, headers)
+                return
+            if method != 'GET':
+                await self.send_json(writer, {'error': 'method not allowed'}, 405)
+            elif url.path == '/api/current':
+                latest = self.ring.latest()
+                await self.send_json(writer, latest if latest else {'error': 'no data'}, 200 if latest else 503)
+            elif url.path == '/api/range':
+                try:
+                    result = self.query_range(parse_qs(url.query))
+                except ValueError as e:
+                    await self.send_json(writer, {'error': str(e)}, 400)
+                else:
+                    await self.send_json(writer, result)
+            elif url.path == '/api/processes':
+                processes = self.process_source() if self.process_source else []
+                await self.send_json(writer, {'processes': processes})
+            elif url.path == '/metrics' and self.exporter:
+                from vr_metrics_exporter import CONTENT_TYPE
+                await self.send_response(writer, self.exporter.render(), CONTENT_TYPE)
+            else:
+                await self.send_json(writer, {'error': 'not found'}, 404)
+        except ConnectionError:
+            pass
+        finally:
+            if not writer.is_closing():
+                writer.close()
+
+    def query_range(self, query: dict) -> dict:
+        """リング内のレコードを時間範囲で抽出（列ごとの配列で返す）
+
+        パラメーターが数値でない場合は ValueError（呼び出し側で400を返す）
+        """
+        from vr_metrics_collector import FIELDS, FIELD_INDEX
+
+        now = time.time()
+        if 'seconds' in query:
+            start, end = now - time_param(query, 'seconds', 0), now
+        else:
+            start = time_param(query, 'start', 0)
+            end = time_param(query, 'end', now)
+
+        rows, _ = self.ring.read_since(0)
+        ts = rows[:, FIELD_INDEX['ts']]
+        mask = (ts >= start) & (ts <= end)
+        selected = rows[mask]
+        return {
+            'start': start,
+            'end': end,
+            'count': int(mask.sum()),
+            'series': {name: [None if np.isnan(v) else float(v) for v in selected[:, i]]
+                       for i, name in enumerate(FIELDS)},
+        }
+
+    async def send_json(self, writer: asyncio.StreamWriter, payload, status: int = 200):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        await self.send_response(writer, body, 'application/json; charset=utf-8', status)
+
+    async def send_response(self, writer: asyncio.StreamWriter, body: bytes, content_type: str, status: int = 200):
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 503: 'Service Unavailable'}.get(status, 'OK')
+        writer.write((f"HTTP/1.1 {status} {reason}\r\n"
+                      f"Content-Type: {content_type}\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      "Access-Control-Allow-Origin: *\r\n"
+                      "Connection: close\r\n\r\n").encode('ascii') + body)
+        await writer.drain()
+
+    async def handle_websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, headers: dict):
+        key = headers.get('sec-websocket-key')
+        if not key:
+            await self.send_json(writer, {'error': 'bad websocket request'}, 404)
+            return
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {websocket_accept_key(key)}\r\n\r\n").encode('ascii'))
+        await writer.drain()
+
+        client = WebSocketClient(writer, self.queue_size)
+        self.clients.add(client)
+        sender = asyncio.ensure_future(self.send_loop(client))
+        try:
+            await self.receive_loop(reader, writer)
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            if client.dropped:
+                logger.info(f"WebSocket購読者切断（遅延による破棄 {client.dropped}件）")
+
+    async def send_loop(self, client: WebSocketClient):
+        try:
+            while True:
+                frame = await client.queue.get()
+                client.writer.write(frame)
+                await client.writer.drain()
+                client.sent += 1
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    async def receive_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """クライアントからのフレームを読み、ping/closeに応答（データは無視）
+
+        MAX_FRAME_BYTES を超える長さのフレームは本体を読まず、1009（Message Too Big）で閉じます。
+        """
+        try:
+            while True:
+                first, second = await reader.readexactly(2)
+                opcode = first & 0x0F
+                length = second & 0x7F
+                if length == 126:
+                    length = int.from_bytes(await reader.readexactly(2), 'big')
+                elif length == 127:
+                    length = int.from_bytes(await reader.readexactly(8), 'big')
+                if length > MAX_FRAME_BYTES:
+                    writer.write(websocket_frame(CLOSE_MESSAGE_TOO_BIG.to_bytes(2, 'big'), 0x8))
+                    await writer.drain()
+                    return
+                mask = await reader.readexactly(4) if second & 0x80 else None
+                payload = await reader.readexactly(length)
+                if mask:
+                    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+                if opcode == 0x8:  # close
+                    writer.write(websocket_frame(payload[:2], 0x8))
+                    await writer.drain()
+                    return
+                if opcode == 0x9:  # ping
+                    writer.write(websocket_frame(payload, 0xA))
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+
+
+async def load_test_clients(host: str, port: int, clients: int, duration: float) -> dict:
+    """WebSocket購読者とRESTポーリングを同時に実行し、受信数とレイテンシを計測"""
+    received = [0] * clients
+    latencies = []
+
+    async def ws_client(index: int):
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(bytes(16)).decode('ascii')
+        writer.write((f"GET /ws HTTP/1.1\r\nHost: {host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode('ascii'))
+        await reader.readuntil(b'\r\n\r\n')
+        try:
+            while True:
+                first, second = await reader.readexactly(2)
+                length = second & 0x7F
+                if length == 126:
+                    length = int.from_bytes(await reader.readexactly(2), 'big')
+                elif length == 127:
+                    length = int.from_bytes(await reader.readexactly(8), 'big')
+                await reader.readexactly(length)
+                received[index] += 1
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def rest_poller():
+        while True:
+            t0 = time.perf_counter()
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"GET /api/current HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('ascii'))
+            await reader.read()
+            writer.close()
+            latencies.append(time.perf_counter() - t0)
+            await asyncio.sleep(0.2)
+
+    tasks = [asyncio.ensure_future(ws_client(i)) for i in range(clients)]
+    tasks += [asyncio.ensure_future(rest_poller()) for _ in range(max(clients // 10, 1))]
+    await asyncio.sleep(duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {'received': received, 'rest_latencies': latencies}
+
+
+def load_test(clients: int = 50, duration: float = 10.0, interval: float = 0.1):
+    """負荷テスト：実際のサンプラーと共有メモリリングでサーバーを起動し、N個のローカルクライアントを接続"""
+    from vr_metrics_collector import MetricsRing, SystemSampler
+
+    ring = MetricsRing(name=f"vr_metrics_loadtest_{int(time.time())}", create=True, capacity=600)
+    sampler = SystemSampler()
+    server = MetricsAPIServer(ring, sampler.get_process_details, port=0)
+    server.start_in_thread()
+
+    stop = threading.Event()
+    sample_costs = {}
+
+    def sampling_loop():
+        while not stop.is_set():
+            phase = 'with_clients' if server.clients else 'no_clients'
+            t0 = time.perf_counter()
+            record = sampler.sample()
+            ring.write(record)
+            server.publish(record)
+            sample_costs.setdefault(phase, []).append(time.perf_counter() - t0)
+            time.sleep(interval)
+
+    sampler_thread = threading.Thread(target=sampling_loop, daemon=True)
+    sampler_thread.start()
+    time.sleep(max(interval * 10, 1.0))  # 購読者なしの基準値
+
+    result = asyncio.run(load_test_clients(server.host, server.port, clients, duration))
+    stop.set()
+    sampler_thread.join()
+    server.stop()
+    ring.close()
+
+    received = np.array(result['received'])
+    latencies = np.array(result['rest_latencies']) * 1000
+    print(f"👥 WebSocket購読者 {clients}件 / {duration:.0f}秒 / サンプル間隔 {interval * 1000:.0f}ms")
+    print(f"  配信サンプル数: {server.published}  受信数/購読者: 最小 {received.min()} / 平均 {received.mean():.1f}")
+    if len(latencies):
+        print(f"  REST /api/current: {len(latencies)}回 p50 {np.percentile(latencies, 50):.1f}ms"
+              f" / p95 {np.percentile(latencies, 95):.1f}ms")
+    for phase, label in (('no_clients', '購読者なし'), ('with_clients', '購読者あり')):
+        costs = np.array(sample_costs.get(phase, [np.nan])) * 1000
+        print(f"  サンプリング+配信コスト（{label}）: 平均 {np.nanmean(costs):.2f}ms")
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='VRメトリクス HTTP/WebSocket API（通常は vr_metrics_collector.py から起動）')
+    parser.add_argument('--load-test', type=int, metavar='N', help='N個のローカルクライアントで負荷テスト')
+    parser.add_argument('--duration', type=float, default=10.0, help='負荷テスト時間（秒）')
+    args = parser.parse_args()
+
+    if args.load_test:
+        load_test(args.load_test, args.duration)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRシステムメトリクス常駐収集プロセス
+独自のスケジュールでCPU/メモリ/GPU/温度/VRプロセス状態をサンプリングし、
+共有メモリ上のリングバッファへ公開します。ダッシュボードは共有メモリへ接続して読むだけなので、
+WMI接続やサンプリング処理がUI側で実行されることはありません。
+
+共有メモリレイアウト（すべてリトルエンディアン）:
+  ヘッダ: magic, version, capacity, field_count, write_count, collector_pid, interval_ms, reserved (uint64 × 8)
+  スロット: seq (uint64) + FIELDS (float64 × field_count)
+各スロットはseqlockで保護されます（書き込み中は seq = 2n+1、完了後は 2n+2、n は通し番号）。
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+import subprocess
+from multiprocessing import shared_memory
+
+import numpy as np
+import psutil
+
+logger = logging.getLogger(__name__)
+
+SHM_NAME = 'vr_metrics_ring'
+MAGIC = 0x5652_4D45_5452_4943  # 'VRMETRIC'
+LAYOUT_VERSION = 1
+HEADER_WORDS = 8
+DEFAULT_CAPACITY = 3600  # 1秒間隔で1時間分
+
+# ヘッダのインデックス
+H_MAGIC, H_VERSION, H_CAPACITY, H_FIELDS, H_WRITE_COUNT, H_PID, H_INTERVAL = range(7)
+
+FIELDS = [
+    'ts',
+    'cpu_usage',
+    'cpu_temp',
+    'memory_usage',
+    'memory_used_gb',
+    'memory_total_gb',
+    'gpu_usage',
+    'gpu_temp',
+    'vram_used',
+    'vram_total',
+    'vram_usage',
+    'vr_process_flags',
+]
+FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+
+# vr_process_flags のビット割り当て
+VR_PROCESS_NAMES = ['VRChat', 'VirtualDesktop.Streamer', 'VirtualDesktop.Service', 'SteamVR', 'OculusClient']
+
+
+class SystemSampler:
+    """システム情報サンプラー（WMI接続はプロセス内で1回だけ開く）"""
+
+    def __init__(self):
+        self.wmi_connection = None
+        self.gputil = None
+        self.process_details = []
+        try:
+            import wmi
+            try:
+                self.wmi_connection = wmi.WMI(namespace="root\\OpenHardwareMonitor")
+            except Exception:
+                self.wmi_connection = wmi.WMI(namespace="root\\LibreHardwareMonitor")
+        except Exception:
+            self.wmi_connection = None
+        try:
+            import GPUtil
+            self.gputil = GPUtil
+        except ImportError:
+            self.gputil = None
+
+        # 初回呼び出しは0を返すため、ここで基準値を取っておく
+        psutil.cpu_percent(interval=None)
+
+    def get_cpu_temperature(self):
+        """CPU温度を取得"""
+        try:
+            if self.wmi_connection:
+                for sensor in self.wmi_connection.Sensor():
+                    if sensor.SensorType == 'Temperature' and 'CPU' in sensor.Name:
+                        return round(sensor.Value, 1) if sensor.Value else None
+
+            # 代替方法: psutil (Linux/一部Windows)
+            if hasattr(psutil, "sensors_temperatures"):
+                temps = psutil.sensors_temperatures()
+                for name, entries in (temps or {}).items():
+                    if 'cpu' in name.lower() or 'core' in name.lower():
+                        return round(entries[0].current, 1) if entries else None
+            return None
+        except Exception:
+            return None
+
+    def get_gpu_info(self):
+        """GPU情報を取得"""
+        try:
+            gpus = self.gputil.getGPUs() if self.gputil else []
+            if gpus:
+                gpu = gpus[0]  # 最初のGPUを使用
+                return {
+                    'usage': round(gpu.load * 100, 1),
+                    'temperature': round(gpu.temperature, 1),
+                    'vram_used': round(gpu.memoryUsed, 1),
+                    'vram_total': round(gpu.memoryTotal, 1),
+                    'vram_usage_percent': round((gpu.memoryUsed / gpu.memoryTotal) * 100, 1),
+                    'name': gpu.name
+                }
+            return None
+        except Exception:
+            return None
+
+    def check_vr_processes(self) -> dict:
+        """VR関連プロセスの状態確認（該当プロセスのCPU/メモリもget_process_details用に保持）"""
+        vr_processes = {name: False for name in VR_PROCESS_NAMES}
+        details = []
+        for proc in psutil.process_iter(['name']):
+            proc_name = proc.info['name'] or ''
+            if 'VRChat' in proc_name:
+                key = 'VRChat'
+            elif 'VirtualDesktop.Streamer' in proc_name:
+                key = 'VirtualDesktop.Streamer'
+            elif 'VirtualDesktop.Service' in proc_name:
+                key = 'VirtualDesktop.Service'
+            elif 'vrserver' in proc_name or 'SteamVR' in proc_name:
+                key = 'SteamVR'
+            elif 'OculusClient' in proc_name:
+                key = 'OculusClient'
+            else:
+                continue
+            vr_processes[key] = True
+            try:
+                # process_iterはProcessオブジェクトを使い回すため、cpu_percentは前回サンプルからの値になる
+                details.append({
+                    'app': key,
+                    'name': proc_name,
+                    'pid': proc.pid,
+                    'cpu_percent': proc.cpu_percent(interval=None),
+                    'rss_mb': round(proc.memory_info().rss / (1024**2), 1),
+                })
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        self.process_details = details
+        return vr_processes
+
+    def get_process_details(self) -> list:
+        """最新サンプル時点のVR関連プロセス一覧（閲覧側から呼んでも再取得しない）"""
+        return self.process_details
+
+    def sample(self) -> dict:
+        """1レコード分のメトリクス（前回呼び出しからのCPU使用率、ブロックしない）"""
+        memory = psutil.virtual_memory()
+        gpu_info = self.get_gpu_info() or {}
+        vr_processes = self.check_vr_processes()
+        flags = sum(1 << i for i, name in enumerate(VR_PROCESS_NAMES) if vr_processes[name])
+        return {
+            'ts': time.time(),
+            'cpu_usage': psutil.cpu_percent(interval=None),
+            'cpu_per_core': psutil.cpu_percent(interval=None, percpu=True),  # リングには保存しない
+            'cpu_temp': self.get_cpu_temperature(),
+            'memory_usage': memory.percent,
+            'memory_used_gb': round(memory.used / (1024**3), 1),
+            'memory_total_gb': round(memory.total / (1024**3), 1),
+            'gpu_usage': gpu_info.get('usage'),
+            'gpu_temp': gpu_info.get('temperature'),
+            'vram_used': gpu_info.get('vram_used'),
+            'vram_total': gpu_info.get('vram_total'),
+            'vram_usage': gpu_info.get('vram_usage_percent'),
+            'vr_process_flags': flags,
+        }
+
+
+class MetricsRing:
+    """共有メモリ上のメトリクスリングバッファ"""
+
+    def __init__(self, name: str = SHM_NAME, create: bool = False, capacity: int = DEFAULT_CAPACITY,
+                 reuse: bool = False):
+        """create=True で作成して初期化。reuse=True なら同名の既存マッピングを開いて初期化し直す"""
+        slot_words = 1 + len(FIELDS)
+        if create and reuse:
+            size = (HEADER_WORDS + capacity * slot_words) * 8
+            self.shm = shared_memory.SharedMemory(name=name)
+            if self.shm.size < size:
+                self.shm.close()
+                raise ValueError(f"既存の共有メモリが小さすぎます（{self.shm.size} < {size}バイト）")
+        elif create:
+            size = (HEADER_WORDS + capacity * slot_words) * 8
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            untrack_shared_memory(self.shm)
+
+        self.header = np.ndarray((HEADER_WORDS,), dtype='<u8', buffer=self.shm.buf)
+        if create:
+            self.header[:] = 0
+            self.header[H_MAGIC] = MAGIC
+            self.header[H_VERSION] = LAYOUT_VERSION
+            self.header[H_CAPACITY] = capacity
+            self.header[H_FIELDS] = len(FIELDS)
+            self.header[H_PID] = os.getpid()
+        elif self.header[H_MAGIC] != MAGIC or self.header[H_VERSION] != LAYOUT_VERSION:
+            self.shm.close()
+            raise ValueError("共有メモリのレイアウトが一致しません")
+
+        self.capacity = int(self.header[H_CAPACITY])
+        offset = HEADER_WORDS * 8
+        self.seqs = np.ndarray((self.capacity,), dtype='<u8', buffer=self.shm.buf, offset=offset,
+                               strides=(slot_words * 8,))
+        self.values = np.ndarray((self.capacity, len(FIELDS)), dtype='<f8', buffer=self.shm.buf,
+                                 offset=offset + 8, strides=(slot_words * 8, 8))
+        if create:
+            # 再利用したマッピングに前回のseqが残っていると新しい通し番号と一致してしまう
+            self.seqs[:] = 0
+        self.owner = create
+
+    @property
+    def write_count(self) -> int:
+        return int(self.header[H_WRITE_COUNT])
+
+    @property
+    def collector_pid(self) -> int:
+        return int(self.header[H_PID])
+
+    def write(self, record: dict):
+        """1レコード書き込み（書き込みは収集プロセスのみ）"""
+        n = int(self.header[H_WRITE_COUNT])
+        slot = n % self.capacity
+        row = np.array([np.nan if record.get(name) is None else record[name] for name in FIELDS], dtype='<f8')
+        self.seqs[slot] = 2 * n + 1
+        self.values[slot] = row
+        self.seqs[slot] = 2 * n + 2
+        self.header[H_WRITE_COUNT] = n + 1
+
+    def read_since(self, last_seq: int):
+        """last_seq以降に書かれたレコードを (配列[件数, フィールド], 次回のlast_seq) で返す
+
+        リングから押し出された古いレコードは読み飛ばします。
+        """
+        count = self.write_count
+        first = max(last_seq, count - self.capacity)
+        if first >= count:
+            return np.empty((0, len(FIELDS))), count
+
+        indices = np.arange(first, count)
+        slots = indices % self.capacity
+        before = self.seqs[slots].copy()
+        rows = self.values[slots].copy()
+        after = self.seqs[slots]
+        # 読み込み中に上書きされたスロットは除外
+        valid = (before == after) & (before == 2 * indices.astype('<u8') + 2)
+        return rows[valid], count
+
+    def latest(self):
+        """最新レコードを辞書で返す（まだ書かれていない場合はNone）"""
+        count = self.write_count
+        if count == 0:
+            return None
+        rows, _ = self.read_since(count - 1)
+        if len(rows) == 0:
+            return None
+        return record_from_row(rows[-1])
+
+    @property
+    def closed(self) -> bool:
+        return self.header is None
+
+    def close(self):
+        """マッピングを閉じる（2回目以降は何もしない）"""
+        if self.closed:
+            return
+        self.header = self.seqs = self.values = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def untrack_shared_memory(shm: shared_memory.SharedMemory):
+    """接続側プロセスの終了時に共有メモリが削除されないようにする（POSIXのresource_tracker対策）"""
+    if os.name == 'nt':
+        return
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def record_from_row(row: np.ndarray) -> dict:
+    """配列の1行をレコード辞書へ変換（NaNはNone）"""
+    record = {name: (None if np.isnan(row[i]) else float(row[i])) for i, name in enumerate(FIELDS)}
+    flags = int(record['vr_process_flags'] or 0)
+    record['vr_processes'] = {name: bool(flags & (1 << i)) for i, name in enumerate(VR_PROCESS_NAMES)}
+    return record
+
+
+def is_collector_alive(ring: MetricsRing, stale_seconds: float = 10.0) -> bool:
+    """収集プロセスが動作中か（PIDの存在と最新レコードの鮮度で判定）"""
+    if not psutil.pid_exists(ring.collector_pid):
+        return False
+    latest = ring.latest()
+    return latest is None or time.time() - latest['ts'] < stale_seconds
+
+
+def spawn_collector(interval: float = 1.0):
+    """収集プロセスをバックグラウンドで起動"""
+    script = os.path.abspath(__file__)
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    subprocess.Popen([sys.executable, script, '--interval', str(interval)],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     **kwargs)
+    logger.info("📡 メトリクス収集プロセスを起動しました")
+
+
+def attach(spawn: bool = True, timeout: float = 5.0):
+    """共有メモリへ接続（収集プロセスがなければ起動して待機）。失敗時はNone"""
+    deadline = time.time() + timeout
+    spawned = False
+    while True:
+        try:
+            ring = MetricsRing()
+            if is_collector_alive(ring):
+                return ring
+            ring.close()
+        except (FileNotFoundError, ValueError):
+            pass
+
+        if not spawn or time.time() > deadline:
+            return None
+        if not spawned:
+            spawn_collector()
+            spawned = True
+        time.sleep(0.2)
+
+
+def run_collector(interval: float = 1.0, capacity: int = DEFAULT_CAPACITY,
+                  api_host: str = None, api_port: int = None):
+    """収集ループ（1つのマシンで1プロセスのみ動作）
+
+    api_port を指定すると HTTP/WebSocket API（vr_metrics_api）と /metrics エクスポーターを同じプロセス内で起動します。
+    """
+    try:
+        existing = MetricsRing()
+        alive = is_collector_alive(existing)
+        existing.close()
+        if alive:
+            logger.info("収集プロセスは既に動作中です")
+            return
+        # 前回の収集プロセスが異常終了して残った共有メモリを破棄
+        stale = shared_memory.SharedMemory(name=SHM_NAME)
+        stale.close()
+        stale.unlink()
+    except (FileNotFoundError, ValueError):
+        pass
+
+    try:
+        ring = MetricsRing(create=True, capacity=capacity)
+    except FileExistsError:
+        # Windowsでは unlink が何もしないため、ダッシュボード等が古いマッピングを開いている間は名前が残る
+        try:
+            ring = MetricsRing(create=True, capacity=capacity, reuse=True)
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"共有メモリを作成できません: {e}")
+            return
+        logger.info("残っていた共有メモリを初期化し直して使用します")
+    ring.header[H_INTERVAL] = int(interval * 1000)
+    sampler = SystemSampler()
+    logger.info(f"📡 メトリクス収集開始（{interval}秒間隔、共有メモリ: {SHM_NAME}）")
+
+    api = exporter = None
+    if api_port is not None:
+        from vr_metrics_api import MetricsAPIServer, DEFAULT_HOST
+        from vr_metrics_exporter import OpenMetricsExporter
+        exporter = OpenMetricsExporter()
+        api = MetricsAPIServer(ring, sampler.get_process_details, api_host or DEFAULT_HOST, api_port,
+                               exporter=exporter)
+        api.start_in_thread()
+
+    next_tick = time.monotonic()
+    try:
+        while True:
+            try:
+                record = sampler.sample()
+                ring.write(record)
+                if api:
+                    exporter.update(record, sampler.get_process_details())
+                    api.publish(record)
+            except Exception as e:
+                logger.error(f"サンプリングエラー: {e}")
+            next_tick += interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if api:
+            api.stop()
+        ring.close()
+        logger.info("⏹️ メトリクス収集停止")
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='VRシステムメトリクス常駐収集プロセス')
+    parser.add_argument('--interval', type=float, default=1.0, help='サンプリング間隔（秒）')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help='リングバッファのレコード数')
+    parser.add_argument('--show', action='store_true', help='最新レコードを表示して終了')
+    parser.add_argument('--api-port', type=int, default=8765, help='HTTP/WebSocket APIのポート')
+    parser.add_argument('--api-host', default='127.0.0.1', help='APIの待ち受けアドレス（LAN内の端末から見る場合は0.0.0.0）')
+    parser.add_argument('--no-api', action='store_true', help='HTTP/WebSocket APIを起動しない')
+    args = parser.parse_args()
+
+    if args.show:
+        ring = attach(spawn=False)
+        if ring is None:
+            print("収集プロセスが動作していません")
+            return
+        print(ring.latest())
+        ring.close()
+        return
+
+    run_collector(args.interval, args.capacity, args.api_host, None if args.no_api else args.api_port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRステーション OpenMetrics/Prometheus エクスポーター
+収集プロセスのサンプル、イベントタイムライン（復旧・最適化ステップ）、FPSサンプルファイル（フレームタイム）から
+メトリクスを組み立て、収集プロセスのAPIサーバーの /metrics で公開します。
+
+系列の並び（メトリクス名とラベルの組）が変わったときだけ各行の接頭辞を事前エンコードし直し、
+スクレイプ時は値の数値化と連結だけを再利用バッファ上で行います。同じサンプルへの再スクレイプは前回の結果を返します。
+
+メトリクス名とラベルは固定です（名前を変える場合は新しい名前を追加し、古い名前は残してください）。
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+import threading
+from collections import deque
+
+import numpy as np
+import psutil
+
+from vr_event_timeline import TIMELINE_DB, FPS_SAMPLES_FILE
+from vr_metrics_collector import VR_PROCESS_NAMES
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+FRAMETIME_QUANTILES = (0.5, 0.9, 0.99)
+FRAMETIME_WINDOW_SECONDS = 300
+SLOW_REFRESH_SECONDS = 15
+
+GIB = 1024 ** 3
+MIB = 1024 ** 2
+
+# (名前, 型, 説明) — 名前はOpenMetricsのファミリー名（counterの系列は _total 付き）
+FAMILIES = [
+    ('vrstation_cpu_usage_ratio', 'gauge', 'Total CPU utilisation (0-1).'),
+    ('vrstation_cpu_core_usage_ratio', 'gauge', 'Per-core CPU utilisation (0-1).'),
+    ('vrstation_cpu_temperature_celsius', 'gauge', 'CPU package temperature.'),
+    ('vrstation_memory_used_bytes', 'gauge', 'Physical memory in use.'),
+    ('vrstation_memory_total_bytes', 'gauge', 'Installed physical memory.'),
+    ('vrstation_memory_usage_ratio', 'gauge', 'Physical memory utilisation (0-1).'),
+    ('vrstation_gpu_usage_ratio', 'gauge', 'GPU load (0-1).'),
+    ('vrstation_gpu_temperature_celsius', 'gauge', 'GPU temperature.'),
+    ('vrstation_gpu_vram_used_bytes', 'gauge', 'GPU memory in use.'),
+    ('vrstation_gpu_vram_total_bytes', 'gauge', 'GPU memory installed.'),
+    ('vrstation_app_up', 'gauge', 'Whether a VR application process is running.'),
+    ('vrstation_app_cpu_usage_ratio', 'gauge', 'CPU used by a VR application, as a share of all cores (0-1).'),
+    ('vrstation_app_resident_memory_bytes', 'gauge', 'Resident memory of a VR application (all processes).'),
+    ('vrstation_frametime_seconds', 'summary', 'VRChat frame time over the last 5 minutes.'),
+    ('vrstation_recoveries', 'counter', 'Automatic application restarts by result.'),
+    ('vrstation_optimization_step_runs', 'counter', 'Optimization step executions by result.'),
+    ('vrstation_optimization_step_duration_seconds', 'gauge', 'Duration of the most recent run of each optimization step.'),
+    ('vrstation_collector_samples', 'counter', 'Samples taken by the collector.'),
+]
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+
+class OpenMetricsExporter:
+    """サンプルからOpenMetricsテキストを組み立てる（update: 収集スレッド、render: APIスレッド）"""
+
+    def __init__(self, timeline_db: str = TIMELINE_DB, samples_path: str = FPS_SAMPLES_FILE,
+                 slow_refresh: float = SLOW_REFRESH_SECONDS):
+        self.timeline_db = timeline_db
+        self.samples_path = samples_path
+        self.slow_refresh = slow_refresh
+        self.cpu_count = psutil.cpu_count() or 1
+        self.lock = threading.Lock()
+
+        # 現在の系列の並び
+        self.layout_key = None
+        self.prefixes = []  # 事前エンコード済みの行頭（ファミリーヘッダを含む）
+        self.values = []
+        self.version = 0
+        self.buffer = bytearray()
+        self.rendered = (-1, b'')
+
+        # 低頻度で更新するソース
+        self.next_slow_refresh = 0.0
+        self.recoveries = {}
+        self.step_runs = {}
+        self.step_durations = {}
+        self.samples_offset = 0
+        self.frametimes = deque()  # (ts, 秒)
+        self.frametime_count = 0
+        self.frametime_sum = 0.0
+        self.sample_count = 0
+
+    # ---- 収集スレッド ----
+
+    def update(self, record: dict, process_details: list = None):
+        """最新サンプルを反映（系列の並びが変わったときだけ接頭辞を作り直す）"""
+        self.sample_count += 1
+        now = time.time()
+        if now >= self.next_slow_refresh:
+            self.refresh_slow_sources(now)
+            self.next_slow_refresh = now + self.slow_refresh
+
+        series = self.collect_series(record, process_details or [])
+        key = tuple((name, labels) for name, labels, _ in series)
+        values = [value for _, _, value in series]
+        with self.lock:
+            if key != self.layout_key:
+                self.layout_key = key
+                self.prefixes = self.build_prefixes(series)
+            self.values = values
+            self.version += 1
+
+    def collect_series(self, record: dict, process_details: list) -> list:
+        """(系列名, ラベル文字列, 値) のリスト（FAMILIES順、値がないものは省略）"""
+        series = []
+
+        def add(name, value, labels=''):
+            if value is not None:
+                series.append((name, labels, float(value)))
+
+        def scaled(key, factor):
+            value = record.get(key)
+            return None if value is None else value * factor
+
+        add('vrstation_cpu_usage_ratio', scaled('cpu_usage', 0.01))
+        for core, percent in enumerate(record.get('cpu_per_core') or []):
+            add('vrstation_cpu_core_usage_ratio', percent / 100, format_labels({'core': core}))
+        add('vrstation_cpu_temperature_celsius', record.get('cpu_temp'))
+        add('vrstation_memory_used_bytes', scaled('memory_used_gb', GIB))
+        add('vrstation_memory_total_bytes', scaled('memory_total_gb', GIB))
+        add('vrstation_memory_usage_ratio', scaled('memory_usage', 0.01))
+        add('vrstation_gpu_usage_ratio', scaled('gpu_usage', 0.01))
+        add('vrstation_gpu_temperature_celsius', record.get('gpu_temp'))
+        add('vrstation_gpu_vram_used_bytes', scaled('vram_used', MIB))
+        add('vrstation_gpu_vram_total_bytes', scaled('vram_total', MIB))
+
+        flags = int(record.get('vr_process_flags') or 0)
+        cpu = {name: 0.0 for name in VR_PROCESS_NAMES}
+        rss = {name: 0.0 for name in VR_PROCESS_NAMES}
+        for proc in process_details:
+            cpu[proc['app']] += proc['cpu_percent']
+            rss[proc['app']] += proc['rss_mb']
+        for i, name in enumerate(VR_PROCESS_NAMES):
+            add('vrstation_app_up', 1 if flags & (1 << i) else 0, format_labels({'app': name}))
+        for name in VR_PROCESS_NAMES:
+            add('vrstation_app_cpu_usage_ratio', cpu[name] / 100 / self.cpu_count, format_labels({'app': name}))
+        for name in VR_PROCESS_NAMES:
+            add('vrstation_app_resident_memory_bytes', rss[name] * MIB, format_labels({'app': name}))
+
+        if self.frametimes:
+            window = np.fromiter((ft for _, ft in self.frametimes), dtype=np.float64, count=len(self.frametimes))
+            for q, value in zip(FRAMETIME_QUANTILES, np.quantile(window, FRAMETIME_QUANTILES)):
+                add('vrstation_frametime_seconds', value, format_labels({'quantile': q}))
+        add('vrstation_frametime_seconds_count', self.frametime_count)
+        add('vrstation_frametime_seconds_sum', self.frametime_sum)
+
+        for (app, result), count in sorted(self.recoveries.items()):
+            add('vrstation_recoveries_total', count, format_labels({'app': app, 'result': result}))
+        for (step, result), count in sorted(self.step_runs.items()):
+            add('vrstation_optimization_step_runs_total', count, format_labels({'step': step, 'result': result}))
+        for step, duration in sorted(self.step_durations.items()):
+            add('vrstation_optimization_step_duration_seconds', duration, format_labels({'step': step}))
+        add('vrstation_collector_samples_total', self.sample_count)
+        return series
+
+    @staticmethod
+    def build_prefixes(series: list) -> list:
+        """各行の接頭辞（ファミリーの先頭行には # TYPE / # HELP を含める）"""
+        families = {name: (kind, help_text) for name, kind, help_text in FAMILIES}
+        prefixes = []
+        current = None
+        for name, labels, _ in series:
+            family = next(f for f in families if name == f or name.startswith(f + '_'))
+            header = ''
+            if family != current:
+                kind, help_text = families[family]
+                header = f"# TYPE {family} {kind}\n# HELP {family} {help_text}\n"
+                current = family
+            prefixes.append(f"{header}{name}{labels} ".encode('utf-8'))
+        return prefixes
+
+    def refresh_slow_sources(self, now: float):
+        """タイムラインDBとFPSサンプルファイルからの読み込み（数秒に1回）"""
+        if os.path.exists(self.timeline_db):
+            try:
+                conn = sqlite3.connect(f"file:{self.timeline_db}?mode=ro", uri=True)
+                try:
+                    self.recoveries = {(label, detail): count for label, detail, count in conn.execute(
+                        "SELECT label, detail, COUNT(*) FROM events WHERE kind = 'recovery' GROUP BY label, detail")}
+                    self.step_runs = {(label, detail): count for label, detail, count in conn.execute(
+                        "SELECT label, detail, COUNT(*) FROM events WHERE kind = 'optimization' GROUP BY label, detail")}
+                    self.step_durations = {label: value for label, value, _ in conn.execute(
+                        "SELECT label, value, MAX(ts) FROM events WHERE kind = 'optimization' AND value IS NOT NULL"
+                        " GROUP BY label")}
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                pass
+
+        # FPSサンプル (ts, fps) の追記分だけ読む
+        try:
+            size = os.path.getsize(self.samples_path)
+        except OSError:
+            size = 0
+        if size < self.samples_offset:
+            self.samples_offset = 0
+        usable = size - (size - self.samples_offset) % 16
+        if usable > self.samples_offset:
+            # 初回は直近の窓に収まる程度だけ読む
+            start = max(self.samples_offset, usable - FRAMETIME_WINDOW_SECONDS * 16 * 10)
+            with open(self.samples_path, 'rb') as f:
+                f.seek(start)
+                data = np.fromfile(f, dtype=np.float64, count=(usable - start) // 8).reshape(-1, 2)
+            self.samples_offset = usable
+            data = data[data[:, 1] > 0]
+            frametimes = 1.0 / data[:, 1]
+            self.frametime_count += len(frametimes)
+            self.frametime_sum += float(frametimes.sum())
+            self.frametimes.extend(zip(data[:, 0].tolist(), frametimes.tolist()))
+
+        cutoff = now - FRAMETIME_WINDOW_SECONDS
+        while self.frametimes and self.frametimes[0][0] < cutoff:
+            self.frametimes.popleft()
+
+    # ---- APIスレッド ----
+
+    def render(self) -> bytes:
+        """OpenMetricsテキスト（同じサンプルへの再スクレイプは前回の結果を返す）"""
+        with self.lock:
+            version, prefixes, values = self.version, self.prefixes, self.values
+        if self.rendered[0] == version:
+            return self.rendered[1]
+
+        buf = self.buffer
+        del buf[:]
+        for prefix, value in zip(prefixes, values):
+            buf += prefix
+            buf += (b'%d\n' % value) if value.is_integer() else (b'%r\n' % value)
+        buf += b'# EOF\n'
+        body = bytes(buf)
+        self.rendered = (version, body)
+        return body
+
+
+def benchmark(scrapes: int = 2000):
+    """1サンプルあたりの更新時間とスクレイプ時間を計測"""
+    from vr_metrics_collector import SystemSampler
+
+    sampler = SystemSampler()
+    exporter = OpenMetricsExporter()
+    record = sampler.sample()
+    details = sampler.get_process_details()
+
+    t0 = time.perf_counter()
+    for _ in range(100):
+        exporter.update(record, details)
+    update_cost = (time.perf_counter() - t0) / 100
+
+    t0 = time.perf_counter()
+    for _ in range(scrapes):
+        exporter.version += 1  # キャッシュを無効化して毎回組み立てる
+        body = exporter.render()
+    render_cost = (time.perf_counter() - t0) / scrapes
+
+    print(body.decode('utf-8'))
+    print(f"系列数 {len(exporter.values)} / {len(body)} bytes")
+    print(f"  サンプル反映: {update_cost * 1e6:.0f}µs  スクレイプ: {render_cost * 1e6:.0f}µs")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='VRステーション OpenMetrics エクスポーター（収集プロセスの /metrics で公開）')
+    parser.add_argument('--benchmark', action='store_true', help='現在値で出力例とスクレイプ時間を表示')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,13 +13,19 @@ import json
 import time
 import psutil
 import winreg
-import subprocess
 import threading
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import logging
-from tqdm import tqdm
+from vr_interference_monitor import InterferenceAttributor, FALLBACK_LOW_PRIORITY_PROCESSES
+from vr_event_timeline import EventTimeline
+from vr_step_executor import StepExecutor, step, format_report, REGISTRY, PROCESS, COMMAND
+from vr_settings_engine import SettingsEngine
+from vr_shell_session import run_commands
+from vr_hardware_inventory import get_gpu_info
+from vr_desired_state import WindowsState
+from vr_settings_journal import SettingsJournal, POWER, DNS
 
 # ログ設定
 logging.basicConfig(
@@ -48,6 +54,8 @@ class VROptimizerNoAdmin:
         
         self.detected_vr_apps = {}
         self.optimization_results = {}
+        self.settings_engine = SettingsEngine()
+        self.journal_transaction = None  # 実行中は変更前の値をジャーナルに記録
         
     def detect_vr_environment(self) -> Dict[str, bool]:
         """VR環境の検出"""
@@ -105,16 +113,17 @@ class VROptimizerNoAdmin:
                 except (psutil.NoSuchProcess, psutil.AccessDenied):
                     continue
             
-            # 不要なプロセスの優先度を下げる
-            low_priority_processes = [
-                'explorer.exe', 'dwm.exe', 'winlogon.exe', 'csrss.exe',
-                'chrome.exe', 'firefox.exe', 'discord.exe', 'spotify.exe'
-            ]
+            # 干渉スコアの高いプロセスの優先度を下げる（スコア未蓄積時は一般的なアプリのみ）
+            low_priority_processes = InterferenceAttributor().get_low_priority_candidates()
+            if low_priority_processes:
+                logger.info(f"📊 干渉スコア上位プロセス: {', '.join(low_priority_processes)}")
+            else:
+                low_priority_processes = FALLBACK_LOW_PRIORITY_PROCESSES
             
             for proc in psutil.process_iter(['pid', 'name']):
                 try:
                     proc_name = proc.info['name']
-                    if proc_name in low_priority_processes:
+                    if proc_name and proc_name.lower() in low_priority_processes:
                         if proc.username() == psutil.Process().username():
                             proc.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
                             optimized_count += 1
@@ -151,17 +160,26 @@ class VROptimizerNoAdmin:
                 'netsh interface ip add dns "Wi-Fi" 1.0.0.1 index=2',
             ]
             
-            success_count = 0
-            
-            for cmd in tqdm(network_commands, desc="ネットワーク最適化"):
+            # DNSを変更する前に元の設定を記録
+            if self.journal_transaction is not None:
                 try:
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        success_count += 1
-                    else:
-                        logger.warning(f"⚠️ コマンド実行警告: {cmd}")
+                    previous_dns = WindowsState().read_dns("Wi-Fi")
+                    if previous_dns is not None:
+                        self.journal_transaction.record(DNS, "Wi-Fi", previous_dns,
+                                                        {'source': 'static', 'servers': ['1.1.1.1', '1.0.0.1']})
                 except Exception as e:
-                    logger.warning(f"⚠️ ネットワークコマンドエラー: {cmd} - {e}")
+                    logger.warning(f"⚠️ DNS設定の記録エラー: {e}")
+            
+            # 1つのシェルでまとめて実行（コマンドごとにタイムアウト、ステップのタイムアウト内に収める）
+            success_count = 0
+            
+            for result in run_commands(network_commands, command_timeout=20, total_timeout=50):
+                if result['status'] == 'ok':
+                    success_count += 1
+                elif result['status'] == 'failed':
+                    logger.warning(f"⚠️ コマンド実行警告: {result['command']}")
+                else:
+                    logger.warning(f"⚠️ ネットワークコマンドエラー: {result['command']} - {result['status']}")
             
             logger.info(f"✅ {success_count}/{len(network_commands)}個のネットワーク最適化を完了")
             return success_count > len(network_commands) // 2
@@ -184,15 +202,23 @@ class VROptimizerNoAdmin:
                 'powercfg /change disk-timeout-ac 0',
             ]
             
-            success_count = 0
-            
-            for cmd in tqdm(power_commands, desc="電源設定最適化"):
+            # 電源プランを変更する前に元のプランを記録
+            if self.journal_transaction is not None:
                 try:
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        success_count += 1
+                    previous_scheme = WindowsState().active_power_scheme()
+                    if previous_scheme and previous_scheme != '8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c':
+                        self.journal_transaction.record(POWER, "ActivePowerScheme", previous_scheme,
+                                                        '8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c')
                 except Exception as e:
-                    logger.warning(f"⚠️ 電源コマンドエラー: {cmd} - {e}")
+                    logger.warning(f"⚠️ 電源プランの記録エラー: {e}")
+            
+            success_count = 0
+            
+            for result in run_commands(power_commands, command_timeout=20, total_timeout=50):
+                if result['status'] == 'ok':
+                    success_count += 1
+                elif result['status'] != 'failed':
+                    logger.warning(f"⚠️ 電源コマンドエラー: {result['command']} - {result['status']}")
             
             logger.info(f"✅ {success_count}/{len(power_commands)}個の電源設定を最適化")
             return success_count > 0
@@ -206,32 +232,28 @@ class VROptimizerNoAdmin:
         logger.info("🪟 Windows設定を最適化中...")
         
         try:
-            # Windows設定最適化コマンド
-            windows_commands = [
+            # Windows設定（reg add と同じ指定をプロセス内で適用）
+            windows_settings = [
                 # ゲームモード有効化
-                'reg add "HKCU\\SOFTWARE\\Microsoft\\GameBar" /v "AutoGameModeEnabled" /t REG_DWORD /d 1 /f',
+                ("HKCU\\SOFTWARE\\Microsoft\\GameBar", "AutoGameModeEnabled", "REG_DWORD", 1),
                 
                 # ハードウェアアクセラレーション有効化
-                'reg add "HKCU\\SOFTWARE\\Microsoft\\DirectX\\UserGpuPreferences" /v "DirectXUserGlobalSettings" /t REG_SZ /d "VRROptimizeEnable=1;" /f',
+                ("HKCU\\SOFTWARE\\Microsoft\\DirectX\\UserGpuPreferences", "DirectXUserGlobalSettings", "REG_SZ", "VRROptimizeEnable=1;"),
                 
                 # フルスクリーン最適化無効化
-                'reg add "HKCU\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\AppCompatFlags\\Layers" /v "VRChat.exe" /t REG_SZ /d "DISABLEDXMAXIMIZEDWINDOWEDMODE" /f',
+                ("HKCU\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\AppCompatFlags\\Layers", "VRChat.exe", "REG_SZ", "DISABLEDXMAXIMIZEDWINDOWEDMODE"),
                 
                 # Visual Effects最適化
-                'reg add "HKCU\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\VisualEffects" /v "VisualFXSetting" /t REG_DWORD /d 2 /f',
+                ("HKCU\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\VisualEffects", "VisualFXSetting", "REG_DWORD", 2),
             ]
             
-            success_count = 0
+            report = self.settings_engine.apply(windows_settings, journal=self.journal_transaction)
+            for entry in report['values']:
+                if entry['status'] == 'error':
+                    logger.warning(f"⚠️ Windows設定エラー: {entry['path']}\\{entry['name']} - {entry['error']}")
+            success_count = report['applied']
             
-            for cmd in tqdm(windows_commands, desc="Windows設定最適化"):
-                try:
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        success_count += 1
-                except Exception as e:
-                    logger.warning(f"⚠️ Windows設定コマンドエラー: {cmd} - {e}")
-            
-            logger.info(f"✅ {success_count}/{len(windows_commands)}個のWindows設定を最適化")
+            logger.info(f"✅ {success_count}/{len(windows_settings)}個のWindows設定を最適化")
             return success_count > 0
             
         except Exception as e:
@@ -244,40 +266,22 @@ class VROptimizerNoAdmin:
         
         try:
             # NVIDIA GPU最適化
-            nvidia_commands = [
+            nvidia_settings = [
                 # NVIDIA Control Panel設定（レジストリ経由）
-                'reg add "HKCU\\SOFTWARE\\NVIDIA Corporation\\Global\\NVTweak" /v "DisplayPowerSaving" /t REG_DWORD /d 0 /f',
-                'reg add "HKCU\\SOFTWARE\\NVIDIA Corporation\\Global\\FTS" /v "EnableRidgedMultiGpu" /t REG_DWORD /d 0 /f',
+                ("HKCU\\SOFTWARE\\NVIDIA Corporation\\Global\\NVTweak", "DisplayPowerSaving", "REG_DWORD", 0),
+                ("HKCU\\SOFTWARE\\NVIDIA Corporation\\Global\\FTS", "EnableRidgedMultiGpu", "REG_DWORD", 0),
             ]
             
             # AMD GPU最適化
-            amd_commands = [
+            amd_settings = [
                 # AMD Radeon設定
-                'reg add "HKCU\\SOFTWARE\\AMD\\CN" /v "PowerSaverAutoEnable_DEF" /t REG_DWORD /d 0 /f',
+                ("HKCU\\SOFTWARE\\AMD\\CN", "PowerSaverAutoEnable_DEF", "REG_DWORD", 0),
             ]
             
-            success_count = 0
-            total_commands = len(nvidia_commands) + len(amd_commands)
-            
-            # NVIDIA設定
-            for cmd in nvidia_commands:
-                try:
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        success_count += 1
-                except Exception:
-                    pass
-            
-            # AMD設定
-            for cmd in amd_commands:
-                try:
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        success_count += 1
-                except Exception:
-                    pass
+            total_settings = len(nvidia_settings) + len(amd_settings)
+            success_count = self.settings_engine.apply(nvidia_settings + amd_settings, journal=self.journal_transaction)['applied']
             
-            logger.info(f"✅ {success_count}/{total_commands}個のGPU設定を最適化")
+            logger.info(f"✅ {success_count}/{total_settings}個のGPU設定を最適化")
             return success_count > 0
             
         except Exception as e:
@@ -289,24 +293,20 @@ class VROptimizerNoAdmin:
         logger.info("💾 メモリ設定を最適化中...")
         
         try:
-            # メモリ最適化コマンド
-            memory_commands = [
+            # メモリ最適化設定
+            memory_settings = [
                 # 仮想メモリ設定
-                'reg add "HKCU\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Serialize" /v "StartupDelayInMSec" /t REG_DWORD /d 0 /f',
+                ("HKCU\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Serialize", "StartupDelayInMSec", "REG_DWORD", 0),
                 
                 # プリフェッチ最適化
-                'reg add "HKCU\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced" /v "EnableBalloonTips" /t REG_DWORD /d 0 /f',
+                ("HKCU\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced", "EnableBalloonTips", "REG_DWORD", 0),
             ]
             
-            success_count = 0
-            
-            for cmd in tqdm(memory_commands, desc="メモリ設定最適化"):
-                try:
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        success_count += 1
-                except Exception as e:
-                    logger.warning(f"⚠️ メモリ設定コマンドエラー: {cmd} - {e}")
+            report = self.settings_engine.apply(memory_settings, journal=self.journal_transaction)
+            for entry in report['values']:
+                if entry['status'] == 'error':
+                    logger.warning(f"⚠️ メモリ設定エラー: {entry['path']}\\{entry['name']} - {entry['error']}")
+            success_count = report['applied']
             
             # メモリ使用量の確認と最適化
             memory = psutil.virtual_memory()
@@ -315,7 +315,7 @@ class VROptimizerNoAdmin:
             if memory.percent > 80:
                 logger.warning("⚠️ メモリ使用量が高いです。不要なアプリケーションを終了することを推奨します。")
             
-            logger.info(f"✅ {success_count}/{len(memory_commands)}個のメモリ設定を最適化")
+            logger.info(f"✅ {success_count}/{len(memory_settings)}個のメモリ設定を最適化")
             return True
             
         except Exception as e:
@@ -328,36 +328,29 @@ class VROptimizerNoAdmin:
         
         try:
             # VRChat専用設定
-            vrchat_commands = [
+            vrchat_settings = [
                 # VRChat最適化設定
-                'reg add "HKCU\\SOFTWARE\\VRChat\\VRChat" /v "fps_limit_desktop" /t REG_DWORD /d 144 /f',
-                'reg add "HKCU\\SOFTWARE\\VRChat\\VRChat" /v "fps_limit_vr" /t REG_DWORD /d 90 /f',
+                ("HKCU\\SOFTWARE\\VRChat\\VRChat", "fps_limit_desktop", "REG_DWORD", 144),
+                ("HKCU\\SOFTWARE\\VRChat\\VRChat", "fps_limit_vr", "REG_DWORD", 90),
             ]
             
             # SteamVR設定
-            steamvr_commands = [
+            steamvr_settings = [
                 # SteamVR最適化
-                'reg add "HKCU\\SOFTWARE\\Valve\\Steam\\Apps\\250820" /v "LaunchOptions" /t REG_SZ /d "-vrmode vr -novid -nojoy" /f',
+                ("HKCU\\SOFTWARE\\Valve\\Steam\\Apps\\250820", "LaunchOptions", "REG_SZ", "-vrmode vr -novid -nojoy"),
             ]
             
-            success_count = 0
-            total_commands = len(vrchat_commands) + len(steamvr_commands)
+            total_settings = len(vrchat_settings) + len(steamvr_settings)
+            success_count = self.settings_engine.apply(vrchat_settings + steamvr_settings, journal=self.journal_transaction)['applied']
             
-            for cmd in vrchat_commands + steamvr_commands:
-                try:
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        success_count += 1
-                except Exception:
-                    pass
-            
-            logger.info(f"✅ {success_count}/{total_commands}個のVR専用設定を最適化")
+            logger.info(f"✅ {success_count}/{total_settings}個のVR専用設定を最適化")
             return success_count > 0
             
         except Exception as e:
             logger.error(f"❌ VR専用設定最適化エラー: {e}")
             return False
     
+
     def optimize_amd_gpu_vrchat(self) -> bool:
         """AMD GPU向けVRChat特化最適化"""
         try:
@@ -366,10 +359,7 @@ class VROptimizerNoAdmin:
             # AMD GPU検出
             amd_gpu_detected = False
             try:
-                import subprocess
-                gpu_info = subprocess.run(['wmic', 'path', 'win32_VideoController', 'get', 'name'], 
-                                        capture_output=True, text=True, timeout=10)
-                if 'AMD' in gpu_info.stdout or 'Radeon' in gpu_info.stdout:
+                if get_gpu_info()['vendor'] == 'AMD':
                     amd_gpu_detected = True
                     logger.info("AMD GPUを検出しました")
             except Exception:
@@ -577,35 +567,51 @@ class VROptimizerNoAdmin:
         # VR環境検出
         self.detect_vr_environment()
         
-        # 最適化実行
+        # 最適化実行（外部コマンド待ちは並列、レジストリ・プロセス優先度の変更は1つずつ）
+        # レジストリを書くステップはプロセス優先度も変更する場合も REGISTRY として宣言順に実行
         optimizations = [
-            ("プロセス優先度最適化", self.optimize_process_priorities),
-            ("ネットワーク設定最適化", self.optimize_network_settings),
-            ("電源設定最適化", self.optimize_power_settings),
-            ("Windows設定最適化", self.optimize_windows_settings),
-            ("GPU設定最適化", self.optimize_gpu_settings),
-            ("メモリ設定最適化", self.optimize_memory_settings),
-            ("VR専用設定最適化", self.optimize_vr_specific_settings),
-            ("AMD GPU向けVRChat最適化", self.optimize_amd_gpu_vrchat),
-            ("VRChat特化設定最適化", self.optimize_vrchat_specific_settings),
-            ("VirtualDesktop最適化", self.optimize_virtual_desktop),
-            ("SteamVR性能最適化", self.optimize_steamvr_performance),
+            step("プロセス優先度最適化", self.optimize_process_priorities, PROCESS),
+            step("ネットワーク設定最適化", self.optimize_network_settings, COMMAND),
+            step("電源設定最適化", self.optimize_power_settings, COMMAND),
+            step("Windows設定最適化", self.optimize_windows_settings, REGISTRY),
+            step("GPU設定最適化", self.optimize_gpu_settings, REGISTRY),
+            step("メモリ設定最適化", self.optimize_memory_settings, REGISTRY),
+            step("VR専用設定最適化", self.optimize_vr_specific_settings, REGISTRY),
+            step("AMD GPU向けVRChat最適化", self.optimize_amd_gpu_vrchat, REGISTRY, after=["GPU設定最適化"]),
+            # 個別アプリの優先度・ネットワーク設定は全体設定の後に上書きする
+            step("VRChat特化設定最適化", self.optimize_vrchat_specific_settings, PROCESS, after=["プロセス優先度最適化"]),
+            step("VirtualDesktop最適化", self.optimize_virtual_desktop, REGISTRY,
+                 after=["プロセス優先度最適化", "ネットワーク設定最適化"]),
+            step("SteamVR性能最適化", self.optimize_steamvr_performance, REGISTRY, after=["プロセス優先度最適化"]),
         ]
         
-        results = {}
+        timeline = EventTimeline()
+        journal = SettingsJournal()
+        self.journal_transaction = journal.begin("VR環境最適化（管理者権限不要版）")
+        
+        def on_step_done(name, record):
+            if record['status'] == 'ok':
+                logger.info(f"✅ {name}が完了しました")
+            elif record['status'] == 'failed':
+                logger.warning(f"⚠️ {name}で問題が発生しました")
+            elif record['status'] == 'timeout':
+                logger.error(f"❌ {name}がタイムアウトしました")
+            else:
+                logger.error(f"❌ {name}でエラーが発生: {record['error']}")
+            timeline.record_optimization(name, record['result'], record['duration'])
         
-        for name, func in optimizations:
-            logger.info(f"\n📋 {name}を実行中...")
-            try:
-                results[name] = func()
-                if results[name]:
-                    logger.info(f"✅ {name}が完了しました")
-                else:
-                    logger.warning(f"⚠️ {name}で問題が発生しました")
-            except Exception as e:
-                logger.error(f"❌ {name}でエラーが発生: {e}")
-                results[name] = False
+        logger.info(f"\n📋 {len(optimizations)}個の最適化を実行中...")
+        report = StepExecutor(on_step_done=on_step_done).run(optimizations)
+        timeline.close()
+        logger.info(format_report(report))
+        
+        transaction, self.journal_transaction = self.journal_transaction, None
+        journal.close()
+        if transaction.id is not None:
+            logger.info(f"📒 変更前の値を記録しました（#{transaction.id}、{transaction.count}件）"
+                        f" - 元に戻す: python vr_settings_journal.py --rollback {transaction.id}")
         
+        results = report['results']
         self.optimization_results = results
         return results
     
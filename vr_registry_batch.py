@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+レジストリ一括書き込みモジュール
+書き込みをキーごとにまとめ、各キーを1回だけ開いて現在値を一括で読み、
+値が異なるものだけを書き込みます。結果は値ごとのレポートで返します。
+
+バックエンド:
+  WinRegBackend  Windowsレジストリ（winreg）
+  MemoryBackend  メモリ上の辞書（同じインターフェース。Linuxでの動作確認・ベンチマーク用）
+"""
+
+import time
+import argparse
+from collections import OrderedDict
+
+HKCU = 'HKCU'
+HKLM = 'HKLM'
+
+# winregと同じ値（バックエンドに依存しない型指定に使う）
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_DWORD = 4
+REG_QWORD = 11
+
+
+def infer_type(value):
+    """値からレジストリ型を決める（floatは従来どおり文字列として保存）"""
+    if isinstance(value, float):
+        return str(value), REG_SZ
+    if isinstance(value, str):
+        return value, REG_SZ
+    return int(value), REG_DWORD
+
+
+class WinRegBackend:
+    """winregによるバックエンド"""
+
+    def __init__(self):
+        import winreg
+        self.winreg = winreg
+        self.hives = {HKCU: winreg.HKEY_CURRENT_USER, HKLM: winreg.HKEY_LOCAL_MACHINE}
+
+    def open_key(self, hive: str, path: str, create: bool):
+        access = self.winreg.KEY_READ | self.winreg.KEY_SET_VALUE
+        if create:
+            return self.winreg.CreateKeyEx(self.hives[hive], path, 0, access)
+        return self.winreg.OpenKey(self.hives[hive], path, 0, access)
+
+    def read_values(self, key) -> dict:
+        values = {}
+        for i in range(self.winreg.QueryInfoKey(key)[1]):
+            name, data, value_type = self.winreg.EnumValue(key, i)
+            values[name] = (data, value_type)
+        return values
+
+    def read_key(self, hive: str, path: str):
+        """読み取り専用でキーの全値を読む（キーがなければNone）"""
+        try:
+            key = self.winreg.OpenKey(self.hives[hive], path, 0, self.winreg.KEY_READ)
+        except FileNotFoundError:
+            return None
+        try:
+            return self.read_values(key)
+        finally:
+            self.winreg.CloseKey(key)
+
+    def set_value(self, key, name: str, value_type: int, value):
+        self.winreg.SetValueEx(key, name, 0, value_type, value)
+
+    def delete_value(self, key, name: str):
+        self.winreg.DeleteValue(key, name)
+
+    def close_key(self, key):
+        self.winreg.CloseKey(key)
+
+
+class MemoryBackend:
+    """メモリ上のレジストリ（キー・値名は大文字小文字を区別しない）
+
+    latency を指定すると各API呼び出しにその秒数の待ちを入れます（ベンチマーク用）。
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.keys = {}  # (hive, path小文字) -> {値名: (値, 型)}
+        self.latency = latency
+        self.calls = {'open': 0, 'read': 0, 'write': 0, 'close': 0}
+
+    def call(self, kind: str):
+        self.calls[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def open_key(self, hive: str, path: str, create: bool):
+        self.call('open')
+        key = (hive, path.lower())
+        if key not in self.keys:
+            if not create:
+                raise FileNotFoundError(f"{hive}\\{path}")
+            self.keys[key] = {}
+        return key
+
+    def read_values(self, key) -> dict:
+        self.call('read')
+        return dict(self.keys[key])
+
+    def read_key(self, hive: str, path: str):
+        self.call('read')
+        values = self.keys.get((hive, path.lower()))
+        return dict(values) if values is not None else None
+
+    def set_value(self, key, name: str, value_type: int, value):
+        self.call('write')
+        values = self.keys[key]
+        for existing in list(values):
+            if existing.lower() == name.lower():
+                del values[existing]
+        values[name] = (value, value_type)
+
+    def delete_value(self, key, name: str):
+        self.call('write')
+        values = self.keys[key]
+        for existing in list(values):
+            if existing.lower() == name.lower():
+                del values[existing]
+
+    def close_key(self, key):
+        self.call('close')
+
+
+def default_backend():
+    return WinRegBackend()
+
+
+class RegistryBatch:
+    """キー単位にまとめたレジストリ書き込み
+
+    journal（vr_settings_journal のトランザクション）を渡すと、キーごとに書き込む前に元の値を記録します。
+    """
+
+    def __init__(self, backend=None, hive: str = HKCU, journal=None):
+        self.backend = backend or default_backend()
+        self.hive = hive
+        self.journal = journal
+        self.pending = OrderedDict()  # (hive, path, create) -> OrderedDict(値名小文字 -> (値名, 値, 型))
+
+    def set(self, path: str, name: str, value, value_type: int = None, hive: str = None, create: bool = True):
+        """書き込みを追加（同じ値への複数回の指定は最後のものが有効）
+
+        create=False の場合、キーが存在しなければ作成せずにエラーとして報告します。
+        """
+        if value_type is None:
+            value, value_type = infer_type(value)
+        key = ((hive or self.hive), path, create)
+        self.pending.setdefault(key, OrderedDict())[name.lower()] = (name, value, value_type)
+        return self
+
+    def delete(self, path: str, name: str, hive: str = None):
+        """値の削除を追加（キーは作成しない）"""
+        key = ((hive or self.hive), path, False)
+        self.pending.setdefault(key, OrderedDict())[name.lower()] = (name, None, None)
+        return self
+
+    def extend(self, settings: list, **options):
+        """(キーのパス, 値名, 値) のリストを追加"""
+        for path, name, value in settings:
+            self.set(path, name, value, **options)
+        return self
+
+    def apply(self) -> dict:
+        """キーごとに1回開き、現在値と異なるものだけ書き込む"""
+        entries = []
+        keys_opened = 0
+        for (hive, path, create), values in self.pending.items():
+            try:
+                key = self.backend.open_key(hive, path, create)
+            except Exception as e:
+                for name, value, _ in values.values():
+                    entries.append({'hive': hive, 'path': path, 'name': name, 'value': value,
+                                    'previous': None, 'status': 'error', 'error': str(e)})
+                continue
+
+            keys_opened += 1
+            try:
+                current = {name.lower(): data for name, data in self.backend.read_values(key).items()}
+                writes = []
+                for lower_name, (name, value, value_type) in values.items():
+                    previous = current.get(lower_name)
+                    entry = {'hive': hive, 'path': path, 'name': name, 'value': value,
+                             'previous': previous[0] if previous else None, 'status': 'unchanged', 'error': None}
+                    if value_type is None:
+                        changed = previous is not None  # 削除（値がなければ変更なし）
+                    else:
+                        changed = previous != (value, value_type)
+                    if changed:
+                        writes.append((entry, previous, value_type))
+                    entries.append(entry)
+
+                if writes and self.journal is not None:
+                    try:
+                        self.journal.record_registry(hive, path, [(entry['name'], previous, entry['value'], value_type)
+                                                                  for entry, previous, value_type in writes])
+                    except Exception as e:
+                        # 元の値を記録できない変更は行わない
+                        for entry, _, _ in writes:
+                            entry['status'] = 'error'
+                            entry['error'] = f"ジャーナル記録エラー: {e}"
+                        writes = []
+
+                for entry, _, value_type in writes:
+                    try:
+                        if value_type is None:
+                            self.backend.delete_value(key, entry['name'])
+                        else:
+                            self.backend.set_value(key, entry['name'], value_type, entry['value'])
+                        entry['status'] = 'written'
+                    except Exception as e:
+                        entry['status'] = 'error'
+                        entry['error'] = str(e)
+            finally:
+                self.backend.close_key(key)
+
+        self.pending.clear()
+        return {
+            'values': entries,
+            'written': sum(1 for e in entries if e['status'] == 'written'),
+            'unchanged': sum(1 for e in entries if e['status'] == 'unchanged'),
+            'errors': sum(1 for e in entries if e['status'] == 'error'),
+            'keys_opened': keys_opened,
+        }
+
+
+def apply_settings(settings: list, backend=None, journal=None, **options) -> dict:
+    """(キーのパス, 値名, 値) のリストを一括適用"""
+    return RegistryBatch(backend, journal=journal).extend(settings, **options).apply()
+
+
+def summarize(report: dict) -> str:
+    """レポートの要約（ログ用）"""
+    return (f"🗂️ レジストリ: 書き込み {report['written']}件 / 変更なし {report['unchanged']}件"
+            f" / 失敗 {report['errors']}件（キー {report['keys_opened']}個）")
+
+
+def apply_per_value(settings: list, backend):
+    """従来の方式（値ごとにキーを開いて常に書き込み）。ベンチマーク比較用"""
+    for path, name, value in settings:
+        try:
+            key = backend.open_key(HKCU, path, True)
+            value, value_type = infer_type(value)
+            backend.set_value(key, name, value_type, value)
+            backend.close_key(key)
+        except Exception:
+            pass
+
+
+def benchmark(latency: float = 0.0002, rounds: int = 20):
+    """Windows低スペック最適化と同じ構成の書き込みで従来方式と比較"""
+    settings = [
+        ("SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\VisualEffects", "VisualFXSetting", 2),
+        ("SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced", "ListviewAlphaSelect", 0),
+        ("SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced", "TaskbarAnimations", 0),
+        ("SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced", "ListviewShadow", 0),
+        ("SOFTWARE\\Microsoft\\GameBar", "AllowAutoGameMode", 1),
+        ("SOFTWARE\\Microsoft\\GameBar", "AutoGameModeEnabled", 1),
+        ("SOFTWARE\\Microsoft\\GameBar", "UseNexusForGameBarEnabled", 0),
+        ("SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\Multimedia\\SystemProfile", "SystemResponsiveness", 0),
+        ("SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\Multimedia\\SystemProfile", "NetworkThrottlingIndex", 10),
+        ("Control Panel\\Desktop", "ForegroundLockTimeout", 0),
+        ("Control Panel\\Desktop", "MenuShowDelay", 0),
+        ("SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer", "Max Cached Icons", 2048),
+        ("SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer", "AlwaysUnloadDLL", 1),
+        ("SOFTWARE\\Guy Godin\\Virtual Desktop Streamer", "BitrateLimit", 150),
+        ("SOFTWARE\\Guy Godin\\Virtual Desktop Streamer", "RefreshRate", 72),
+        ("SOFTWARE\\Guy Godin\\Virtual Desktop Streamer", "SlicedEncoding", 1),
+        ("SOFTWARE\\Valve\\Steam\\steamvr", "renderTargetMultiplier", 0.8),
+        ("SOFTWARE\\Valve\\Steam\\steamvr", "allowSupersampleFiltering", 0),
+        ("SOFTWARE\\Valve\\Steam\\steamvr", "motionSmoothingOverride", 1),
+    ]
+
+    def measure(label, func):
+        backend = MemoryBackend(latency)
+        func(backend)  # 初回（全値が未設定）
+        backend.calls = dict.fromkeys(backend.calls, 0)
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            func(backend)
+        elapsed = (time.perf_counter() - t0) / rounds
+        calls = {k: v // rounds for k, v in backend.calls.items()}
+        print(f"  {label}: {elapsed * 1000:6.2f}ms / 回  API呼び出し {sum(calls.values())}回 {calls}")
+
+    print(f"{len(settings)}値 / API呼び出しあたり {latency * 1e6:.0f}µs（2回目以降＝すべて設定済みの状態）")
+    measure("従来方式", lambda b: apply_per_value(settings, b))
+    measure("一括方式", lambda b: apply_settings(settings, b))
+
+    backend = MemoryBackend()
+    first = apply_settings(settings, backend)
+    second = apply_settings(settings, backend)
+    print(f"  初回: {summarize(first)}")
+    print(f"  再実行: {summarize(second)}")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='レジストリ一括書き込み（差分のみ書き込み）')
+    parser.add_argument('--benchmark', action='store_true', help='メモリバックエンドで従来方式と比較')
+    parser.add_argument('--latency', type=float, default=0.0002, help='API呼び出し1回あたりの模擬待ち時間（秒）')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.latency)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
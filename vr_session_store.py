@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRセッション記録モジュール
+監視サンプルとVRChatログイベントをJSON Lines形式のセッションファイルに保存し、
+バッチ分析用にnumpy配列として読み込みます。
+
+1行1レコード:
+  {"type": "sample", "ts": ..., "fps": ..., "frametime": ..., "cpu": ..., ...}
+  {"type": "event", "ts": ..., "kind": "avatar_load", "label": ..., "value": ...}
+"""
+
+import os
+import json
+import glob
+import threading
+from datetime import datetime
+
+import numpy as np
+
+SESSION_DIR = 'vr_sessions'
+
+
+class SessionRecorder:
+    """セッションファイルへの追記"""
+
+    def __init__(self, path: str = None, flush_every: int = 10):
+        if path is None:
+            os.makedirs(SESSION_DIR, exist_ok=True)
+            path = os.path.join(SESSION_DIR, f"vr_session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        self.path = path
+        self.flush_every = flush_every
+        self.pending = []
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def add_sample(self, ts: float, **values):
+        """監視サンプルを追加"""
+        record = {'type': 'sample', 'ts': ts}
+        record.update(values)
+        self.append(record)
+
+    def add_event(self, event: dict):
+        """イベントを追加（vrchat_log_parserのイベント辞書）"""
+        record = {'type': 'event', 'ts': event['ts'], 'kind': event['kind'],
+                  'label': event.get('label', ''), 'value': event.get('value')}
+        self.append(record)
+
+    def append(self, record: dict):
+        with self.lock:
+            self.pending.append(json.dumps(record, ensure_ascii=False))
+            if len(self.pending) >= self.flush_every:
+                self.flush_locked()
+
+    def flush(self):
+        """書き込み待ちレコードを保存"""
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        if self.pending and not self.file.closed:
+            self.file.write('\n'.join(self.pending) + '\n')
+            self.file.flush()
+        self.pending = []
+
+    def close(self):
+        """セッションを閉じる"""
+        with self.lock:
+            self.flush_locked()
+            self.file.close()
+
+
+def list_sessions(directory: str = SESSION_DIR) -> list:
+    """保存済みセッションファイル一覧（古い順）"""
+    return sorted(glob.glob(os.path.join(directory, 'vr_session_*.jsonl')))
+
+
+def load_session(path: str) -> dict:
+    """セッションファイルを読み込み、サンプルを列ごとのnumpy配列（ts昇順）で返す"""
+    rows = []
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.pop('type', None) == 'event':
+                events.append(record)
+            else:
+                rows.append(record)
+
+    rows.sort(key=lambda r: r['ts'])
+    events.sort(key=lambda e: e['ts'])
+
+    keys = set()
+    for row in rows:
+        keys.update(row.keys())
+
+    samples = {}
+    for key in keys:
+        values = [row.get(key) for row in rows]
+        if all(v is None or isinstance(v, (int, float)) for v in values):
+            samples[key] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+    return {'path': path, 'samples': samples, 'events': events}
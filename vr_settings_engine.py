@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+プロセス内設定エンジン
+`reg add` と同じ (キー, 値名, 型, データ) の指定をプロセス内で適用します。
+値ごとに cmd.exe + reg.exe を起動する代わりに、vr_registry_batch でキーごとにまとめて
+現在値と異なるものだけを書き込みます。
+
+  ("HKCU\\SOFTWARE\\Microsoft\\GameBar", "AutoGameModeEnabled", "REG_DWORD", 1)
+  ≒ reg add "HKCU\\SOFTWARE\\Microsoft\\GameBar" /v "AutoGameModeEnabled" /t REG_DWORD /d 1 /f
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import subprocess
+
+from vr_registry_batch import RegistryBatch, HKCU, HKLM, REG_SZ, REG_EXPAND_SZ, REG_DWORD, REG_QWORD, summarize
+
+HIVES = {
+    'HKCU': HKCU,
+    'HKEY_CURRENT_USER': HKCU,
+    'HKLM': HKLM,
+    'HKEY_LOCAL_MACHINE': HKLM,
+}
+
+TYPES = {
+    'REG_SZ': REG_SZ,
+    'REG_EXPAND_SZ': REG_EXPAND_SZ,
+    'REG_DWORD': REG_DWORD,
+    'REG_QWORD': REG_QWORD,
+}
+
+
+def split_key(full_key: str):
+    """'HKCU\\SOFTWARE\\...' → (ハイブ, パス)"""
+    hive, _, path = full_key.partition('\\')
+    if hive.upper() not in HIVES:
+        raise ValueError(f"未対応のハイブ: {hive}")
+    return HIVES[hive.upper()], path
+
+
+def convert_data(type_name: str, data):
+    """reg add の /d と同じ解釈で値を変換"""
+    value_type = TYPES.get(type_name.upper())
+    if value_type is None:
+        raise ValueError(f"未対応の型: {type_name}")
+    if value_type in (REG_DWORD, REG_QWORD):
+        return (int(data, 0) if isinstance(data, str) else int(data)), value_type
+    return str(data), value_type
+
+
+class SettingsEngine:
+    """(キー, 値名, 型, データ) のリストをプロセス内で適用"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def apply(self, settings: list, journal=None) -> dict:
+        """設定を一括適用（レポートは vr_registry_batch と同じ形式）
+
+        'applied' には書き込み済み＋既に同じ値だった件数が入ります（reg add の成功数に相当）。
+        journal を渡すと書き込み前に元の値を記録します。
+        """
+        batch = RegistryBatch(self.backend, journal=journal)
+        invalid = []
+        for key, name, type_name, data in settings:
+            try:
+                hive, path = split_key(key)
+                value, value_type = convert_data(type_name, data)
+            except ValueError as e:
+                invalid.append({'hive': None, 'path': key, 'name': name, 'value': data,
+                                'previous': None, 'status': 'error', 'error': str(e)})
+                continue
+            batch.set(path, name, value, value_type, hive=hive)
+
+        report = batch.apply()
+        report['values'].extend(invalid)
+        report['errors'] += len(invalid)
+        report['applied'] = report['written'] + report['unchanged']
+        return report
+
+
+def reg_add_command(key: str, name: str, type_name: str, data) -> str:
+    """従来の reg add コマンド文字列（ベンチマーク比較用）"""
+    return f'reg add "{key}" /v "{name}" /t {type_name} /d {data} /f'
+
+
+def benchmark(rounds: int = 3):
+    """値ごとにシェル経由でプロセスを起動する従来方式と比較（Linuxでは代替の実行ファイルを起動）"""
+    from vr_registry_batch import MemoryBackend
+
+    settings = [
+        ("HKCU\\SOFTWARE\\Microsoft\\GameBar", "AutoGameModeEnabled", "REG_DWORD", 1),
+        ("HKCU\\SOFTWARE\\Microsoft\\DirectX\\UserGpuPreferences", "DirectXUserGlobalSettings", "REG_SZ", "VRROptimizeEnable=1;"),
+        ("HKCU\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\AppCompatFlags\\Layers", "VRChat.exe", "REG_SZ", "DISABLEDXMAXIMIZEDWINDOWEDMODE"),
+        ("HKCU\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\VisualEffects", "VisualFXSetting", "REG_DWORD", 2),
+        ("HKCU\\SOFTWARE\\NVIDIA Corporation\\Global\\NVTweak", "DisplayPowerSaving", "REG_DWORD", 0),
+        ("HKCU\\SOFTWARE\\NVIDIA Corporation\\Global\\FTS", "EnableRidgedMultiGpu", "REG_DWORD", 0),
+        ("HKCU\\SOFTWARE\\AMD\\CN", "PowerSaverAutoEnable_DEF", "REG_DWORD", 0),
+        ("HKCU\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Serialize", "StartupDelayInMSec", "REG_DWORD", 0),
+        ("HKCU\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced", "EnableBalloonTips", "REG_DWORD", 0),
+        ("HKCU\\SOFTWARE\\VRChat\\VRChat", "fps_limit_desktop", "REG_DWORD", 144),
+        ("HKCU\\SOFTWARE\\VRChat\\VRChat", "fps_limit_vr", "REG_DWORD", 90),
+        ("HKCU\\SOFTWARE\\Valve\\Steam\\Apps\\250820", "LaunchOptions", "REG_SZ", "-vrmode vr -novid -nojoy"),
+    ]
+
+    if os.name == 'nt':
+        stand_in = 'reg query'  # 読み取りのみ（レジストリは変更しない）
+    else:
+        # 引数を無視して終了する実行ファイルを reg.exe の代わりに起動
+        stand_in = shutil.which('true') or f'"{sys.executable}" -c pass'
+
+    spawned = 0
+    original_popen_init = subprocess.Popen.__init__
+
+    def counting_init(self, *args, **kwargs):
+        nonlocal spawned
+        spawned += 1
+        original_popen_init(self, *args, **kwargs)
+
+    subprocess.Popen.__init__ = counting_init
+    try:
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for key, name, type_name, data in settings:
+                command = reg_add_command(key, name, type_name, data)
+                if os.name == 'nt':
+                    command = f'{stand_in} "{key}" /v "{name}"'
+                else:
+                    command = stand_in + command[len('reg'):]
+                subprocess.run(command, shell=True, capture_output=True, text=True)
+        legacy = (time.perf_counter() - t0) / rounds
+        legacy_spawned, spawned = spawned // rounds, 0
+
+        backend = MemoryBackend()
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            report = SettingsEngine(backend).apply(settings)
+        engine = (time.perf_counter() - t0) / rounds
+        engine_spawned = spawned // rounds
+    finally:
+        subprocess.Popen.__init__ = original_popen_init
+
+    print(f"{len(settings)}値（4ステップ分）/ 代替実行ファイル: {stand_in}")
+    print(f"  従来方式（値ごとにシェル起動）: {legacy * 1000:7.1f}ms  subprocess起動 {legacy_spawned}回（シェル＋実行ファイル）")
+    print(f"  設定エンジン:                   {engine * 1000:7.2f}ms  subprocess起動 {engine_spawned}回")
+    print(f"  {summarize(report)}")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='プロセス内設定エンジン（reg add の置き換え）')
+    parser.add_argument('--benchmark', action='store_true', help='値ごとのプロセス起動との比較')
+    parser.add_argument('--rounds', type=int, default=3, help='ベンチマークの繰り返し回数')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.rounds)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
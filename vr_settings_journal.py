@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+設定変更ジャーナル
+最適化ツールが変更するレジストリ値・電源プラン・サービス・DNSについて、
+変更を行う前に元の値を追記専用のSQLiteに記録し、実行（トランザクション）単位でまとめて元に戻せます。
+
+- transactions: 1回の最適化実行（ロールバックも新しいトランザクションとして追記）
+- settings:     設定の識別子（種類・スコープ・名前）。名前にインデックス（大文字小文字を区別しない）
+- changes:      変更1件 = (トランザクション, 設定ID, 元の値, 元の型, 新しい値, 新しい型)。時刻はトランザクションのもの
+
+元の値が「存在しなかった」場合は prev_value が NULL になり、ロールバック時は値を削除します。
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+import argparse
+import logging
+from datetime import datetime
+
+from vr_registry_batch import RegistryBatch
+
+logger = logging.getLogger(__name__)
+
+# スクリプトの場所に置く（ログオン時の自動実行や別ディレクトリからのロールバックでも同じDBを使う）
+JOURNAL_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vr_settings_journal.db')
+
+REGISTRY = 'registry'
+SERVICE = 'service'
+POWER = 'power'
+DNS = 'dns'
+
+REG_MULTI_SZ = 7
+
+
+def encode_value(value, value_type=None):
+    """SQLiteに保存できる形に変換（リスト・辞書はJSON文字列）"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def decode_value(value, value_type=None):
+    if value_type == REG_MULTI_SZ and isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+class JournalTransaction:
+    """1回の実行分の変更記録（最初の記録時にトランザクションを作成）"""
+
+    def __init__(self, journal, label: str, reverts: int = None):
+        self.journal = journal
+        self.label = label
+        self.reverts = reverts
+        self.id = None
+        self.count = 0
+
+    def record_registry(self, hive: str, path: str, changes: list):
+        """レジストリ値の変更を記録 changes: [(値名, 元の(値, 型)またはNone, 新しい値, 新しい型)]"""
+        self.journal.write(self, [
+            (REGISTRY, f"{hive}\\{path}", name,
+             previous[0] if previous else None, previous[1] if previous else None, value, value_type)
+            for name, previous, value, value_type in changes
+        ])
+
+    def record(self, kind: str, name: str, previous, new):
+        """レジストリ以外（サービス・電源プラン・DNS）の変更を記録"""
+        self.journal.write(self, [(kind, kind, name, previous, None, new, None)])
+
+
+class SettingsJournal:
+    """追記専用の設定変更ジャーナル"""
+
+    def __init__(self, db_path: str = JOURNAL_DB):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.setting_ids = {}
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY,
+                ts REAL NOT NULL,
+                label TEXT,
+                reverts INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS settings (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                scope TEXT NOT NULL COLLATE NOCASE,
+                name TEXT NOT NULL COLLATE NOCASE,
+                UNIQUE(kind, scope, name)
+            );
+            CREATE INDEX IF NOT EXISTS idx_settings_name ON settings(name);
+            CREATE TABLE IF NOT EXISTS changes (
+                txn INTEGER NOT NULL,
+                setting INTEGER NOT NULL,
+                prev_value,
+                prev_type INTEGER,
+                new_value,
+                new_type INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_changes_setting ON changes(setting);
+            CREATE INDEX IF NOT EXISTS idx_changes_txn ON changes(txn);
+        """)
+        self.conn.commit()
+
+    def begin(self, label: str, reverts: int = None) -> JournalTransaction:
+        """トランザクション開始（変更が記録されるまでDBには書き込まない）"""
+        return JournalTransaction(self, label, reverts)
+
+    def setting_id(self, kind: str, scope: str, name: str) -> int:
+        lookup = (kind, scope.lower(), name.lower())
+        if lookup not in self.setting_ids:
+            self.conn.execute('INSERT OR IGNORE INTO settings (kind, scope, name) VALUES (?, ?, ?)', (kind, scope, name))
+            row = self.conn.execute('SELECT id FROM settings WHERE kind = ? AND scope = ? AND name = ?',
+                                    (kind, scope, name)).fetchone()
+            self.setting_ids[lookup] = row[0]
+        return self.setting_ids[lookup]
+
+    def write(self, txn: JournalTransaction, rows: list):
+        """変更を記録してコミット（変更の適用前に呼ぶ）"""
+        if not rows:
+            return
+        now = time.time()
+        with self.lock:
+            if txn.id is None:
+                cursor = self.conn.execute('INSERT INTO transactions (ts, label, reverts) VALUES (?, ?, ?)',
+                                           (now, txn.label, txn.reverts))
+                txn.id = cursor.lastrowid
+            self.conn.executemany('INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?)', [
+                (txn.id, self.setting_id(kind, scope, name),
+                 encode_value(prev_value), prev_type, encode_value(new_value), new_type)
+                for kind, scope, name, prev_value, prev_type, new_value, new_type in rows
+            ])
+            self.conn.commit()
+        txn.count += len(rows)
+
+    # ---- 参照 ----
+
+    def transactions(self, limit: int = 20) -> list:
+        """最近のトランザクション（新しい順）"""
+        rows = self.conn.execute("""
+            SELECT t.id, t.ts, t.label, t.reverts, COUNT(c.txn)
+            FROM transactions t LEFT JOIN changes c ON c.txn = t.id
+            GROUP BY t.id ORDER BY t.id DESC LIMIT ?
+        """, (limit,)).fetchall()
+        return [{'id': r[0], 'ts': r[1], 'label': r[2], 'reverts': r[3], 'changes': r[4]} for r in rows]
+
+    def query_changes(self, where: str, params: tuple, limit: int = None) -> list:
+        sql = f"""
+            SELECT c.rowid, c.txn, t.label, t.ts, s.kind, s.scope, s.name, c.prev_value, c.prev_type, c.new_value, c.new_type
+            FROM changes c JOIN settings s ON s.id = c.setting JOIN transactions t ON t.id = c.txn
+            WHERE {where} ORDER BY c.rowid{' DESC LIMIT ' + str(int(limit)) if limit else ''}
+        """
+        return [{'seq': r[0], 'txn': r[1], 'label': r[2], 'ts': r[3], 'kind': r[4], 'scope': r[5], 'name': r[6],
+                 'previous': decode_value(r[7], r[8]), 'previous_type': r[8],
+                 'new': decode_value(r[9], r[10]), 'new_type': r[10]}
+                for r in self.conn.execute(sql, params)]
+
+    def history(self, name: str, limit: int = 50) -> list:
+        """設定名（値名・サービス名など）の変更履歴（新しい順）
+
+        設定IDごとにインデックスを逆順にたどるため、履歴の総数によらず limit 件分の読み取りで済みます。
+        """
+        changes = []
+        for (setting,) in self.conn.execute('SELECT id FROM settings WHERE name = ?', (name,)).fetchall():
+            changes.extend(self.query_changes('c.setting = ?', (setting,), limit))
+        changes.sort(key=lambda c: c['seq'], reverse=True)
+        return changes[:limit]
+
+    def require_transaction(self, txn_id: int):
+        """記録されていないトランザクションIDなら ValueError"""
+        if self.conn.execute('SELECT 1 FROM transactions WHERE id = ?', (txn_id,)).fetchone() is None:
+            raise ValueError(f"トランザクション #{txn_id} は記録されていません（{self.db_path}）")
+
+    def changes(self, txn_id: int) -> list:
+        """トランザクション内の変更（記録順）"""
+        self.require_transaction(txn_id)
+        return self.query_changes('c.txn = ?', (txn_id,))
+
+    # ---- ロールバック ----
+
+    def rollback(self, txn_id: int, state=None) -> dict:
+        """トランザクションの変更を実行前の値に戻す（ロールバック自体も新しいトランザクションとして記録）
+
+        state には vr_desired_state.WindowsState / MemoryState を渡します。
+        記録されていないトランザクションIDなら ValueError です。
+        """
+        self.require_transaction(txn_id)
+        if state is None:
+            from vr_desired_state import WindowsState
+            state = WindowsState()
+
+        # 同じ設定を複数回変更していても、最初に記録した元の値に戻す
+        originals = {}
+        for change in self.changes(txn_id):
+            originals.setdefault((change['kind'], change['scope'].lower(), change['name'].lower()), change)
+
+        txn = self.begin(f"ロールバック #{txn_id}", reverts=txn_id)
+        batch = RegistryBatch(state.registry, journal=txn)
+        registry_changes = []
+        results = []
+        for change in originals.values():
+            if change['kind'] == REGISTRY:
+                hive, _, path = change['scope'].partition('\\')
+                if change['previous'] is None:
+                    batch.delete(path, change['name'], hive=hive)
+                else:
+                    batch.set(path, change['name'], change['previous'], change['previous_type'],
+                              hive=hive, create=False)
+                registry_changes.append(change)
+                continue
+
+            try:
+                ok = self.restore(change, state, txn)
+                results.append({'change': change, 'status': 'restored' if ok else 'error',
+                                'error': None if ok else 'コマンド失敗'})
+            except Exception as e:
+                results.append({'change': change, 'status': 'error', 'error': str(e)})
+
+        if registry_changes:
+            report = batch.apply()
+            by_name = {(e['hive'], e['path'].lower(), e['name'].lower()): e for e in report['values']}
+            for change in registry_changes:
+                hive, _, path = change['scope'].partition('\\')
+                entry = by_name[(hive, path.lower(), change['name'].lower())]
+                status = 'error' if entry['status'] == 'error' else 'restored'
+                results.append({'change': change, 'status': status, 'error': entry['error']})
+
+        restored = sum(1 for r in results if r['status'] == 'restored')
+        return {'transaction': txn_id, 'rollback_transaction': txn.id, 'restored': restored,
+                'errors': len(results) - restored, 'results': results}
+
+    @staticmethod
+    def restore(change: dict, state, txn: JournalTransaction) -> bool:
+        """レジストリ以外の設定を元に戻す"""
+        previous = change['previous']
+        if change['kind'] == SERVICE:
+            current = state.service_status(change['name'])
+            if previous != 'running' or current == 'running':
+                return True
+            txn.record(SERVICE, change['name'], current, 'running')
+            return state.start_service(change['name'])
+        if change['kind'] == POWER:
+            if not previous:
+                return True
+            txn.record(POWER, change['name'], change['new'], previous)
+            return state.set_power_scheme(previous)
+        if change['kind'] == DNS:
+            if not previous:
+                return True
+            config = json.loads(previous)
+            txn.record(DNS, change['name'], change['new'], previous)
+            return state.set_dns(change['name'], config)
+        raise ValueError(f"未対応の種類: {change['kind']}")
+
+    def close(self):
+        """DBを閉じる"""
+        with self.lock:
+            self.conn.close()
+
+
+def format_change(change: dict) -> str:
+    """変更1件の表示用テキスト"""
+    ts = datetime.fromtimestamp(change['ts']).strftime('%Y-%m-%d %H:%M:%S')
+    target = change['name'] if change['kind'] != REGISTRY else f"{change['scope']}\\{change['name']}"
+    previous = '（なし）' if change['previous'] is None else repr(change['previous'])
+    return f"{ts} #{change['txn']} [{change['kind']}] {target}: {previous} → {change['new']!r}（{change['label']}）"
+
+
+def benchmark(transactions: int = 2000, changes_per_txn: int = 40):
+    """大量の変更履歴での設定名検索・ロールバック・DBサイズを計測"""
+    import tempfile
+    from vr_desired_state import MemoryState, plan_profile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = SettingsJournal(os.path.join(tmp, 'journal.db'))
+
+        t0 = time.perf_counter()
+        for i in range(transactions):
+            txn = journal.begin(f"最適化 {i}")
+            txn.record_registry('HKCU', "SYSTEM\\CurrentControlSet\\Services\\Tcpip\\Parameters",
+                                [("TcpAckFrequency", (i % 2, 4), (i + 1) % 2, 4)])
+            txn.record_registry('HKCU', f"SOFTWARE\\Bench\\Key{i % 50}",
+                                [(f"Value{j}", (j, 4), j + 1, 4) for j in range(changes_per_txn - 1)])
+        write_seconds = time.perf_counter() - t0
+        rows = transactions * changes_per_txn
+        size = os.path.getsize(journal.db_path) + os.path.getsize(journal.db_path + '-wal')
+
+        t0 = time.perf_counter()
+        history = journal.history('tcpackfrequency', limit=20)
+        query_seconds = time.perf_counter() - t0
+
+        # 実際のプロファイル適用1回分をロールバック
+        state = MemoryState(services={'Spooler': 'running', 'WSearch': 'running'})
+        state.set_power_scheme('381b4222-f694-41f0-9685-ff5bb260df2e')  # バランス
+        planner, plan = plan_profile('extreme', 'AMD', state)
+        planned = len(plan['changes'])
+        txn = journal.begin("extremeプロファイル適用")
+        planner.apply(plan, journal=txn)
+        t0 = time.perf_counter()
+        result = journal.rollback(txn.id, state)
+        rollback_seconds = time.perf_counter() - t0
+        _, replan = plan_profile('extreme', 'AMD', state)
+        journal.close()
+
+    print(f"記録: {rows}件 / {transactions}トランザクション {write_seconds:.2f}秒"
+          f"（DB {size / 1024 / 1024:.1f}MB、1件あたり {size / rows:.0f}バイト）")
+    print(f"'TcpAckFrequency' の履歴検索: {query_seconds * 1000:.2f}ms（{len(history)}件）")
+    print(f"ロールバック: {result['restored']}件復元 / 失敗 {result['errors']}件 {rollback_seconds * 1000:.1f}ms"
+          f" → 再計画の変更件数 {len(replan['changes'])}件（適用前 {planned}件）")
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='設定変更ジャーナル（履歴表示・ロールバック）')
+    parser.add_argument('--db', default=JOURNAL_DB, help='ジャーナルDB（既定: スクリプトと同じ場所）')
+    parser.add_argument('--list', action='store_true', help='最近のトランザクション一覧')
+    parser.add_argument('--history', metavar='NAME', help='設定名の変更履歴（例: TcpAckFrequency）')
+    parser.add_argument('--show', type=int, metavar='TXN', help='トランザクションの変更内容')
+    parser.add_argument('--rollback', type=int, metavar='TXN', help='トランザクションを元に戻す')
+    parser.add_argument('--benchmark', action='store_true', help='検索・ロールバックの性能計測')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+
+    if not os.path.exists(args.db):
+        print(f"❌ ジャーナルDBがありません: {args.db}")
+        sys.exit(1)
+
+    journal = SettingsJournal(args.db)
+    try:
+        if args.list:
+            for txn in journal.transactions():
+                ts = datetime.fromtimestamp(txn['ts']).strftime('%Y-%m-%d %H:%M:%S')
+                reverts = f"（#{txn['reverts']} のロールバック）" if txn['reverts'] else ''
+                print(f"#{txn['id']} {ts} {txn['label']} - {txn['changes']}件{reverts}")
+        elif args.history:
+            for change in journal.history(args.history):
+                print(format_change(change))
+        elif args.show:
+            for change in journal.changes(args.show):
+                print(format_change(change))
+        elif args.rollback:
+            result = journal.rollback(args.rollback)
+            for r in result['results']:
+                if r['status'] == 'error':
+                    print(f"  ❌ {r['change']['scope']}\\{r['change']['name']}: {r['error']}")
+            print(f"↩️ #{args.rollback} をロールバック: 復元 {result['restored']}件 / 失敗 {result['errors']}件")
+        else:
+            parser.print_help()
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        journal.close()
+
+
+if __name__ == "__main__":
+    main()
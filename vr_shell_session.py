@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+永続シェルセッションによる外部コマンドの一括実行モジュール
+1回の実行につきシェル（Windowsは cmd.exe、それ以外は bash）を1つだけ起動し、
+コマンドを区切り文字（センチネル）付きでまとめて流し込んで、出力と終了コードをコマンドごとに取り出します。
+
+  echo <開始センチネル>
+  <コマンド> < NUL
+  echo <終了センチネル> %ERRORLEVEL%
+
+- コマンドごとのタイムアウト: 超えたらシェルごと（子プロセスを含めて）終了し、新しいシェルで残りを続行
+- 全体のタイムアウト: 超えた時点で残りのコマンドは実行しない（status='skipped'）
+- シェルが終了した場合: 実行中のコマンドはエラーとし、新しいシェルで残りを続行
+"""
+
+import os
+import sys
+import time
+import queue
+import uuid
+import signal
+import argparse
+import threading
+import subprocess
+
+DEFAULT_COMMAND_TIMEOUT = 30.0
+
+
+def default_shell() -> list:
+    if os.name == 'nt':
+        return ['cmd.exe', '/Q', '/K']
+    return ['bash', '--noprofile', '--norc']
+
+
+class ShellSession:
+    """1つのシェルを使い回してコマンドを実行"""
+
+    def __init__(self, shell: list = None, command_timeout: float = DEFAULT_COMMAND_TIMEOUT,
+                 total_timeout: float = None, encoding: str = None):
+        self.shell = shell or default_shell()
+        self.command_timeout = command_timeout
+        self.total_timeout = total_timeout
+        self.encoding = encoding or ('oem' if os.name == 'nt' else 'utf-8')
+        self.is_cmd = os.path.basename(self.shell[0]).lower() in ('cmd', 'cmd.exe')
+        self.token = uuid.uuid4().hex[:12]
+        self.sequence = 0
+        self.process = None
+        self.lines = None
+        self.shells_started = 0
+        self.lock = threading.Lock()
+
+    # ---- シェルの起動・終了 ----
+
+    def start(self):
+        """シェルを起動（出力は読み取りスレッドが行単位でキューに入れる）"""
+        options = {}
+        if os.name == 'nt':
+            options['creationflags'] = subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            options['start_new_session'] = True
+        self.process = subprocess.Popen(self.shell, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, bufsize=0, **options)
+        self.lines = queue.Queue()
+        threading.Thread(target=self.read_output, args=(self.process, self.lines),
+                         daemon=True, name='shell-session-reader').start()
+        self.shells_started += 1
+
+    def read_output(self, process, lines: queue.Queue):
+        for raw in iter(process.stdout.readline, b''):
+            lines.put(raw.decode(self.encoding, errors='replace').rstrip('\r\n'))
+        lines.put(None)  # シェル終了
+
+    def kill(self):
+        """シェルと実行中の子プロセスを終了"""
+        process, self.process = self.process, None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            if os.name == 'nt':
+                subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True, timeout=10)
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except Exception:
+            process.kill()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def close(self):
+        """シェルを終了"""
+        with self.lock:
+            process = self.process
+            if process is None:
+                return
+            try:
+                process.stdin.write(b'exit\n')
+                process.stdin.close()
+                process.wait(timeout=5)
+                self.process = None
+            except Exception:
+                self.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 実行 ----
+
+    def wrap(self, command: str, begin: str, end: str) -> bytes:
+        if self.is_cmd:
+            script = f"echo {begin}\r\n{command} < NUL\r\necho {end} %ERRORLEVEL%\r\n"
+        else:
+            script = f"echo {begin}\n{command} < /dev/null\necho {end} $?\n"
+        return script.encode(self.encoding, errors='replace')
+
+    def run(self, command: str, timeout: float = None) -> dict:
+        """コマンド1件を実行"""
+        return self.run_batch([command], command_timeout=timeout)[0]
+
+    def run_batch(self, commands: list, command_timeout: float = None, total_timeout: float = None) -> list:
+        """コマンドをまとめてシェルに流し込み、記述順に結果を返す
+
+        結果: {'command', 'returncode', 'output', 'duration', 'status'}
+        status は ok / failed（終了コード≠0）/ timeout / error（シェル終了）/ skipped（全体タイムアウト）
+        """
+        command_timeout = command_timeout or self.command_timeout
+        total_timeout = total_timeout or self.total_timeout
+        with self.lock:
+            results = []
+            origin = time.monotonic()
+            while len(results) < len(commands):
+                # 途中で止まった場合は新しいシェルで残りを実行（毎回少なくとも1件の結果が得られる）
+                results.extend(self.run_pipelined(commands[len(results):], command_timeout, origin, total_timeout))
+            return results
+
+    def run_pipelined(self, commands: list, command_timeout: float, origin: float, total_timeout: float) -> list:
+        """現在のシェルに全コマンドを書き込み、順に結果を待つ
+
+        タイムアウトやシェル終了で途中までしか結果が得られなかった場合は、
+        シェルを破棄して結果の得られた件数までを返す（残りは呼び出し元が新しいシェルで再実行）。
+        """
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+
+        markers = []
+        payload = b''
+        for command in commands:
+            self.sequence += 1
+            begin = f"__VRSHELL_{self.token}_{self.sequence}_BEGIN__"
+            end = f"__VRSHELL_{self.token}_{self.sequence}_END__"
+            markers.append((begin, end))
+            payload += self.wrap(command, begin, end)
+
+        results = []
+        try:
+            self.process.stdin.write(payload)
+            self.process.stdin.flush()
+        except OSError as e:
+            self.kill()
+            return [self.result(commands[0], None, '', 0.0, 'error', str(e))]
+
+        for command, (begin, end) in zip(commands, markers):
+            started = time.monotonic()
+            if total_timeout and started - origin >= total_timeout:
+                self.kill()
+                return results + [self.result(c, None, '', 0.0, 'skipped') for c in commands[len(results):]]
+
+            deadline = started + command_timeout
+            if total_timeout:
+                deadline = min(deadline, origin + total_timeout)
+
+            output = []
+            collecting = False
+            while True:
+                try:
+                    line = self.lines.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    self.kill()
+                    results.append(self.result(command, None, "\n".join(output), time.monotonic() - started, 'timeout'))
+                    return results
+                if line is None:
+                    self.kill()
+                    results.append(self.result(command, None, "\n".join(output), time.monotonic() - started,
+                                               'error', 'シェルが終了しました'))
+                    return results
+                if line.strip() == begin:
+                    collecting = True
+                    started = time.monotonic()
+                    continue
+                position = line.find(end)  # 改行なしで終わる出力の直後にも現れる
+                if position < 0:
+                    if collecting:
+                        output.append(line)
+                    continue
+                if position > 0:
+                    output.append(line[:position])
+                code = line[position + len(end):].strip()
+                returncode = int(code) if code.lstrip('-').isdigit() else -1
+                status = 'ok' if returncode == 0 else 'failed'
+                results.append(self.result(command, returncode, "\n".join(output), time.monotonic() - started, status))
+                break
+        return results
+
+    @staticmethod
+    def result(command: str, returncode, output: str, duration: float, status: str, error: str = None) -> dict:
+        return {'command': command, 'returncode': returncode, 'output': output,
+                'duration': duration, 'status': status, 'error': error}
+
+
+def run_commands(commands: list, command_timeout: float = DEFAULT_COMMAND_TIMEOUT, total_timeout: float = None) -> list:
+    """一時的なセッションでコマンドをまとめて実行"""
+    with ShellSession(command_timeout=command_timeout, total_timeout=total_timeout) as session:
+        return session.run_batch(commands)
+
+
+def benchmark(count: int = 50):
+    """コマンドごとにシェルを起動する従来方式と永続セッションを比較"""
+    if os.name == 'nt':
+        commands = ['ver'] * count
+    else:
+        commands = [f'echo command {i}' for i in range(count)]
+
+    t0 = time.perf_counter()
+    for command in commands:
+        subprocess.run(command, shell=True, capture_output=True, text=True)
+    spawn = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ShellSession() as session:
+        results = session.run_batch(commands)
+    persistent = time.perf_counter() - t0
+    ok = sum(1 for r in results if r['status'] == 'ok')
+
+    print(f"{count}コマンド")
+    print(f"  コマンドごとにシェル起動: {spawn * 1000:7.1f}ms（{spawn / count * 1000:.2f}ms/件）")
+    print(f"  永続セッション:           {persistent * 1000:7.1f}ms（{persistent / count * 1000:.2f}ms/件、成功 {ok}/{count}）")
+
+    # ハングしたコマンドのタイムアウトと復旧
+    hang = 'ping -n 30 127.0.0.1' if os.name == 'nt' else 'sleep 30'
+    fail = 'cmd /c exit 3' if os.name == 'nt' else '(exit 3)'
+    with ShellSession(command_timeout=0.5) as session:
+        t0 = time.perf_counter()
+        results = session.run_batch(['echo before', hang, fail, 'echo after'])
+        elapsed = time.perf_counter() - t0
+        shells = session.shells_started
+    summary = ", ".join(f"{r['command']}={r['status']}({r['returncode']})" for r in results)
+    print(f"  タイムアウト復旧: {elapsed:.2f}秒 / シェル起動 {shells}回 - {summary}")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='永続シェルセッションによる外部コマンドの一括実行')
+    parser.add_argument('commands', nargs='*', help='実行するコマンド')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_COMMAND_TIMEOUT, help='コマンドごとのタイムアウト（秒）')
+    parser.add_argument('--total-timeout', type=float, help='全体のタイムアウト（秒）')
+    parser.add_argument('--benchmark', action='store_true', help='コマンドごとのシェル起動との比較')
+    parser.add_argument('--count', type=int, default=50, help='ベンチマークのコマンド数')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.count)
+    elif args.commands:
+        for r in run_commands(args.commands, args.timeout, args.total_timeout):
+            print(f"[{r['status']} rc={r['returncode']} {r['duration'] * 1000:.0f}ms] {r['command']}")
+            if r['output']:
+                print(r['output'])
+        sys.stdout.flush()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
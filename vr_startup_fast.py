@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動時最適化（高速版）
+Windowsログオン時（レジストリのRunキー / スタートアップフォルダ）に実行される最小構成のエントリポイントです。
+tkinter / tqdm / GUIクラスは読み込みません。
+
+  1. キャッシュ済みのハードウェア情報（vr_hardware_inventory）からプロファイルを決定
+  2. プロファイルとの差分のうち、レジストリと電源プランだけをその場で適用
+  3. サービス停止とメモリクリーンアップ（ProcessIdleTasks）は別プロセスに任せ、
+     ログオン直後の負荷が落ち着いてから低優先度で実行
+
+読み込み時間と全体の所要時間（プロセス起動から）は毎回ログに記録します。
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+import sqlite3
+import subprocess
+import statistics
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_FILE = os.path.join(SCRIPT_DIR, 'vr_startup_fast.log')
+# Runキーからの起動では作業ディレクトリが決まらない（System32 など書き込めない場所のこともある）
+JOURNAL_DB = os.path.join(SCRIPT_DIR, 'vr_settings_journal.db')
+
+# 後回しにする変更の種類（sc stop は応答のないサービスで長時間ブロックする）
+DEFERRED_KINDS = ('service',)
+IDLE_TASKS_COMMAND = ['rundll32.exe', 'advapi32.dll,ProcessIdleTasks']
+
+# ログオン直後の負荷が落ち着いたと判断する条件
+SETTLE_MIN_UPTIME = 90  # 起動からの経過秒数
+SETTLE_CPU_PERCENT = 30  # CPU使用率（%）
+SETTLE_MAX_WAIT = 300  # これ以上は待たない（秒）
+
+
+def process_seconds() -> float:
+    """プロセス起動（インタープリター起動を含む）からの経過秒数"""
+    return time.time() - psutil.Process().create_time()
+
+
+def load_planner():
+    """最適化に必要なモジュールを読み込む → (モジュール, 読み込み秒数)"""
+    t0 = time.perf_counter()
+    import vr_hardware_inventory
+    import vr_desired_state
+    import vr_settings_journal
+    modules = (vr_hardware_inventory, vr_desired_state, vr_settings_journal)
+    return modules, time.perf_counter() - t0
+
+
+def open_journal(settings_journal, label: str):
+    """ジャーナルを開いてトランザクションを開始 → (journal, transaction)
+
+    開けない場合は警告を出して (None, None) を返し、記録なしで最適化を続行します。
+    """
+    try:
+        journal = settings_journal.SettingsJournal(JOURNAL_DB)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"⚠️ ジャーナルを開けません（変更前の値は記録されません）: {e}")
+        return None, None
+    return journal, journal.begin(label)
+
+
+def run_startup(profile: str = None, silent: bool = False, plan_only: bool = False, defer: bool = True) -> dict:
+    """差分だけをその場で適用し、時間のかかる処理はバックグラウンドプロセスに任せる"""
+    (inventory_module, desired_state, settings_journal), import_seconds = load_planner()
+
+    inventory = inventory_module.get_inventory()
+    profile = profile or desired_state.recommend_profile(inventory_module.performance_score(inventory))
+    planner, plan = desired_state.plan_profile(profile, inventory['gpu']['vendor'])
+    if not plan_only:
+        logger.info(desired_state.format_plan(plan))
+
+    now = [c for c in plan['changes'] if c['kind'] not in DEFERRED_KINDS]
+    deferred = [c for c in plan['changes'] if c['kind'] in DEFERRED_KINDS]
+    summary = {'profile': profile, 'inventory': inventory['source'], 'checked': plan['checked'],
+               'changes': len(now), 'applied': 0, 'deferred': len(deferred), 'import_seconds': import_seconds}
+
+    if now and not plan_only:
+        journal, transaction = open_journal(settings_journal, f"起動時最適化（{profile}）")
+        result = planner.apply(dict(plan, changes=now), journal=transaction)
+        if journal is not None:
+            journal.close()
+        for change in result['changes']:
+            if change['status'] == 'error':
+                logger.warning(f"⚠️ {change['target']}: {change['error']}")
+        if transaction is not None and transaction.id is not None:
+            logger.info(f"📒 変更前の値を記録しました（#{transaction.id}）")
+        summary['applied'] = result['applied']
+
+    if defer and not plan_only:
+        spawn_deferred(profile)
+
+    summary['wall_seconds'] = process_seconds()
+    logger.info(f"⏱️ 起動時最適化: プロファイル {profile} / ハードウェア情報 {summary['inventory']}"
+                f" / 確認 {summary['checked']}項目 / 変更 {summary['applied']}/{summary['changes']}件"
+                f" / 後で実行 {summary['deferred']}件"
+                f" / 読み込み {import_seconds * 1000:.0f}ms / 全体 {summary['wall_seconds'] * 1000:.0f}ms")
+
+    if plan_only:
+        print(desired_state.format_plan(plan))
+    elif not silent:
+        print(f"✅ 起動最適化完了 ({summary['applied']}/{summary['changes']}件を変更、"
+              f"{summary['deferred']}件はログオン後に実行)")
+        print(f"   読み込み {import_seconds * 1000:.0f}ms / 全体 {summary['wall_seconds'] * 1000:.0f}ms")
+    return summary
+
+
+def spawn_deferred(profile: str):
+    """遅延処理を親から切り離したプロセスで起動（ログオン処理を待たせない）"""
+    command = [sys.executable, os.path.abspath(__file__), '--deferred', '--profile', profile]
+    options = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL,
+               'cwd': SCRIPT_DIR, 'close_fds': True}
+    if os.name == 'nt':
+        options['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options['start_new_session'] = True
+    try:
+        subprocess.Popen(command, **options)
+        logger.info("🕒 サービス停止とメモリクリーンアップはログオン後に実行します")
+    except OSError as e:
+        logger.warning(f"遅延処理の起動エラー: {e}")
+
+
+def wait_for_settle(min_uptime: float = SETTLE_MIN_UPTIME, cpu_percent: float = SETTLE_CPU_PERCENT,
+                    max_wait: float = SETTLE_MAX_WAIT) -> float:
+    """ログオン直後の負荷が落ち着くまで待つ（起動からの経過時間とCPU使用率）"""
+    started = time.monotonic()
+    while True:
+        remaining = max_wait - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        uptime = time.time() - psutil.boot_time()
+        if uptime < min_uptime:
+            time.sleep(min(min_uptime - uptime, remaining))
+            continue
+        if psutil.cpu_percent(interval=min(5, remaining)) < cpu_percent:
+            break
+    return time.monotonic() - started
+
+
+def run_deferred(profile: str = None):
+    """遅延処理: 残っているサービス停止とメモリクリーンアップ"""
+    try:
+        me = psutil.Process()
+        me.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS if os.name == 'nt' else 10)
+    except (psutil.Error, AttributeError):
+        pass
+
+    waited = wait_for_settle()
+    logger.info(f"🕒 遅延処理を開始（{waited:.0f}秒待機）")
+
+    (inventory_module, desired_state, settings_journal), _ = load_planner()
+    inventory = inventory_module.get_inventory()
+    profile = profile or desired_state.recommend_profile(inventory_module.performance_score(inventory))
+    planner, plan = desired_state.plan_profile(profile, inventory['gpu']['vendor'])
+
+    # 待機中に状態が変わっている可能性があるため、計画し直してから適用
+    deferred = [c for c in plan['changes'] if c['kind'] in DEFERRED_KINDS]
+    if deferred:
+        journal, transaction = open_journal(settings_journal, f"起動時最適化・遅延処理（{profile}）")
+        result = planner.apply(dict(plan, changes=deferred), journal=transaction)
+        if journal is not None:
+            journal.close()
+        for change in result['changes']:
+            if change['status'] == 'error':
+                logger.warning(f"⚠️ {change['target']}: {change['error']}")
+        logger.info(f"不要サービス停止: {result['applied']}/{len(deferred)}件")
+
+    from vr_async_commands import run_command
+    if run_command(IDLE_TASKS_COMMAND, timeout=60)['status'] in ('ok', 'failed'):
+        logger.info("システムメモリをクリーンアップしました")
+
+
+def benchmark(rounds: int = 3):
+    """従来の起動時最適化（vr_lowspec_optimizer.py）と高速版の実行時間を比較（--plan で変更なし）"""
+    commands = [
+        ("従来（vr_lowspec_optimizer.py）", [sys.executable, os.path.join(SCRIPT_DIR, 'vr_lowspec_optimizer.py'), '--plan']),
+        ("高速版（vr_startup_fast.py）", [sys.executable, os.path.abspath(__file__), '--plan', '--no-log-file']),
+    ]
+    print(f"起動時最適化の所要時間（--plan、{rounds}回の中央値）")
+    import tempfile
+    for label, command in commands:
+        durations = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            with tempfile.TemporaryDirectory() as cwd:  # 実行ごとのログファイルを残さない
+                result = subprocess.run(command, capture_output=True, cwd=cwd)
+            durations.append(time.perf_counter() - t0)
+            if result.returncode != 0:
+                break
+        if result.returncode != 0:
+            error = result.stderr.decode(errors='replace').strip().splitlines()
+            print(f"  {label}: 実行できません（{error[-1] if error else result.returncode}）")
+            continue
+        print(f"  {label}: {statistics.median(durations) * 1000:7.0f}ms")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='VR低スペック最適化 起動時最適化（高速版）')
+    parser.add_argument('--profile', choices=['extreme', 'performance', 'balanced'],
+                        help='最適化プロファイル指定（省略時はハードウェア情報から決定）')
+    parser.add_argument('--silent', action='store_true', help='サイレントモード（出力最小化）')
+    parser.add_argument('--plan', action='store_true', help='差分（変更計画）を表示のみ')
+    parser.add_argument('--no-deferred', action='store_true', help='サービス停止とメモリクリーンアップを行わない')
+    parser.add_argument('--deferred', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--no-log-file', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--benchmark', action='store_true', help='従来の起動時最適化との所要時間比較')
+    args = parser.parse_args()
+
+    handlers = []
+    if not args.no_log_file:
+        handlers.append(logging.FileHandler(LOG_FILE, encoding='utf-8'))
+    if not args.silent and not args.deferred:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=handlers or [logging.NullHandler()])
+
+    if args.benchmark:
+        benchmark()
+        return
+
+    try:
+        if args.deferred:
+            run_deferred(args.profile)
+        else:
+            run_startup(args.profile, args.silent, args.plan, not args.no_deferred)
+    except Exception as e:
+        logger.error(f"起動時最適化エラー: {e}")
+        if not args.silent:
+            print(f"❌ 起動最適化エラー: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
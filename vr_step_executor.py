@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+最適化ステップの依存グラフ実行モジュール
+各ステップに依存関係（after）とリソースクラスを宣言し、依存が満たされたステップから
+上限付きスレッドプールで並列実行します。外部コマンド待ちのステップ同士が重なるため、
+全体の所要時間はおおよそ最長ステップの時間まで短くなります。
+
+リソースクラスごとの同時実行数:
+  registry  1  宣言順に1つずつ実行（前のステップが依存待ちなら後のステップも待つため、
+               同じ値を書くステップがあっても最終状態は逐次実行と同じ）
+  process   1  プロセス優先度の変更
+  command   3  外部コマンド（powercfg / netsh / sc / wmic など）。レジストリを書かないステップに限る
+
+タイムアウトしたステップは 'timeout' として報告しますが、スレッドは止められないため
+終了するまでリソースの枠を占有し、後続ステップも開始しません（run は全ステップの終了を待って返る）。
+
+実行後に各ステップの開始・終了時刻と、実際の待ち関係（依存・リソース待ち）から求めた
+クリティカルパスを返します。
+"""
+
+import time
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = 'registry'
+PROCESS = 'process'
+COMMAND = 'command'
+
+DEFAULT_RESOURCE_LIMITS = {REGISTRY: 1, PROCESS: 1, COMMAND: 3}
+ORDERED_RESOURCES = (REGISTRY,)  # 宣言順を守って開始するリソースクラス
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 60.0
+
+
+def step(name: str, func, resource: str = COMMAND, after=(), timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """ステップ定義"""
+    return {'name': name, 'func': func, 'resource': resource, 'after': tuple(after), 'timeout': timeout}
+
+
+def validate_steps(steps: list):
+    """名前の重複・未定義の依存・循環依存を検出"""
+    names = [s['name'] for s in steps]
+    if len(set(names)) != len(names):
+        raise ValueError("ステップ名が重複しています")
+    by_name = {s['name']: s for s in steps}
+    for s in steps:
+        for dep in s['after']:
+            if dep not in by_name:
+                raise ValueError(f"{s['name']}: 未定義の依存ステップ {dep}")
+
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"循環依存: {' → '.join(path + [name])}")
+        state[name] = 'visiting'
+        for dep in by_name[name]['after']:
+            visit(dep, path + [name])
+        state[name] = 'done'
+
+    for name in names:
+        visit(name, [])
+
+
+class StepExecutor:
+    """依存関係とリソースクラスを考慮したステップ実行"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, resource_limits: dict = None, on_step_done=None):
+        self.max_workers = max_workers
+        self.resource_limits = dict(DEFAULT_RESOURCE_LIMITS)
+        self.resource_limits.update(resource_limits or {})
+        self.on_step_done = on_step_done  # (name, record) 呼び出し元スレッドで実行
+
+    @staticmethod
+    def call_step(s: dict, started: dict):
+        started['t'] = time.monotonic()
+        try:
+            return bool(s['func']()), None
+        except Exception as e:
+            return False, e
+
+    def run(self, steps: list) -> dict:
+        """全ステップを実行し、結果・所要時間・クリティカルパスを返す"""
+        validate_steps(steps)
+        origin = time.monotonic()
+        pending = list(steps)
+        running = {}  # future -> (step, started)
+        overdue = set()  # タイムアウトを過ぎても実行中のステップ
+        in_use = {}
+        records = {}
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='opt-step')
+        try:
+            while pending or running:
+                # 依存とリソースの空きがあるステップを宣言順に起動
+                blocked = set()  # 順序を守るリソースクラスで、先のステップが開始できなかったもの
+                for s in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    if s['resource'] in blocked:
+                        continue
+                    limit = self.resource_limits.get(s['resource'], self.max_workers)
+                    if (any(dep not in records for dep in s['after'])
+                            or in_use.get(s['resource'], 0) >= limit):
+                        if s['resource'] in ORDERED_RESOURCES:
+                            blocked.add(s['resource'])
+                        continue
+                    in_use[s['resource']] = in_use.get(s['resource'], 0) + 1
+                    pending.remove(s)
+                    started = {}
+                    running[pool.submit(self.call_step, s, started)] = (s, started)
+
+                deadlines = [started['t'] + s['timeout'] for future, (s, started) in running.items()
+                             if 't' in started and future not in overdue]
+                timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else 0.05
+                finished, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+                now = time.monotonic()
+                for future in finished:
+                    s, started = running.pop(future)
+                    result, error = future.result()
+                    if future in overdue:
+                        overdue.discard(future)
+                        status, result = 'timeout', False
+                        error = f"{s['timeout']:g}秒を超過（{now - started['t']:.1f}秒で終了）"
+                    else:
+                        status = 'error' if error else ('ok' if result else 'failed')
+                    self.finish(records, s, started['t'] - origin, now - origin, result, status, error, in_use)
+
+                for future, (s, started) in running.items():
+                    if future not in overdue and 't' in started and now - started['t'] > s['timeout']:
+                        # スレッドは止められないため、終了するまで枠を占有し後続ステップも待たせる
+                        overdue.add(future)
+                        logger.warning(f"⏳ {s['name']}: {s['timeout']:g}秒を超えて実行中（終了を待機）")
+        finally:
+            pool.shutdown(wait=True)
+
+        wall = time.monotonic() - origin
+        critical = critical_path(records, steps)
+        return {
+            'results': {s['name']: records[s['name']]['result'] for s in steps},
+            'steps': records,
+            'wall_seconds': wall,
+            'sequential_seconds': sum(r['duration'] for r in records.values()),
+            'critical_path': critical,
+            'critical_path_seconds': sum(records[name]['duration'] for name in critical),
+        }
+
+    def finish(self, records: dict, s: dict, start: float, end: float, result: bool, status: str, error, in_use: dict):
+        in_use[s['resource']] -= 1
+        record = {'result': result, 'status': status, 'error': str(error) if error else None,
+                  'resource': s['resource'], 'start': start, 'end': end, 'duration': end - start}
+        records[s['name']] = record
+        if self.on_step_done:
+            try:
+                self.on_step_done(s['name'], record)
+            except Exception as e:
+                logger.error(f"ステップ完了処理エラー: {e}")
+
+
+def critical_path(records: dict, steps: list, slack: float = 0.01) -> list:
+    """最後に終わったステップから、開始を待たせた直前のステップ（依存またはリソース待ち）をたどる"""
+    if not records:
+        return []
+    by_name = {s['name']: s for s in steps}
+    name = max(records, key=lambda n: records[n]['end'])
+    path = [name]
+    while True:
+        record = records[name]
+        candidates = [n for n in records if n != name and n not in path
+                      and (n in by_name[name]['after'] or records[n]['resource'] == record['resource'])
+                      and records[n]['end'] <= record['start'] + slack]
+        if not candidates:
+            break
+        blocker = max(candidates, key=lambda n: records[n]['end'])
+        if record['start'] - records[blocker]['end'] > slack:
+            break
+        name = blocker
+        path.append(name)
+    return list(reversed(path))
+
+
+def format_report(report: dict) -> str:
+    """実行結果の要約（ログ用）"""
+    return (f"⏱️ 所要時間 {report['wall_seconds']:.1f}秒（逐次実行なら {report['sequential_seconds']:.1f}秒）"
+            f" / クリティカルパス {report['critical_path_seconds']:.1f}秒: {' → '.join(report['critical_path'])}")
+
+
+def benchmark(scale: float = 0.1):
+    """外部コマンド待ちを模したステップで逐次実行と比較（秒数はscale倍）"""
+    def sleeper(seconds, result=True):
+        def run():
+            time.sleep(seconds * scale)
+            return result
+        return run
+
+    # 低スペック最適化のステップ構成（実機の大まかな所要時間）
+    steps = [
+        step("CPU極端最適化", sleeper(3.0), COMMAND),
+        step("CPUスケジューラー最適化", sleeper(0.1), REGISTRY),
+        step("GPU低スペック最適化", sleeper(0.2), REGISTRY),
+        step("メモリ積極的最適化", sleeper(12.0), COMMAND),
+        step("メモリ管理設定最適化", sleeper(0.1), REGISTRY),
+        step("ネットワーク最適化", sleeper(0.2), REGISTRY),
+        step("VRChat低スペック設定", sleeper(0.5), REGISTRY, after=["CPU極端最適化"]),
+        step("Windows低スペック最適化", sleeper(0.3), REGISTRY),
+        step("電源設定", sleeper(4.0), COMMAND),
+        step("プロセス優先度", sleeper(1.0), PROCESS),
+    ]
+
+    t0 = time.perf_counter()
+    for s in steps:
+        s['func']()
+    sequential = time.perf_counter() - t0
+
+    report = StepExecutor().run(steps)
+    longest = max(r['duration'] for r in report['steps'].values())
+    print(f"逐次実行:   {sequential:.2f}秒")
+    print(f"並列実行:   {report['wall_seconds']:.2f}秒（最長ステップ {longest:.2f}秒）")
+    print(format_report(report))
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='最適化ステップの依存グラフ実行')
+    parser.add_argument('--benchmark', action='store_true', help='逐次実行との所要時間比較')
+    parser.add_argument('--scale', type=float, default=0.1, help='ベンチマークの時間倍率')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.scale)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,13 @@
 import streamlit as st
-import psutil
-import GPUtil
 import time
 import subprocess
 import threading
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-from datetime import datetime, timedelta
 import numpy as np
-import wmi
 import os
 import sys
-
-# 日本語フォント設定
-plt.rcParams['font.family'] = ['DejaVu Sans', 'Hiragino Sans', 'Yu Gothic', 'Meiryo', 'Takao', 'IPAexGothic', 'IPAPGothic', 'VL PGothic', 'Noto Sans CJK JP']
+import vr_metrics_collector
+from vr_downsampling import downsample_cached
 
 # ページ設定
 st.set_page_config(
@@ -24,18 +17,24 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# チャート設定（データキー, タイトル, 色, 単位）
+CHART_SPECS = [
+    ('cpu_usage', 'CPU使用率', '#FF6B6B', '%'),
+    ('cpu_temp', 'CPU温度', '#4ECDC4', '°C'),
+    ('memory_usage', 'メモリ使用率', '#45B7D1', '%'),
+    ('gpu_usage', 'GPU使用率', '#96CEB4', '%'),
+    ('gpu_temp', 'GPU温度', '#FFEAA7', '°C'),
+    ('vram_usage', 'VRAM使用率', '#DDA0DD', '%'),
+]
+
+# 履歴チャートの表示点数（リング全体をLTTBでこの点数に間引いて送る）
+# 追加した点数がこれを超えたら履歴を作り直してブラウザ側のメモリを一定に保つ
+CHART_POINTS = 600
+REFRESH_INTERVAL = 2
+
 # グローバル変数
-if 'monitoring_data' not in st.session_state:
-    st.session_state.monitoring_data = {
-        'timestamps': [],
-        'cpu_usage': [],
-        'cpu_temp': [],
-        'memory_usage': [],
-        'gpu_usage': [],
-        'gpu_temp': [],
-        'vram_usage': [],
-        'vr_processes': []
-    }
+if 'history_start_seq' not in st.session_state:
+    st.session_state.history_start_seq = 0
 
 if 'auto_recovery_enabled' not in st.session_state:
     st.session_state.auto_recovery_enabled = False
@@ -43,225 +42,146 @@ if 'auto_recovery_enabled' not in st.session_state:
 if 'monitoring_active' not in st.session_state:
     st.session_state.monitoring_active = False
 
-class VRSystemMonitor:
-    def __init__(self):
-        self.wmi_connection = None
-        try:
-            self.wmi_connection = wmi.WMI(namespace="root\\OpenHardwareMonitor")
-        except:
-            try:
-                self.wmi_connection = wmi.WMI(namespace="root\\LibreHardwareMonitor")
-            except:
-                self.wmi_connection = None
+@st.cache_resource
+def get_metrics_ring():
+    """収集プロセスの共有メモリへ接続（サーバープロセスで1回、全タブで共有）"""
+    return vr_metrics_collector.attach(spawn=True)
 
-    def get_cpu_temperature(self):
-        """CPU温度を取得"""
-        try:
-            if self.wmi_connection:
-                temperature_infos = self.wmi_connection.Sensor()
-                for sensor in temperature_infos:
-                    if sensor.SensorType == 'Temperature' and 'CPU' in sensor.Name:
-                        return round(sensor.Value, 1) if sensor.Value else None
-            
-            # 代替方法: psutil (Linux/一部Windows)
-            if hasattr(psutil, "sensors_temperatures"):
-                temps = psutil.sensors_temperatures()
-                if temps:
-                    for name, entries in temps.items():
-                        if 'cpu' in name.lower() or 'core' in name.lower():
-                            return round(entries[0].current, 1) if entries else None
-            
-            return None
-        except Exception as e:
-            return None
+def connect_ring():
+    """キャッシュ済みのリングを返す（収集プロセスが停止していればキャッシュを破棄して接続し直す）
 
-    def get_gpu_info(self):
-        """GPU情報を取得"""
+    停止した収集プロセスのリングは更新されないため、そのまま使い続けると古い値を表示し続けます。
+    古いリングは閉じてから接続し直します（Windowsでは開いているプロセスがある限り名前付きマッピングが残り、
+    新しい収集プロセスが同じ名前で作成できないため）。収集プロセスがなければ起動します。
+    """
+    ring = get_metrics_ring()
+    if ring is not None and (ring.closed or not vr_metrics_collector.is_collector_alive(ring)):
         try:
-            gpus = GPUtil.getGPUs()
-            if gpus:
-                gpu = gpus[0]  # 最初のGPUを使用
-                return {
-                    'usage': round(gpu.load * 100, 1),
-                    'temperature': round(gpu.temperature, 1),
-                    'vram_used': round(gpu.memoryUsed, 1),
-                    'vram_total': round(gpu.memoryTotal, 1),
-                    'vram_usage_percent': round((gpu.memoryUsed / gpu.memoryTotal) * 100, 1),
-                    'name': gpu.name
-                }
-            return None
-        except Exception as e:
-            return None
+            ring.close()
+        except BufferError:
+            pass  # 他のタブが読み込み中（参照がなくなった時点で解放される）
+        get_metrics_ring.clear()
+        ring = get_metrics_ring()
+    if ring is None:
+        get_metrics_ring.clear()
+    return ring
 
-    def get_system_info(self):
-        """システム情報を取得"""
-        try:
-            # CPU使用率
-            cpu_usage = psutil.cpu_percent(interval=1)
-            
-            # メモリ使用率
-            memory = psutil.virtual_memory()
-            memory_usage = memory.percent
-            
-            # CPU温度
-            cpu_temp = self.get_cpu_temperature()
-            
-            # GPU情報
-            gpu_info = self.get_gpu_info()
-            
-            return {
-                'cpu_usage': cpu_usage,
-                'cpu_temp': cpu_temp,
-                'memory_usage': memory_usage,
-                'memory_used_gb': round(memory.used / (1024**3), 1),
-                'memory_total_gb': round(memory.total / (1024**3), 1),
-                'gpu_info': gpu_info,
-                'timestamp': datetime.now()
-            }
-        except Exception as e:
-            st.error(f"システム情報取得エラー: {e}")
-            return None
-
-    def check_vr_processes(self):
-        """VR関連プロセスの状態確認"""
-        vr_processes = {
-            'VRChat': False,
-            'VirtualDesktop.Streamer': False,
-            'VirtualDesktop.Service': False,
-            'SteamVR': False,
-            'OculusClient': False
-        }
+def restart_virtual_desktop():
+    """Virtual Desktopを再起動"""
+    try:
+        # Virtual Desktop Streamerのパスを探す
+        vd_paths = [
+            r"C:\Program Files\Virtual Desktop Streamer\VirtualDesktop.Streamer.exe",
+            r"C:\Program Files (x86)\Virtual Desktop Streamer\VirtualDesktop.Streamer.exe",
+            os.path.expanduser(r"~\AppData\Local\Virtual Desktop Streamer\VirtualDesktop.Streamer.exe")
+        ]
         
-        try:
-            for proc in psutil.process_iter(['pid', 'name']):
-                proc_name = proc.info['name']
-                
-                if 'VRChat' in proc_name:
-                    vr_processes['VRChat'] = True
-                elif 'VirtualDesktop.Streamer' in proc_name:
-                    vr_processes['VirtualDesktop.Streamer'] = True
-                elif 'VirtualDesktop.Service' in proc_name:
-                    vr_processes['VirtualDesktop.Service'] = True
-                elif 'vrserver' in proc_name or 'SteamVR' in proc_name:
-                    vr_processes['SteamVR'] = True
-                elif 'OculusClient' in proc_name:
-                    vr_processes['OculusClient'] = True
-                    
-        except Exception as e:
-            st.error(f"プロセス確認エラー: {e}")
+        vd_path = None
+        for path in vd_paths:
+            if os.path.exists(path):
+                vd_path = path
+                break
+        
+        if vd_path:
+            # Virtual Desktopを起動
+            subprocess.Popen([vd_path], shell=True)
+            return True
+        else:
+            st.error("Virtual Desktop Streamerが見つかりません")
+            return False
             
-        return vr_processes
+    except Exception as e:
+        st.error(f"Virtual Desktop再起動エラー: {e}")
+        return False
 
-    def restart_virtual_desktop(self):
-        """Virtual Desktopを再起動"""
-        try:
-            # Virtual Desktop Streamerのパスを探す
-            vd_paths = [
-                r"C:\Program Files\Virtual Desktop Streamer\VirtualDesktop.Streamer.exe",
-                r"C:\Program Files (x86)\Virtual Desktop Streamer\VirtualDesktop.Streamer.exe",
-                os.path.expanduser(r"~\AppData\Local\Virtual Desktop Streamer\VirtualDesktop.Streamer.exe")
-            ]
-            
-            vd_path = None
-            for path in vd_paths:
-                if os.path.exists(path):
-                    vd_path = path
-                    break
-            
-            if vd_path:
-                # Virtual Desktopを起動
-                subprocess.Popen([vd_path], shell=True)
-                return True
-            else:
-                st.error("Virtual Desktop Streamerが見つかりません")
-                return False
-                
-        except Exception as e:
-            st.error(f"Virtual Desktop再起動エラー: {e}")
-            return False
+def records_to_frame(rows, data_key, title, max_points=None, version=None):
+    """リングのレコード配列からチャート用DataFrameを作成（None/0の値は除外、max_points指定時はLTTBで間引く）
 
-def update_monitoring_data():
-    """監視データを更新"""
-    monitor = VRSystemMonitor()
-    system_info = monitor.get_system_info()
-    vr_processes = monitor.check_vr_processes()
-    
-    if system_info:
-        # データを追加
-        st.session_state.monitoring_data['timestamps'].append(system_info['timestamp'])
-        st.session_state.monitoring_data['cpu_usage'].append(system_info['cpu_usage'])
-        st.session_state.monitoring_data['cpu_temp'].append(system_info['cpu_temp'])
-        st.session_state.monitoring_data['memory_usage'].append(system_info['memory_usage'])
-        st.session_state.monitoring_data['vr_processes'].append(vr_processes)
-        
-        if system_info['gpu_info']:
-            st.session_state.monitoring_data['gpu_usage'].append(system_info['gpu_info']['usage'])
-            st.session_state.monitoring_data['gpu_temp'].append(system_info['gpu_info']['temperature'])
-            st.session_state.monitoring_data['vram_usage'].append(system_info['gpu_info']['vram_usage_percent'])
-        else:
-            st.session_state.monitoring_data['gpu_usage'].append(0)
-            st.session_state.monitoring_data['gpu_temp'].append(0)
-            st.session_state.monitoring_data['vram_usage'].append(0)
-        
-        # 古いデータを削除（最新100件のみ保持）
-        max_data_points = 100
-        for key in st.session_state.monitoring_data:
-            if len(st.session_state.monitoring_data[key]) > max_data_points:
-                st.session_state.monitoring_data[key] = st.session_state.monitoring_data[key][-max_data_points:]
+    version は間引き結果のキャッシュキー（rows を読んだ時点の最終シーケンス番号）
+    """
+    values = rows[:, vr_metrics_collector.FIELD_INDEX[data_key]]
+    valid = ~np.isnan(values) & (values != 0)
+    ts = rows[valid, vr_metrics_collector.FIELD_INDEX['ts']]
+    values = values[valid]
+    if max_points and len(ts) > max_points:
+        reduced = downsample_cached(data_key, ts, values, max_points, version, envelope=False)
+        ts, values = reduced['x'], reduced['y']
+    # ローカル時刻で表示
+    timestamps = pd.to_datetime(ts + time.localtime().tm_gmtoff, unit='s')
+    return pd.DataFrame({title: values}, index=timestamps)
+
+def create_performance_chart(rows, last_seq, data_key, title, color, unit=""):
+    """パフォーマンスチャートを作成（以降はadd_rowsで新しい点だけ送る）"""
+    st.markdown(f"**{title}** ({unit})")
+    return st.line_chart(records_to_frame(rows, data_key, title, CHART_POINTS, last_seq), color=color, height=250)
 
-def auto_recovery_check():
+def auto_recovery_check(vr_processes, placeholder):
     """自動復旧チェック"""
     if not st.session_state.auto_recovery_enabled:
         return
     
-    monitor = VRSystemMonitor()
-    vr_processes = monitor.check_vr_processes()
-    
     # Virtual Desktop Streamerが停止している場合
     if not vr_processes['VirtualDesktop.Streamer']:
-        st.warning("🔄 Virtual Desktop Streamerが停止しています。自動復旧を試行中...")
-        if monitor.restart_virtual_desktop():
-            st.success("✅ Virtual Desktop Streamerを再起動しました")
-        else:
-            st.error("❌ Virtual Desktop Streamerの再起動に失敗しました")
+        with placeholder.container():
+            st.warning("🔄 Virtual Desktop Streamerが停止しています。自動復旧を試行中...")
+            if restart_virtual_desktop():
+                st.success("✅ Virtual Desktop Streamerを再起動しました")
+            else:
+                st.error("❌ Virtual Desktop Streamerの再起動に失敗しました")
 
-def create_performance_chart(data_key, title, color, unit=""):
-    """パフォーマンスチャートを作成"""
-    if not st.session_state.monitoring_data['timestamps']:
-        return None
-    
-    fig, ax = plt.subplots(figsize=(10, 4))
-    
-    timestamps = st.session_state.monitoring_data['timestamps']
-    values = st.session_state.monitoring_data[data_key]
-    
-    # Noneや無効な値を除外
-    valid_data = [(t, v) for t, v in zip(timestamps, values) if v is not None and v != 0]
-    
-    if valid_data:
-        times, vals = zip(*valid_data)
-        ax.plot(times, vals, color=color, linewidth=2, marker='o', markersize=3)
-        ax.fill_between(times, vals, alpha=0.3, color=color)
-    
-    ax.set_title(title, fontsize=14, fontweight='bold')
-    ax.set_ylabel(f"{unit}", fontsize=12)
-    ax.grid(True, alpha=0.3)
-    ax.tick_params(axis='x', rotation=45)
-    
-    # Y軸の範囲設定
-    if data_key in ['cpu_usage', 'memory_usage', 'gpu_usage', 'vram_usage']:
-        ax.set_ylim(0, 100)
-    elif data_key in ['cpu_temp', 'gpu_temp']:
-        ax.set_ylim(0, 100)
-    
-    plt.tight_layout()
-    return fig
+def render_status(placeholder, current_info):
+    """現在のシステム状態とVR関連プロセス状態を表示"""
+    with placeholder.container():
+        if current_info:
+            # メトリクス表示
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("CPU使用率", f"{current_info['cpu_usage']:.1f}%")
+                if current_info['cpu_temp']:
+                    st.metric("CPU温度", f"{current_info['cpu_temp']:.1f}°C")
+            
+            with col2:
+                st.metric("メモリ使用率", f"{current_info['memory_usage']:.1f}%")
+                st.metric(
+                    "メモリ使用量", 
+                    f"{current_info['memory_used_gb']:.1f}GB / {current_info['memory_total_gb']:.1f}GB"
+                )
+            
+            with col3:
+                if current_info['gpu_usage'] is not None:
+                    st.metric("GPU使用率", f"{current_info['gpu_usage']:.1f}%")
+                    st.metric("GPU温度", f"{current_info['gpu_temp']:.1f}°C")
+            
+            with col4:
+                if current_info['gpu_usage'] is not None:
+                    st.metric("VRAM使用率", f"{current_info['vram_usage']:.1f}%")
+                    st.metric("VRAM使用量", f"{current_info['vram_used']:.1f}GB / {current_info['vram_total']:.1f}GB")
+        
+        st.markdown("---")
+        
+        # VR関連プロセス状態
+        st.header("🎮 VR関連プロセス状態")
+        
+        vr_processes = current_info['vr_processes'] if current_info else {}
+        process_cols = st.columns(len(vr_metrics_collector.VR_PROCESS_NAMES))
+        for col, process_name in zip(process_cols, vr_metrics_collector.VR_PROCESS_NAMES):
+            with col:
+                status = vr_processes.get(process_name, False)
+                status_text = "🟢 実行中" if status else "🔴 停止中"
+                st.metric(process_name, status_text)
 
 # メイン画面
 def main():
     st.title("🥽 VR環境システム監視ダッシュボード")
     st.markdown("---")
     
+    # 収集プロセスの共有メモリへ接続（このプロセスではサンプリングしない）
+    ring = connect_ring()
+    if ring is None:
+        st.error("メトリクス収集プロセスに接続できません（python vr_metrics_collector.py で起動してください）")
+        return
+    
     # サイドバー設定
     with st.sidebar:
         st.header("⚙️ 監視設定")
@@ -276,10 +196,9 @@ def main():
             value=st.session_state.auto_recovery_enabled
         )
         
-        # データクリア
+        # データクリア（以降のレコードだけを履歴として表示）
         if st.button("🗑️ データクリア"):
-            for key in st.session_state.monitoring_data:
-                st.session_state.monitoring_data[key] = []
+            st.session_state.history_start_seq = ring.write_count
             st.success("データをクリアしました")
         
         st.markdown("---")
@@ -292,138 +211,65 @@ def main():
         - **VR関連プロセス**
         """)
     
-    # 監視データ更新
-    if st.session_state.monitoring_active:
-        update_monitoring_data()
-        auto_recovery_check()
-    
     # 現在のシステム状態表示
-    monitor = VRSystemMonitor()
-    current_info = monitor.get_system_info()
-    vr_processes = monitor.check_vr_processes()
-    
-    if current_info:
-        # メトリクス表示
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric(
-                "CPU使用率", 
-                f"{current_info['cpu_usage']:.1f}%",
-                delta=None
-            )
-            if current_info['cpu_temp']:
-                st.metric(
-                    "CPU温度", 
-                    f"{current_info['cpu_temp']:.1f}°C",
-                    delta=None
-                )
-        
-        with col2:
-            st.metric(
-                "メモリ使用率", 
-                f"{current_info['memory_usage']:.1f}%",
-                delta=None
-            )
-            st.metric(
-                "メモリ使用量", 
-                f"{current_info['memory_used_gb']:.1f}GB / {current_info['memory_total_gb']:.1f}GB",
-                delta=None
-            )
-        
-        with col3:
-            if current_info['gpu_info']:
-                gpu_info = current_info['gpu_info']
-                st.metric(
-                    "GPU使用率", 
-                    f"{gpu_info['usage']:.1f}%",
-                    delta=None
-                )
-                st.metric(
-                    "GPU温度", 
-                    f"{gpu_info['temperature']:.1f}°C",
-                    delta=None
-                )
-        
-        with col4:
-            if current_info['gpu_info']:
-                gpu_info = current_info['gpu_info']
-                st.metric(
-                    "VRAM使用率", 
-                    f"{gpu_info['vram_usage_percent']:.1f}%",
-                    delta=None
-                )
-                st.metric(
-                    "VRAM使用量", 
-                    f"{gpu_info['vram_used']:.1f}GB / {gpu_info['vram_total']:.1f}GB",
-                    delta=None
-                )
-    
-    st.markdown("---")
-    
-    # VR関連プロセス状態
-    st.header("🎮 VR関連プロセス状態")
-    
-    process_cols = st.columns(5)
-    process_names = ['VRChat', 'VirtualDesktop.Streamer', 'VirtualDesktop.Service', 'SteamVR', 'OculusClient']
-    
-    for i, (col, process_name) in enumerate(zip(process_cols, process_names)):
-        with col:
-            status = vr_processes.get(process_name, False)
-            status_text = "🟢 実行中" if status else "🔴 停止中"
-            st.metric(process_name, status_text)
+    status_placeholder = st.empty()
+    render_status(status_placeholder, ring.latest())
     
     # Virtual Desktop手動再起動ボタン
     if st.button("🔄 Virtual Desktop手動再起動"):
-        if monitor.restart_virtual_desktop():
+        if restart_virtual_desktop():
             st.success("✅ Virtual Desktop Streamerを再起動しました")
         else:
             st.error("❌ Virtual Desktop Streamerの再起動に失敗しました")
     
+    recovery_placeholder = st.empty()
     st.markdown("---")
     
-    # パフォーマンスチャート
-    if st.session_state.monitoring_data['timestamps']:
-        st.header("📈 パフォーマンス履歴")
-        
-        # CPU関連
-        col1, col2 = st.columns(2)
-        with col1:
-            cpu_chart = create_performance_chart('cpu_usage', 'CPU使用率', '#FF6B6B', '%')
-            if cpu_chart:
-                st.pyplot(cpu_chart)
-        
-        with col2:
-            cpu_temp_chart = create_performance_chart('cpu_temp', 'CPU温度', '#4ECDC4', '°C')
-            if cpu_temp_chart:
-                st.pyplot(cpu_temp_chart)
-        
-        # メモリ
-        memory_chart = create_performance_chart('memory_usage', 'メモリ使用率', '#45B7D1', '%')
-        if memory_chart:
-            st.pyplot(memory_chart)
+    # パフォーマンスチャート（初回のみリング全体の間引いた履歴を送信）
+    st.header("📈 パフォーマンス履歴")
+    history, last_seq = ring.read_since(st.session_state.history_start_seq)
+    
+    charts = {}
+    for i in range(0, len(CHART_SPECS), 2):
+        for col, (data_key, title, color, unit) in zip(st.columns(2), CHART_SPECS[i:i + 2]):
+            with col:
+                charts[data_key] = (title, create_performance_chart(history, last_seq, data_key, title, color, unit))
+    
+    # 自動更新：新しいレコードだけを各チャートへ追加
+    appended = 0
+    while st.session_state.monitoring_active:
+        time.sleep(REFRESH_INTERVAL)
+        # 他のタブが再接続した場合、このタブのリングは閉じられている
+        if ring.closed:
+            rows = []
+        else:
+            rows, last_seq = ring.read_since(last_seq)
+        if len(rows) == 0:
+            # 新しいレコードがない：収集プロセスが停止していれば接続し直して履歴から描き直す
+            if ring.closed or not vr_metrics_collector.is_collector_alive(ring):
+                with recovery_placeholder.container():
+                    st.warning("🔄 メトリクス収集プロセスが停止しています。再接続中...")
+                ring = connect_ring()
+                if ring is None:
+                    with recovery_placeholder.container():
+                        st.error("❌ メトリクス収集プロセスに再接続できません（python vr_metrics_collector.py で起動してください）")
+                    st.session_state.monitoring_active = False
+                    break
+                st.session_state.history_start_seq = 0
+                st.rerun()
+            continue
         
-        # GPU関連
-        col3, col4 = st.columns(2)
-        with col3:
-            gpu_chart = create_performance_chart('gpu_usage', 'GPU使用率', '#96CEB4', '%')
-            if gpu_chart:
-                st.pyplot(gpu_chart)
+        current_info = vr_metrics_collector.record_from_row(rows[-1])
+        render_status(status_placeholder, current_info)
+        auto_recovery_check(current_info['vr_processes'], recovery_placeholder)
         
-        with col4:
-            gpu_temp_chart = create_performance_chart('gpu_temp', 'GPU温度', '#FFEAA7', '°C')
-            if gpu_temp_chart:
-                st.pyplot(gpu_temp_chart)
+        for data_key, (title, chart) in charts.items():
+            chart.add_rows(records_to_frame(rows, data_key, title))
         
-        # VRAM
-        vram_chart = create_performance_chart('vram_usage', 'VRAM使用率', '#DDA0DD', '%')
-        if vram_chart:
-            st.pyplot(vram_chart)
-    
-    # 自動更新
-    if st.session_state.monitoring_active:
-        time.sleep(2)
-        st.rerun()
+        # 点数が上限を超えたら履歴を作り直す
+        appended += len(rows)
+        if appended > CHART_POINTS:
+            st.rerun()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VR監視用ターミナルダッシュボード
+プロセス状態・CPU/GPU/メモリのスパークライン・復旧履歴・警告をコンソールに表示します。
+画面はセル単位で前回フレームと比較し、変化したセルだけをANSIエスケープで書き換えます。
+描画は上限フレームレートで、データが変わったときだけ行います。
+
+メトリクスは常駐収集プロセス（vr_metrics_collector）の共有メモリから読み、動作していない場合のみ
+psutilでCPU/メモリを取得します。描画スレッド自身のCPU時間を計測してフッターに表示します。
+"""
+
+import io
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import threading
+import unicodedata
+from collections import deque
+from datetime import datetime
+
+import psutil
+
+DEFAULT_FPS = 4
+METRICS_INTERVAL = 1.0
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+CPU_BUDGET_PERCENT = 0.5
+
+# 表示スタイル → SGR
+STYLES = {
+    '': '\x1b[0m',
+    'title': '\x1b[1;36m',
+    'ok': '\x1b[32m',
+    'warn': '\x1b[33m',
+    'error': '\x1b[31m',
+    'dim': '\x1b[90m',
+}
+
+METRIC_ROWS = [
+    # (キー, 表示名, 警告閾値)
+    ('cpu_usage', 'CPU ', 80),
+    ('gpu_usage', 'GPU ', 90),
+    ('memory_usage', 'MEM ', 85),
+    ('vram_usage', 'VRAM', 90),
+]
+
+
+def enable_vt_mode():
+    """Windowsコンソールで仮想端末シーケンスを有効化"""
+    if os.name != 'nt':
+        return
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)
+        mode = ctypes.c_uint32()
+        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            kernel32.SetConsoleMode(handle, mode.value | 0x0004)  # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+    except Exception:
+        pass
+
+
+def char_width(ch: str) -> int:
+    if unicodedata.combining(ch) or ch == '\ufe0f':
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+
+
+def to_cells(segments: list, width: int) -> list:
+    """[(文字列, スタイル), ...] を幅width のセル列 [(文字, スタイル)] に変換（全角の2セル目は ''）"""
+    cells = []
+    for text, style in segments:
+        for ch in text:
+            w = char_width(ch)
+            if w == 0:
+                if cells:
+                    # 結合文字・異体字セレクタは直前の文字に付ける
+                    i = len(cells) - 1 if cells[-1][0] else len(cells) - 2
+                    cells[i] = (cells[i][0] + ch, cells[i][1])
+                continue
+            if len(cells) + w > width:
+                break
+            cells.append((ch, style))
+            if w == 2:
+                cells.append(('', style))
+    cells.extend([(' ', '')] * (width - len(cells)))
+    return cells
+
+
+def sparkline(values, width: int, top: float = 100.0) -> str:
+    values = [v for v in list(values)[-width:] if v is not None]
+    if not values:
+        return ''
+    last = len(SPARK_CHARS) - 1
+    return ''.join(SPARK_CHARS[min(max(int(v / top * last + 0.5), 0), last)] for v in values)
+
+
+class DiffRenderer:
+    """前回フレームとの差分セルだけを書き出すレンダラー"""
+
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self.previous = None
+        self.size = None
+        self.bytes_written = 0
+
+    def start(self):
+        enable_vt_mode()
+        self.write('\x1b[?1049h\x1b[?25l\x1b[2J')  # 代替画面・カーソル非表示
+
+    def stop(self):
+        self.write('\x1b[0m\x1b[?25h\x1b[?1049l')
+
+    def write(self, data: str):
+        self.out.write(data)
+        self.out.flush()
+        self.bytes_written += len(data.encode('utf-8'))
+
+    def render(self, rows: list):
+        """rows: 行ごとのセグメントリスト。サイズ変更時は全体を描き直す"""
+        width, height = shutil.get_terminal_size((100, 30))
+        frame = [to_cells(row, width) for row in rows[:height]]
+        frame.extend([to_cells([], width)] * (height - len(frame)))
+
+        parts = []
+        if (width, height) != self.size or self.previous is None:
+            self.size = (width, height)
+            parts.append('\x1b[0m\x1b[2J')
+            previous = [[None] * width for _ in range(height)]
+        else:
+            previous = self.previous
+
+        for r, (new, old) in enumerate(zip(frame, previous)):
+            if new == old:
+                continue
+            c = 0
+            while c < width:
+                if new[c] == old[c]:
+                    c += 1
+                    continue
+                start = c - 1 if new[c][0] == '' and c > 0 else c
+                while c < width and new[c] != old[c]:
+                    c += 1
+                if c < width and new[c][0] == '':
+                    c += 1  # 全角文字の途中で切らない
+                parts.append(f'\x1b[{r + 1};{start + 1}H')
+                style = None
+                for ch, cell_style in new[start:c]:
+                    if cell_style != style:
+                        parts.append(STYLES.get(cell_style, STYLES['']))
+                        style = cell_style
+                    parts.append(ch)
+                parts.append(STYLES[''])
+
+        self.previous = frame
+        if parts:
+            self.write(''.join(parts))
+
+
+class AlertLogHandler(logging.Handler):
+    """警告以上のログを直近分だけ保持（ダッシュボードの警告欄用）"""
+
+    def __init__(self, maxlen: int = 50):
+        super().__init__(level=logging.WARNING)
+        self.records = deque(maxlen=maxlen)
+        self.version = 0
+
+    def emit(self, record):
+        self.records.append((record.created, record.levelno, record.getMessage()))
+        self.version += 1
+
+
+class ManagerSource:
+    """VRIntegratedManager と収集プロセスからの表示データ"""
+
+    def __init__(self, manager, alerts: AlertLogHandler):
+        self.manager = manager
+        self.alerts = alerts
+        self.ring = None
+        try:
+            from vr_metrics_collector import attach
+            self.ring = attach(spawn=False, timeout=0)
+        except Exception:
+            self.ring = None
+        psutil.cpu_percent(interval=None)
+
+    def metrics(self) -> dict:
+        if self.ring is not None:
+            latest = self.ring.latest()
+            if latest:
+                return latest
+        return {'cpu_usage': psutil.cpu_percent(interval=None), 'memory_usage': psutil.virtual_memory().percent,
+                'vr_processes': None}
+
+    def processes(self, metrics: dict) -> dict:
+        return metrics.get('vr_processes') or self.manager.last_process_status
+
+    def recoveries(self) -> list:
+        return list(self.manager.recovery_history)
+
+    def alert_lines(self) -> list:
+        return list(self.alerts.records)
+
+    def next_check_in(self):
+        if self.manager.next_check_at is None:
+            return None
+        return max(self.manager.next_check_at - time.time(), 0)
+
+    @property
+    def version(self):
+        return (len(self.manager.recovery_history), self.alerts.version,
+                tuple(self.manager.last_process_status.items()))
+
+
+class TerminalDashboard:
+    """表示データを一定間隔で取得し、上限フレームレートで差分描画"""
+
+    def __init__(self, source, fps: float = DEFAULT_FPS, out=None, title: str = 'VR環境 自動復旧監視'):
+        self.source = source
+        self.frame_interval = 1.0 / fps
+        self.renderer = DiffRenderer(out)
+        self.title = title
+        self.history = {key: deque(maxlen=240) for key, _, _ in METRIC_ROWS}
+        self.metrics = {}
+        self.next_metrics = 0.0
+        self.cpu_percent = 0.0
+        self.frames = 0
+
+    def poll(self, now: float) -> bool:
+        """1秒ごとにメトリクスを取得（取得したらTrue）"""
+        if now < self.next_metrics:
+            return False
+        self.next_metrics = now + METRICS_INTERVAL
+        self.metrics = self.source.metrics()
+        for key in self.history:
+            self.history[key].append(self.metrics.get(key))
+        return True
+
+    def build_rows(self, width: int) -> list:
+        rows = []
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        countdown = self.source.next_check_in()
+        countdown_text = f"次回チェックまで {countdown:3.0f}秒" if countdown is not None else ''
+        rows.append([(f" {self.title} ", 'title'), (f" {now}  {countdown_text}", 'dim')])
+        rows.append([('─' * width, 'dim')])
+
+        rows.append([(' プロセス', 'title')])
+        processes = self.source.processes(self.metrics) or {}
+        line = [('  ', '')]
+        for name, running in processes.items():
+            line.append(('● ' if running else '○ ', 'ok' if running else 'error'))
+            line.append((f"{name}   ", '' if running else 'dim'))
+        rows.append(line)
+        rows.append([])
+
+        rows.append([(' リソース', 'title')])
+        spark_width = max(width - 20, 10)
+        for key, label, threshold in METRIC_ROWS:
+            value = self.metrics.get(key)
+            if value is None:
+                rows.append([(f"  {label}     -", 'dim')])
+                continue
+            style = 'warn' if value >= threshold else 'ok'
+            rows.append([(f"  {label} {value:5.1f}% ", ''),
+                         (sparkline(self.history[key], spark_width), style)])
+        temps = [f"{label} {self.metrics[key]:.0f}°C" for key, label in (('cpu_temp', 'CPU'), ('gpu_temp', 'GPU'))
+                 if self.metrics.get(key) is not None]
+        if temps:
+            rows.append([('  温度 ' + '  '.join(temps), 'dim')])
+        rows.append([])
+
+        rows.append([(' 復旧履歴', 'title')])
+        recoveries = self.source.recoveries()[-5:]
+        if not recoveries:
+            rows.append([('  なし', 'dim')])
+        for ts, name, success in reversed(recoveries):
+            rows.append([(f"  {datetime.fromtimestamp(ts).strftime('%H:%M:%S')} ", 'dim'),
+                         ('成功 ' if success else '失敗 ', 'ok' if success else 'error'), (name, '')])
+        rows.append([])
+
+        rows.append([(' 警告', 'title')])
+        alerts = self.source.alert_lines()
+        if not alerts:
+            rows.append([('  なし', 'dim')])
+        for ts, level, message in reversed(alerts[-8:]):
+            rows.append([(f"  {datetime.fromtimestamp(ts).strftime('%H:%M:%S')} ", 'dim'),
+                         (message, 'error' if level >= logging.ERROR else 'warn')])
+        rows.append([])
+        rows.append([(f" 描画CPU {self.cpu_percent:.2f}%（1コア比）  Ctrl+C: 終了", 'dim')])
+        return rows
+
+    def run(self, stop_event: threading.Event = None, duration: float = None):
+        """描画ループ（Ctrl+Cまたはstop_eventで終了）"""
+        stop_event = stop_event or threading.Event()
+        self.renderer.start()
+        started = time.monotonic()
+        cpu_start, wall_start = time.thread_time(), started
+        last_version = None
+        last_second = None
+        try:
+            while not stop_event.is_set():
+                now = time.monotonic()
+                if duration is not None and now - started >= duration:
+                    break
+                polled = self.poll(now)
+                second = int(time.time())
+                version = self.source.version
+                if polled or version != last_version or second != last_second:
+                    last_version, last_second = version, second
+                    width = shutil.get_terminal_size((100, 30))[0]
+                    self.renderer.render(self.build_rows(width))
+                    self.frames += 1
+
+                # 描画スレッド自身のCPU使用率（直近の区間）
+                if now - wall_start >= 5:
+                    self.cpu_percent = (time.thread_time() - cpu_start) / (now - wall_start) * 100
+                    cpu_start, wall_start = time.thread_time(), now
+                stop_event.wait(self.frame_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.renderer.stop()
+
+
+def run_monitor_tui(manager, fps: float = DEFAULT_FPS):
+    """自動復旧監視をバックグラウンドで実行し、ダッシュボードを表示"""
+    root = logging.getLogger()
+    console_handlers = [h for h in root.handlers
+                        if isinstance(h, logging.StreamHandler) and not isinstance(h, logging.FileHandler)]
+    for handler in console_handlers:
+        root.removeHandler(handler)  # 画面が崩れないようにコンソール出力を止める（ファイルログは継続）
+    alerts = AlertLogHandler()
+    root.addHandler(alerts)
+
+    monitor = threading.Thread(target=manager.monitor_and_recover, kwargs={'show_progress': False}, daemon=True)
+    monitor.start()
+    try:
+        TerminalDashboard(ManagerSource(manager, alerts), fps).run()
+    finally:
+        manager.stop_monitoring()
+        root.removeHandler(alerts)
+        for handler in console_handlers:
+            root.addHandler(handler)
+
+
+class SyntheticSource:
+    """ベンチマーク用の表示データ"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.version = 0
+
+    def metrics(self) -> dict:
+        t = time.time() - self.started
+        return {'cpu_usage': 50 + 30 * ((t % 10) / 10), 'gpu_usage': 70.0, 'memory_usage': 60 + t % 5,
+                'vram_usage': 75.0, 'cpu_temp': 65.0, 'gpu_temp': 70.0}
+
+    def processes(self, metrics: dict) -> dict:
+        return {'VRChat': True, 'VirtualDesktop.Streamer': True, 'SteamVR': True, 'Steam': True}
+
+    def recoveries(self) -> list:
+        return [(self.started, 'SteamVR', True)]
+
+    def alert_lines(self) -> list:
+        return [(self.started, logging.WARNING, 'Virtual Desktop Streamerが停止しています。復旧を試行中...')]
+
+    def next_check_in(self):
+        return 30 - (time.time() - self.started) % 30
+
+
+def benchmark(duration: float = 10.0, fps: float = DEFAULT_FPS):
+    """出力を破棄して描画ループを実行し、描画スレッドのCPU使用率と出力量を計測"""
+    out = io.StringIO()
+    dashboard = TerminalDashboard(SyntheticSource(), fps, out=out)
+    cpu_start = time.thread_time()
+    dashboard.run(duration=duration)
+    cpu = (time.thread_time() - cpu_start) / duration * 100
+
+    full = DiffRenderer(io.StringIO())
+    full.render(dashboard.build_rows(shutil.get_terminal_size((100, 30))[0]))
+    per_frame = dashboard.renderer.bytes_written / max(dashboard.frames, 1)
+    print(f"{duration:.0f}秒 / {dashboard.frames}フレーム描画")
+    print(f"  描画スレッドCPU: {cpu:.3f}%（1コア比、目標 {CPU_BUDGET_PERCENT}%未満）")
+    print(f"  出力量: 平均 {per_frame:.0f} bytes/フレーム（全体描画 {full.bytes_written} bytes）")
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='VR監視用ターミナルダッシュボード（vr_integrated_manager.py --monitor --tui から起動）')
+    parser.add_argument('--benchmark', action='store_true', help='描画CPU使用率の計測')
+    parser.add_argument('--duration', type=float, default=10.0, help='ベンチマーク時間（秒）')
+    parser.add_argument('--fps', type=float, default=DEFAULT_FPS, help='最大フレームレート')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.duration, args.fps)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tk GUI用スレッドセーフ イベントバス
+ワーカースレッドはログ行・進捗・結果などのイベントをキューへ積むだけで、Tkウィジェットには触れません。
+Tkメインループがタイマーでキューをまとめて取り出し、ログはまとめて1回の挿入、
+進捗は1フレームにつき最新値1回だけ反映します。
+"""
+
+import queue
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# イベント種別
+LOG = 'log'
+PROGRESS = 'progress'
+STATUS = 'status'
+RESULT = 'result'
+CALL = 'call'
+
+
+class UIEventBus:
+    """ワーカー → Tkメインループのイベント受け渡し"""
+
+    def __init__(self, root, interval_ms: int = 50, max_batch: int = 1000):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self.events = queue.SimpleQueue()
+        self.handlers = {}
+        self.job = None
+
+    # ワーカー側（どのスレッドからでも呼び出し可）
+    def post(self, kind: str, payload=None):
+        self.events.put((kind, payload))
+
+    def log(self, message: str):
+        """ログ行（時刻は投稿時点で付与）"""
+        self.post(LOG, f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+
+    def progress(self, value: float):
+        self.post(PROGRESS, value)
+
+    def status(self, text: str):
+        self.post(STATUS, text)
+
+    def result(self, payload):
+        self.post(RESULT, payload)
+
+    def call(self, func, *args, **kwargs):
+        """任意のUI処理をメインループで実行（messagebox、ボタン状態変更など）"""
+        self.post(CALL, (func, args, kwargs))
+
+    # メインループ側
+    def subscribe(self, kind: str, handler):
+        """イベント種別ごとのハンドラ登録（LOGハンドラは行のリストを受け取る）"""
+        self.handlers[kind] = handler
+
+    def start(self):
+        if self.job is None:
+            self.job = self.root.after(self.interval_ms, self.drain)
+
+    def stop(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def drain(self):
+        """キューを取り出して反映（ログはまとめて挿入、進捗は最新値のみ）"""
+        log_lines = []
+        latest_progress = None
+        try:
+            for _ in range(self.max_batch):
+                try:
+                    kind, payload = self.events.get_nowait()
+                except queue.Empty:
+                    break
+
+                if kind == LOG:
+                    log_lines.append(payload)
+                elif kind == PROGRESS:
+                    latest_progress = payload
+                else:
+                    # 順序を保つため、溜まったログを先に反映
+                    if log_lines:
+                        self.dispatch(LOG, log_lines)
+                        log_lines = []
+                    if kind == CALL:
+                        func, args, kwargs = payload
+                        self.run_safely(func, *args, **kwargs)
+                    else:
+                        self.dispatch(kind, payload)
+
+            if log_lines:
+                self.dispatch(LOG, log_lines)
+            if latest_progress is not None:
+                self.dispatch(PROGRESS, latest_progress)
+        finally:
+            self.job = self.root.after(self.interval_ms, self.drain)
+
+    def dispatch(self, kind: str, payload):
+        handler = self.handlers.get(kind)
+        if handler:
+            self.run_safely(handler, payload)
+
+    def run_safely(self, func, *args, **kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"UIイベント処理エラー: {e}")
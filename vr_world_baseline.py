@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRChatワールド別パフォーマンスベースラインDB
+ワールドID（出力ログから取得）ごとに、訪問単位のフレームタイム・CPU・GPU・人数の
+ストリーミング統計（ヒストグラム＋平均/分散）を保存します。
+
+- 訪問終了時に人数帯ごとのベースラインへ統計をマージ（生データの再走査なし）
+- 「ワールドXにN人いる時の想定性能」を主キー検索で返す
+- ベースラインより明確に悪化した訪問をリグレッションとして記録
+"""
+
+import json
+import time
+import sqlite3
+import threading
+import argparse
+import logging
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORLD_BASELINE_DB = 'vr_world_baseline.db'
+
+# 人数帯の境界（0-4, 5-9, 10-19, 20-39, 40+）
+PLAYER_BUCKET_EDGES = [5, 10, 20, 40]
+
+# 指標ごとのヒストグラム境界
+METRIC_EDGES = {
+    'frametime': np.geomspace(2.0, 200.0, 65),  # ms（対数スケール）
+    'cpu': np.linspace(0.0, 100.0, 41),
+    'gpu': np.linspace(0.0, 100.0, 41),
+}
+
+# リグレッション判定
+MIN_BASELINE_SAMPLES = 300
+MIN_VISIT_SAMPLES = 60
+REGRESSION_P95_RATIO = 1.15
+REGRESSION_MEAN_RATIO = 1.10
+
+
+def player_bucket(players: int) -> int:
+    """人数帯インデックス"""
+    return int(np.searchsorted(PLAYER_BUCKET_EDGES, players, side='right'))
+
+
+def player_bucket_label(bucket: int) -> str:
+    """人数帯の表示名"""
+    lower = 0 if bucket == 0 else PLAYER_BUCKET_EDGES[bucket - 1]
+    if bucket >= len(PLAYER_BUCKET_EDGES):
+        return f"{lower}人以上"
+    return f"{lower}-{PLAYER_BUCKET_EDGES[bucket] - 1}人"
+
+
+class StreamingSketch:
+    """固定境界ヒストグラム＋Welford法による平均/分散のストリーミング統計"""
+
+    def __init__(self, metric: str):
+        self.metric = metric
+        self.edges = METRIC_EDGES[metric]
+        self.hist = np.zeros(len(self.edges) + 1, dtype=np.int64)  # 両端はオーバーフロー用
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        """値を1件追加"""
+        self.hist[np.searchsorted(self.edges, value, side='right')] += 1
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: 'StreamingSketch'):
+        """他の統計をマージ（Chanの並列分散公式）"""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.hist += other.hist
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else 0.0
+
+    def quantile(self, q: float) -> float:
+        """ヒストグラムからの分位点推定（ビン内線形補間）"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = np.cumsum(self.hist)
+        index = int(np.searchsorted(cumulative, target, side='left'))
+        if index == 0:
+            return float(self.edges[0])
+        if index >= len(self.edges):
+            return float(self.edges[-1])
+        lower, upper = self.edges[index - 1], self.edges[index]
+        previous = cumulative[index - 1]
+        fraction = (target - previous) / max(self.hist[index], 1)
+        return float(lower + (upper - lower) * fraction)
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'hist': self.hist.tolist()}
+
+    @classmethod
+    def from_dict(cls, metric: str, data: dict) -> 'StreamingSketch':
+        sketch = cls(metric)
+        sketch.count = data['count']
+        sketch.mean = data['mean']
+        sketch.m2 = data['m2']
+        sketch.hist = np.asarray(data['hist'], dtype=np.int64)
+        return sketch
+
+
+def new_sketches() -> dict:
+    return {metric: StreamingSketch(metric) for metric in METRIC_EDGES}
+
+
+def dump_sketches(sketches: dict) -> str:
+    return json.dumps({metric: sketch.to_dict() for metric, sketch in sketches.items()})
+
+
+def load_sketches(text: str) -> dict:
+    data = json.loads(text)
+    sketches = new_sketches()
+    for metric, values in data.items():
+        if metric in sketches:
+            sketches[metric] = StreamingSketch.from_dict(metric, values)
+    return sketches
+
+
+class WorldBaselineDB:
+    """ワールド別パフォーマンスベースラインDB"""
+
+    def __init__(self, db_path: str = WORLD_BASELINE_DB):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS visits (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                world_id TEXT NOT NULL,
+                instance TEXT,
+                started REAL NOT NULL,
+                ended REAL,
+                max_players INTEGER,
+                samples INTEGER,
+                frametime_mean REAL,
+                frametime_p95 REAL,
+                cpu_mean REAL,
+                gpu_mean REAL,
+                regression INTEGER DEFAULT 0,
+                sketch TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_visits_world ON visits(world_id, started);
+            CREATE INDEX IF NOT EXISTS idx_visits_regression ON visits(regression, started);
+            CREATE TABLE IF NOT EXISTS baselines (
+                world_id TEXT NOT NULL,
+                player_bucket INTEGER NOT NULL,
+                samples INTEGER NOT NULL,
+                sketch TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (world_id, player_bucket)
+            );
+        """)
+        self.conn.commit()
+
+        # 現在の訪問
+        self.current_world = None
+        self.current_instance = None
+        self.visit_started = None
+        self.players = 0
+        self.max_players = 0
+        self.visit_sketches = new_sketches()
+        self.bucket_sketches = {}  # 人数帯 -> 訪問中の統計
+
+    # ---- 訪問の記録 ----
+
+    def start_visit(self, world_id: str, instance: str = '', ts: float = None):
+        """ワールド訪問開始"""
+        if self.current_world:
+            self.end_visit(ts)
+        self.current_world = world_id
+        self.current_instance = instance
+        self.visit_started = ts or time.time()
+        self.players = 0
+        self.max_players = 0
+        self.visit_sketches = new_sketches()
+        self.bucket_sketches = {}
+
+    def set_player_count(self, players: int):
+        """現在の人数を設定"""
+        self.players = max(players, 0)
+        self.max_players = max(self.max_players, self.players)
+
+    def add_sample(self, frametime_ms: float = None, cpu_percent: float = None, gpu_percent: float = None):
+        """訪問中のサンプルを追加"""
+        if not self.current_world:
+            return
+        bucket = self.bucket_sketches.setdefault(player_bucket(self.players), new_sketches())
+        for metric, value in (('frametime', frametime_ms), ('cpu', cpu_percent), ('gpu', gpu_percent)):
+            if value is None or value <= 0:
+                continue
+            self.visit_sketches[metric].add(value)
+            bucket[metric].add(value)
+
+    def handle_log_event(self, event: dict):
+        """vrchat_log_parserのイベントを反映"""
+        kind = event['kind']
+        if kind == 'world_join':
+            self.start_visit(event['label'], event.get('detail', ''), event['ts'])
+        elif kind == 'player_joined':
+            self.set_player_count(self.players + 1)
+        elif kind == 'player_left':
+            self.set_player_count(self.players - 1)
+        elif kind == 'world_leave':
+            self.end_visit(event['ts'])
+
+    def end_visit(self, ts: float = None) -> dict:
+        """訪問終了：リグレッション判定後、人数帯別ベースラインへマージ"""
+        if not self.current_world:
+            return None
+
+        world_id = self.current_world
+        frametime = self.visit_sketches['frametime']
+        regression = False
+
+        # サンプルのない訪問（監視開始前のログの再生など）は記録しない
+        if frametime.count == 0:
+            self.current_world = None
+            return None
+
+        with self.lock:
+            baselines = self.get_baseline_sketches(world_id)
+
+            # 訪問中に最も長く滞在した人数帯のベースラインと比較
+            if self.bucket_sketches and frametime.count >= MIN_VISIT_SAMPLES:
+                main_bucket = max(self.bucket_sketches, key=lambda b: self.bucket_sketches[b]['frametime'].count)
+                baseline = baselines.get(main_bucket)
+                if baseline and baseline['frametime'].count >= MIN_BASELINE_SAMPLES:
+                    regression = self.is_regression(self.bucket_sketches[main_bucket]['frametime'],
+                                                    baseline['frametime'])
+
+            visit = {
+                'world_id': world_id,
+                'instance': self.current_instance,
+                'started': self.visit_started,
+                'ended': ts or time.time(),
+                'max_players': self.max_players,
+                'samples': frametime.count,
+                'frametime_mean': frametime.mean,
+                'frametime_p95': frametime.quantile(0.95),
+                'cpu_mean': self.visit_sketches['cpu'].mean,
+                'gpu_mean': self.visit_sketches['gpu'].mean,
+                'regression': regression,
+            }
+            self.conn.execute(
+                'INSERT INTO visits (world_id, instance, started, ended, max_players, samples, '
+                'frametime_mean, frametime_p95, cpu_mean, gpu_mean, regression, sketch) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (world_id, visit['instance'], visit['started'], visit['ended'], visit['max_players'],
+                 visit['samples'], visit['frametime_mean'], visit['frametime_p95'], visit['cpu_mean'],
+                 visit['gpu_mean'], int(regression), dump_sketches(self.visit_sketches)))
+
+            now = time.time()
+            for bucket, sketches in self.bucket_sketches.items():
+                merged = baselines.get(bucket) or new_sketches()
+                for metric, sketch in sketches.items():
+                    merged[metric].merge(sketch)
+                self.conn.execute('INSERT OR REPLACE INTO baselines VALUES (?, ?, ?, ?, ?)',
+                                  (world_id, bucket, merged['frametime'].count, dump_sketches(merged), now))
+            self.conn.commit()
+
+        if regression:
+            logger.warning(f"⚠️ ワールド性能リグレッション: {world_id} "
+                           f"(フレームタイム平均 {visit['frametime_mean']:.1f}ms)")
+
+        self.current_world = None
+        return visit
+
+    @staticmethod
+    def is_regression(visit: StreamingSketch, baseline: StreamingSketch) -> bool:
+        """訪問統計がベースラインより明確に悪化しているか"""
+        return (visit.quantile(0.95) > baseline.quantile(0.95) * REGRESSION_P95_RATIO
+                and visit.mean > baseline.mean * REGRESSION_MEAN_RATIO)
+
+    # ---- 検索 ----
+
+    def get_baseline_sketches(self, world_id: str) -> dict:
+        """ワールドの人数帯別ベースライン統計"""
+        rows = self.conn.execute('SELECT player_bucket, sketch FROM baselines WHERE world_id = ?',
+                                 (world_id,)).fetchall()
+        return {bucket: load_sketches(sketch) for bucket, sketch in rows}
+
+    def expected_performance(self, world_id: str, players: int):
+        """ワールドXにN人いる時の想定性能（データがない場合はNone）"""
+        with self.lock:
+            row = self.conn.execute('SELECT sketch FROM baselines WHERE world_id = ? AND player_bucket = ?',
+                                    (world_id, player_bucket(players))).fetchone()
+        if not row:
+            return None
+
+        sketches = load_sketches(row[0])
+        frametime = sketches['frametime']
+        return {
+            'world_id': world_id,
+            'players': player_bucket_label(player_bucket(players)),
+            'samples': frametime.count,
+            'frametime_mean': frametime.mean,
+            'frametime_std': frametime.std,
+            'frametime_p50': frametime.quantile(0.5),
+            'frametime_p95': frametime.quantile(0.95),
+            'expected_fps': 1000 / frametime.mean if frametime.mean > 0 else 0,
+            'cpu_mean': sketches['cpu'].mean,
+            'gpu_mean': sketches['gpu'].mean,
+        }
+
+    def recent_regressions(self, limit: int = 20) -> list:
+        """リグレッションと判定された訪問（新しい順）"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT world_id, started, max_players, frametime_mean, frametime_p95 FROM visits '
+                'WHERE regression = 1 ORDER BY started DESC LIMIT ?', (limit,)).fetchall()
+        return [{'world_id': r[0], 'started': r[1], 'max_players': r[2],
+                 'frametime_mean': r[3], 'frametime_p95': r[4]} for r in rows]
+
+    def close(self):
+        """訪問中なら終了して閉じる"""
+        if self.current_world:
+            self.end_visit()
+        with self.lock:
+            self.conn.close()
+
+
+def main():
+    """メイン関数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='VRChatワールド別パフォーマンスベースライン')
+    parser.add_argument('--world', help='ワールドID (wrld_...)')
+    parser.add_argument('--players', type=int, default=10, help='想定人数')
+    parser.add_argument('--regressions', action='store_true', help='最近のリグレッション訪問を表示')
+    args = parser.parse_args()
+
+    db = WorldBaselineDB()
+
+    if args.world:
+        expected = db.expected_performance(args.world, args.players)
+        if expected:
+            print(f"🌐 {args.world} ({expected['players']}) - {expected['samples']}サンプル")
+            print(f"  想定FPS: {expected['expected_fps']:.1f}")
+            print(f"  フレームタイム: 中央値 {expected['frametime_p50']:.1f}ms / 95%点 {expected['frametime_p95']:.1f}ms")
+            print(f"  CPU平均: {expected['cpu_mean']:.1f}% / GPU平均: {expected['gpu_mean']:.1f}%")
+        else:
+            print("該当するベースラインがありません")
+
+    if args.regressions:
+        for visit in db.recent_regressions():
+            when = datetime.fromtimestamp(visit['started']).strftime('%Y-%m-%d %H:%M')
+            print(f"⚠️ {when} {visit['world_id']} 最大{visit['max_players']}人 "
+                  f"フレームタイム平均 {visit['frametime_mean']:.1f}ms / 95%点 {visit['frametime_p95']:.1f}ms")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
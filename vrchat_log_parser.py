@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VRChat出力ログ解析モジュール
+output_log_*.txt からワールド入室・プレイヤー入退室・アバター読み込みイベントを抽出します。
+"""
+
+import os
+import re
+import glob
+from datetime import datetime
+
+# VRChatログディレクトリ
+VRCHAT_LOG_DIR = os.path.expanduser("~\\AppData\\LocalLow\\VRChat\\VRChat")
+
+# 例: 2025.05.31 21:39:10 Log        -  [Behaviour] Joining wrld_xxx:12345~private(usr_xxx)
+LINE_PATTERN = re.compile(r'^(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2})\s+(\w+)\s+-\s+(.*)$')
+
+SIZE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(B|KB|MB|GB|bytes)\b', re.IGNORECASE)
+SIZE_UNITS = {'b': 1, 'bytes': 1, 'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3}
+
+# (イベント種別, パターン) - 先に一致したものを採用
+EVENT_PATTERNS = [
+    ('world_join', re.compile(r'\[Behaviour\] Joining (wrld_[0-9a-fA-F-]+)(?::(\S+))?')),
+    ('room_enter', re.compile(r'\[Behaviour\] Entering Room: (.+)')),
+    ('world_leave', re.compile(r'\[Behaviour\] OnLeftRoom')),
+    ('player_joined', re.compile(r'\[Behaviour\] OnPlayerJoined (.+?)(?: \(usr_[^)]*\))?$')),
+    ('player_left', re.compile(r'\[Behaviour\] OnPlayerLeft (.+?)(?: \(usr_[^)]*\))?$')),
+    ('avatar_switch', re.compile(r'\[Behaviour\] Switching (.+) to avatar (.+)')),
+    ('avatar_download', re.compile(r'\[AssetBundleDownloadManager\].*(?:Starting download|Downloading)(.*)', re.IGNORECASE)),
+    ('avatar_load', re.compile(r'\[AssetBundleDownloadManager\].*(?:Unpacking|Loaded|Finished)(.*)', re.IGNORECASE)),
+]
+
+
+def parse_size(text: str):
+    """ログ中のサイズ表記をバイト数に変換（見つからない場合はNone）"""
+    match = SIZE_PATTERN.search(text)
+    if not match:
+        return None
+    return float(match.group(1)) * SIZE_UNITS[match.group(2).lower()]
+
+
+def parse_line(line: str):
+    """1行を解析してイベント辞書を返す（対象外の行はNone）"""
+    match = LINE_PATTERN.match(line.rstrip('\r\n'))
+    if not match:
+        return None
+
+    timestamp_text, _level, message = match.groups()
+    for kind, pattern in EVENT_PATTERNS:
+        event_match = pattern.search(message)
+        if not event_match:
+            continue
+
+        try:
+            ts = datetime.strptime(timestamp_text, '%Y.%m.%d %H:%M:%S').timestamp()
+        except ValueError:
+            return None
+
+        event = {'ts': ts, 'kind': kind, 'label': '', 'value': None, 'detail': message}
+
+        if kind == 'world_join':
+            event['label'] = event_match.group(1)
+            event['detail'] = event_match.group(2) or ''
+        elif kind in ('room_enter', 'player_joined', 'player_left'):
+            event['label'] = event_match.group(1).strip()
+        elif kind == 'avatar_switch':
+            event['label'] = event_match.group(2).strip()
+            event['detail'] = event_match.group(1).strip()
+        elif kind in ('avatar_download', 'avatar_load'):
+            event['value'] = parse_size(message)
+            event['label'] = event_match.group(1).strip()[:120]
+
+        return event
+
+    return None
+
+
+def find_log_files(log_dir: str = VRCHAT_LOG_DIR) -> list:
+    """出力ログファイル一覧（古い順）"""
+    files = glob.glob(os.path.join(log_dir, 'output_log_*.txt'))
+    return sorted(files, key=os.path.getmtime)
+
+
+def find_latest_log(log_dir: str = VRCHAT_LOG_DIR):
+    """最新の出力ログファイル"""
+    files = find_log_files(log_dir)
+    return files[-1] if files else None
+
+
+def read_log_events(path: str, offset: int = 0):
+    """ログファイルをoffsetから読み、(イベントリスト, 次回offset)を返す
+
+    VRChat実行中のログ追記を差分読み込みするため、最後の改行までを読み込み済みとします。
+    """
+    events = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+
+    end = data.rfind(b'\n')
+    if end < 0:
+        return events, offset
+
+    for raw_line in data[:end].split(b'\n'):
+        event = parse_line(raw_line.decode('utf-8', errors='replace'))
+        if event:
+            events.append(event)
+
+    return events, offset + end + 1
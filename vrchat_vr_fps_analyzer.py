@@ -17,27 +17,47 @@ import json
 import time
 import psutil
 import threading
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import tkinter as tk
-from tkinter import ttk, messagebox
+import argparse
 import numpy as np
 from datetime import datetime, timedelta
 import logging
 import subprocess
 from collections import deque
 from typing import Dict, List, Optional, Tuple
-import winreg
+from vr_interference_monitor import InterferenceAttributor
+from vr_event_timeline import EventTimeline
+from vr_world_baseline import WorldBaselineDB
+from vr_session_store import SessionRecorder
+from vr_hardware_inventory import get_gpu_info
 
-# 日本語フォント設定
-plt.rcParams['font.family'] = 'DejaVu Sans'
-plt.rcParams['figure.facecolor'] = '#2b2b2b'
-plt.rcParams['axes.facecolor'] = '#3b3b3b'
-plt.rcParams['text.color'] = 'white'
-plt.rcParams['axes.labelcolor'] = 'white'
-plt.rcParams['xtick.color'] = 'white'
-plt.rcParams['ytick.color'] = 'white'
+# GUI関連モジュール（ヘッドレスモードでは読み込まない）
+tk = ttk = messagebox = plt = FigureCanvasTkAgg = BlitGraphPanel = None
+
+def load_gui_modules():
+    """tkinter / matplotlib(TkAgg) の遅延読み込み"""
+    global tk, ttk, messagebox, plt, FigureCanvasTkAgg, BlitGraphPanel
+    if tk is not None:
+        return
+    
+    import tkinter
+    from tkinter import ttk as tkinter_ttk, messagebox as tkinter_messagebox
+    import matplotlib
+    matplotlib.use('TkAgg')
+    import matplotlib.pyplot as pyplot
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg as canvas_class
+    from vr_live_graphs import BlitGraphPanel as panel_class
+    
+    tk, ttk, messagebox, plt = tkinter, tkinter_ttk, tkinter_messagebox, pyplot
+    FigureCanvasTkAgg, BlitGraphPanel = canvas_class, panel_class
+    
+    # 日本語フォント設定
+    plt.rcParams['font.family'] = 'DejaVu Sans'
+    plt.rcParams['figure.facecolor'] = '#2b2b2b'
+    plt.rcParams['axes.facecolor'] = '#3b3b3b'
+    plt.rcParams['text.color'] = 'white'
+    plt.rcParams['axes.labelcolor'] = 'white'
+    plt.rcParams['xtick.color'] = 'white'
+    plt.rcParams['ytick.color'] = 'white'
 
 # ログ設定
 logging.basicConfig(
@@ -53,19 +73,25 @@ logger = logging.getLogger(__name__)
 class VRChatFPSAnalyzer:
     """VRChat FPS解析メインクラス"""
     
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("🥽 VRChat VR FPS解析ツール（強化版）")
-        self.root.geometry("1200x800")
-        self.root.configure(bg='#2b2b2b')
+    def __init__(self, headless: bool = False):
+        self.headless = headless
+        if not headless:
+            load_gui_modules()
+            self.root = tk.Tk()
+            self.root.title("🥽 VRChat VR FPS解析ツール（強化版）")
+            self.root.geometry("1200x800")
+            self.root.configure(bg='#2b2b2b')
         
         # データ保存用
-        self.fps_data = deque(maxlen=300)  # 5分間のデータ
-        self.cpu_data = deque(maxlen=300)
-        self.gpu_data = deque(maxlen=300)
-        self.memory_data = deque(maxlen=300)
-        self.frametime_data = deque(maxlen=300)
-        self.time_data = deque(maxlen=300)
+        # 約1時間分のデータ（グラフ描画時に表示幅までLTTBで間引く）
+        self.fps_data = deque(maxlen=1800)
+        self.cpu_data = deque(maxlen=1800)
+        self.gpu_data = deque(maxlen=1800)
+        self.memory_data = deque(maxlen=1800)
+        self.frametime_data = deque(maxlen=1800)
+        self.time_data = deque(maxlen=1800)
+        # 累計サンプル数（dequeが満杯になっても増え続ける。グラフの間引きキャッシュのキー）
+        self.sample_count = 0
         
         # VR環境検出
         self.vr_environment = {
@@ -78,10 +104,29 @@ class VRChatFPSAnalyzer:
         # GPU情報
         self.gpu_info = self.detect_gpu()
         
+        # GPU使用率（GPUtil がない環境では記録しない）
+        try:
+            import GPUtil
+            self.gputil = GPUtil
+        except ImportError:
+            self.gputil = None
+        
         # 監視状態
         self.monitoring = False
         self.monitor_thread = None
         
+        # バックグラウンド干渉分析
+        self.interference = InterferenceAttributor()
+        
+        # イベント相関分析用タイムライン
+        self.timeline = EventTimeline()
+        
+        # ワールド別パフォーマンスベースライン
+        self.world_baseline = WorldBaselineDB()
+        
+        # アバター読み込み分析用セッション記録（監視中のみ）
+        self.session = None
+        
         # パフォーマンス閾値
         self.performance_thresholds = {
             'target_fps': 90,  # VR目標FPS
@@ -90,25 +135,17 @@ class VRChatFPSAnalyzer:
             'frametime_warning': 11.1  # フレームタイム警告閾値（90FPS基準）
         }
         
-        self.setup_gui()
+        if not headless:
+            self.setup_gui()
         self.detect_vr_environment()
         
     def detect_gpu(self) -> Dict[str, str]:
-        """GPU情報の検出"""
+        """GPU情報の検出（ハードウェア情報キャッシュを使用）"""
         gpu_info = {'vendor': 'Unknown', 'name': 'Unknown'}
         try:
-            result = subprocess.run(['wmic', 'path', 'win32_VideoController', 'get', 'name'], 
-                                  capture_output=True, text=True, timeout=10)
-            gpu_name = result.stdout.strip()
-            
-            if 'AMD' in gpu_name or 'Radeon' in gpu_name:
-                gpu_info['vendor'] = 'AMD'
-            elif 'NVIDIA' in gpu_name or 'GeForce' in gpu_name or 'RTX' in gpu_name:
-                gpu_info['vendor'] = 'NVIDIA'
-            elif 'Intel' in gpu_name:
-                gpu_info['vendor'] = 'Intel'
-            
-            gpu_info['name'] = gpu_name
+            inventory = get_gpu_info()
+            gpu_info['vendor'] = inventory['vendor']
+            gpu_info['name'] = inventory['name']
             logger.info(f"検出されたGPU: {gpu_info['vendor']} - {gpu_info['name']}")
             
         except Exception as e:
@@ -116,6 +153,14 @@ class VRChatFPSAnalyzer:
         
         return gpu_info
     
+    def get_gpu_percent(self) -> Optional[float]:
+        """GPU使用率（%）"""
+        try:
+            gpus = self.gputil.getGPUs() if self.gputil else []
+            return gpus[0].load * 100 if gpus else None
+        except Exception:
+            return None
+    
     def detect_vr_environment(self):
         """VR環境の検出"""
         try:
@@ -198,25 +243,18 @@ class VRChatFPSAnalyzer:
         self.fig, ((self.ax1, self.ax2), (self.ax3, self.ax4)) = plt.subplots(2, 2, figsize=(12, 6))
         self.fig.patch.set_facecolor('#2b2b2b')
         
-        # グラフの初期設定
-        graphs = [
-            (self.ax1, "FPS", "green", self.fps_data),
-            (self.ax2, "CPU使用率 (%)", "orange", self.cpu_data),
-            (self.ax3, "メモリ使用率 (%)", "blue", self.memory_data),
-            (self.ax4, "フレームタイム (ms)", "red", self.frametime_data)
-        ]
-        
-        for ax, title, color, data in graphs:
-            ax.set_title(title, color='white', fontsize=12)
-            ax.set_facecolor('#3b3b3b')
-            ax.grid(True, alpha=0.3)
-            ax.tick_params(colors='white')
-            
-        plt.tight_layout()
-        
         # tkinterに埋め込み
         self.canvas = FigureCanvasTkAgg(self.fig, graph_frame)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        # 軸・閾値線は一度だけ作成し、以降はデータ差し替えとブリッティングで描画
+        self.graph_panel = BlitGraphPanel(self.fig, [
+            {'ax': self.ax1, 'title': "FPS", 'color': "green", 'threshold': self.performance_thresholds['target_fps']},
+            {'ax': self.ax2, 'title': "CPU (%)", 'color': "orange", 'threshold': self.performance_thresholds['cpu_warning']},
+            {'ax': self.ax3, 'title': "Memory (%)", 'color': "blue", 'threshold': self.performance_thresholds['memory_warning']},
+            {'ax': self.ax4, 'title': "Frametime (ms)", 'color': "red", 'threshold': self.performance_thresholds['frametime_warning']},
+        ])
+        self.graph_job = None
     
     def update_info_display(self):
         """情報表示の更新"""
@@ -254,12 +292,13 @@ class VRChatFPSAnalyzer:
         """監視開始"""
         self.monitoring = True
         self.start_button.config(text="⏹️ 監視停止")
+        self.session = SessionRecorder()
         
         self.monitor_thread = threading.Thread(target=self.monitor_performance, daemon=True)
         self.monitor_thread.start()
         
-        # アニメーション開始
-        self.ani = animation.FuncAnimation(self.fig, self.update_graphs, interval=1000, blit=False)
+        # グラフ更新開始（1秒ごと）
+        self.update_graphs()
         
         logger.info("パフォーマンス監視を開始しました")
     
@@ -268,22 +307,37 @@ class VRChatFPSAnalyzer:
         self.monitoring = False
         self.start_button.config(text="📊 監視開始")
         
-        if hasattr(self, 'ani'):
-            self.ani.event_source.stop()
+        if self.graph_job:
+            self.root.after_cancel(self.graph_job)
+            self.graph_job = None
         
+        self.interference.save_scores()
+        self.timeline.flush_samples()
+        if self.session:
+            self.session.close()
+            self.session = None
         logger.info("パフォーマンス監視を停止しました")
     
     def monitor_performance(self):
         """パフォーマンス監視メインループ"""
+        iteration = 0
         while self.monitoring:
             try:
                 current_time = datetime.now()
+                session = self.session
                 
                 # システム情報取得
                 cpu_percent = psutil.cpu_percent(interval=1)
+                gpu_percent = self.get_gpu_percent()
                 memory_info = psutil.virtual_memory()
                 memory_percent = memory_info.percent
                 
+                # VRChatログは毎回取り込む（ワールド移動直後のサンプルを前のワールドに入れない）
+                for event in self.timeline.import_vrchat_log():
+                    self.world_baseline.handle_log_event(event)
+                    if session:
+                        session.add_event(event)
+                
                 # VRChatプロセス情報
                 vrchat_fps = self.get_vrchat_fps()
                 frametime = 1000 / vrchat_fps if vrchat_fps > 0 else 0
@@ -294,10 +348,30 @@ class VRChatFPSAnalyzer:
                 self.cpu_data.append(cpu_percent)
                 self.memory_data.append(memory_percent)
                 self.frametime_data.append(frametime)
+                self.sample_count += 1
                 
                 # 警告チェック
                 self.check_performance_warnings(vrchat_fps, cpu_percent, memory_percent, frametime)
                 
+                # スパイク時の干渉プロセス特定
+                self.interference.sample(frametime_ms=frametime, cpu_percent=cpu_percent)
+                
+                # タイムライン記録（プロセス変化は5秒ごと）
+                self.timeline.add_fps_sample(vrchat_fps, current_time.timestamp())
+                if iteration % 5 == 0:
+                    self.timeline.record_process_changes()
+                iteration += 1
+                
+                # 現在のワールドのベースラインへサンプル追加
+                self.world_baseline.add_sample(frametime, cpu_percent, gpu_percent)
+                
+                # セッション記録（ディスク読み込みは累積バイト数）
+                if session:
+                    disk_io = psutil.disk_io_counters()
+                    session.add_sample(current_time.timestamp(), fps=vrchat_fps, frametime=frametime,
+                                       cpu=cpu_percent, memory=memory_percent,
+                                       disk_read_bytes=disk_io.read_bytes if disk_io else None)
+                
                 time.sleep(1)
                 
             except Exception as e:
@@ -337,43 +411,29 @@ class VRChatFPSAnalyzer:
         
         if warnings:
             logger.warning(" | ".join(warnings))
+            self.timeline.record_alert(" | ".join(warnings))
     
-    def update_graphs(self, frame):
-        """グラフ更新"""
-        if not self.time_data:
-            return
+    def update_graphs(self):
+        """グラフ更新（変化したラインだけ再描画）"""
+        if self.monitoring:
+            self.graph_job = self.root.after(1000, self.update_graphs)
         
-        # 時間軸の準備
+        # 時間軸の準備（最新サンプルからの経過秒、最新=0）
         times = list(self.time_data)
         if len(times) < 2:
             return
         
-        time_nums = [(t - times[0]).total_seconds() for t in times]
-        
-        # グラフクリアと更新
-        graphs_data = [
-            (self.ax1, self.fps_data, "FPS", "green", self.performance_thresholds['target_fps']),
-            (self.ax2, self.cpu_data, "CPU (%)", "orange", self.performance_thresholds['cpu_warning']),
-            (self.ax3, self.memory_data, "Memory (%)", "blue", self.performance_thresholds['memory_warning']),
-            (self.ax4, self.frametime_data, "Frametime (ms)", "red", self.performance_thresholds['frametime_warning'])
-        ]
-        
-        for ax, data, label, color, threshold in graphs_data:
-            ax.clear()
-            ax.set_facecolor('#3b3b3b')
-            ax.grid(True, alpha=0.3)
-            ax.tick_params(colors='white')
-            ax.set_title(label, color='white')
-            
-            if data and len(data) > 1:
-                ax.plot(time_nums[-len(data):], list(data), color=color, linewidth=2)
-                ax.axhline(y=threshold, color='red', linestyle='--', alpha=0.7, linewidth=1)
+        latest = times[-1]
+        time_nums = np.array([(t - latest).total_seconds() for t in times])
+        
+        series = []
+        for data in (self.fps_data, self.cpu_data, self.memory_data, self.frametime_data):
+            values = np.array(data, dtype=np.float64)[-len(time_nums):]
+            series.append((time_nums[-len(values):], values))
+        self.graph_panel.update(series, self.sample_count)
         
         # ステータス更新
         self.update_status_display()
-        
-        plt.tight_layout()
-        self.canvas.draw()
     
     def update_status_display(self):
         """ステータス表示更新"""
@@ -418,7 +478,7 @@ class VRChatFPSAnalyzer:
             # レポート表示ウィンドウ
             self.show_analysis_report(report)
                 
-            except Exception as e:
+        except Exception as e:
             logger.error(f"詳細分析エラー: {e}")
             messagebox.showerror("エラー", f"詳細分析中にエラーが発生しました: {e}")
     
@@ -596,13 +656,119 @@ class VRChatFPSAnalyzer:
             logger.error(f"予期しないエラー: {e}")
         finally:
             self.monitoring = False
+            self.timeline.close()
+            self.world_baseline.close()
             logger.info("VRChat FPS解析ツールを終了します")
 
+    def run_headless(self, duration: float = None, summary_interval: float = 10, session_path: str = None):
+        """ヘッドレス監視（GUIなし）：セッションファイルへ記録し、定期的に要約をコンソール出力"""
+        logger.info("VRChat FPS解析ツールをヘッドレスモードで開始します")
+        self.monitoring = True
+        self.session = SessionRecorder(session_path)
+        self.monitor_thread = threading.Thread(target=self.monitor_performance, daemon=True)
+        self.monitor_thread.start()
+        print(f"📝 セッション記録: {self.session.path}")
+        
+        start = time.time()
+        try:
+            while duration is None or time.time() - start < duration:
+                time.sleep(summary_interval if duration is None else min(summary_interval, max(duration - (time.time() - start), 0.1)))
+                print(self.format_console_summary(summary_interval), flush=True)
+        except KeyboardInterrupt:
+            logger.info("ユーザーによって中断されました")
+        finally:
+            self.monitoring = False
+            self.monitor_thread.join(timeout=5)
+            self.interference.save_scores()
+            self.timeline.flush_samples()
+            self.session.close()
+            
+            if self.fps_data:
+                filename = f"vrchat_analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write(self.generate_analysis_report())
+                print(f"📄 分析レポート: {filename}")
+            
+            self.timeline.close()
+            self.world_baseline.close()
+            logger.info("VRChat FPS解析ツールを終了します")
+    
+    def format_console_summary(self, window_seconds: float) -> str:
+        """直近区間の1行要約"""
+        times = list(self.time_data)
+        if not times:
+            return f"[{datetime.now().strftime('%H:%M:%S')}] データ待ち..."
+        
+        cutoff = times[-1] - timedelta(seconds=window_seconds)
+        count = sum(1 for t in times if t > cutoff)
+        fps = np.array(list(self.fps_data)[-count:])
+        cpu = np.array(list(self.cpu_data)[-count:])
+        memory = np.array(list(self.memory_data)[-count:])
+        frametime = np.array(list(self.frametime_data)[-count:])
+        low = np.percentile(fps, 1) if len(fps) else 0
+        
+        return (f"[{times[-1].strftime('%H:%M:%S')}] FPS {fps.mean():5.1f} (1%low {low:5.1f}) | "
+                f"FT {frametime.mean():5.1f}ms | CPU {cpu.mean():5.1f}% | MEM {memory.mean():5.1f}% | n={len(self.fps_data)}")
+
+def startup_probe(headless: bool):
+    """起動時間とRSSを計測してJSONで出力（--measure-startup から子プロセスとして実行）"""
+    app = VRChatFPSAnalyzer(headless=headless)
+    if not headless:
+        app.root.update()
+    process = psutil.Process()
+    result = {
+        'mode': 'headless' if headless else 'gui',
+        'startup_seconds': time.time() - process.create_time(),
+        'rss_mb': process.memory_info().rss / 1024 ** 2,
+        'gui_modules_loaded': 'matplotlib' in sys.modules or 'tkinter' in sys.modules,
+    }
+    app.timeline.close()
+    app.world_baseline.close()
+    if not headless:
+        app.root.destroy()
+    print(json.dumps(result))
+
+def measure_startup():
+    """ヘッドレスモードとGUIモードの起動時間・RSSを比較"""
+    results = []
+    for mode in ('--headless', None):
+        command = [sys.executable, os.path.abspath(__file__), '--startup-probe']
+        if mode:
+            command.append(mode)
+        output = subprocess.run(command, capture_output=True, text=True, timeout=120)
+        try:
+            results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        except (ValueError, IndexError):
+            print(f"⚠️ {'ヘッドレス' if mode else 'GUI'}モードの計測に失敗しました: {output.stderr.strip()[-200:]}")
+    
+    for result in results:
+        print(f"{result['mode']:>8}: 起動 {result['startup_seconds']:.2f}秒 / RSS {result['rss_mb']:.0f}MB"
+              f" / GUIモジュール読み込み: {'あり' if result['gui_modules_loaded'] else 'なし'}")
+
 def main():
     """メイン関数"""
+    parser = argparse.ArgumentParser(description='VRChat VR FPS解析ツール')
+    parser.add_argument('--headless', action='store_true', help='GUIなしで監視（セッションファイル記録＋コンソール要約）')
+    parser.add_argument('--duration', type=float, help='ヘッドレス監視の時間（秒、省略時はCtrl+Cまで）')
+    parser.add_argument('--summary-interval', type=float, default=10, help='コンソール要約の間隔（秒）')
+    parser.add_argument('--session', help='セッションファイルの保存先')
+    parser.add_argument('--measure-startup', action='store_true', help='ヘッドレス/GUIモードの起動時間とRSSを比較')
+    parser.add_argument('--startup-probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.measure_startup:
+        measure_startup()
+        return
+    if args.startup_probe:
+        startup_probe(args.headless)
+        return
+    
     try:
-        app = VRChatFPSAnalyzer()
-        app.run()
+        app = VRChatFPSAnalyzer(headless=args.headless)
+        if args.headless:
+            app.run_headless(args.duration, args.summary_interval, args.session)
+        else:
+            app.run()
     except Exception as e:
         print(f"Fatal error: {e}")
         sys.exit(1)